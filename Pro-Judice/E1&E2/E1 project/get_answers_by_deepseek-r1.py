@@ -1,57 +0,0 @@
-from openai import OpenAI
-
-import pandas as pd
-
-# 读取 Excel 文件
-df = pd.read_excel('data/prompts_E1_en.xlsx', header=None, skiprows=3001, nrows=264)
-case_id = df[0].tolist()
-principle = df[1].tolist()
-senario = df[2].tolist()
-prompt = df[3].tolist()
-answer = []
-answer_value = []
-
-client = OpenAI(api_key="**********", base_url="https://api.deepseek.com")
-
-i_temp = 1
-for pro in prompt:
-	try:
-		response = client.chat.completions.create(
-			model="deepseek-reasoner",
-			messages=[
-				{"role": "system", "content": "You are a helpful assistant"},
-				{"role": "user", "content": pro + "\nStrictly limit your reply format to one of the following: Yes or No"},
-			],
-			stream=False
-		)
-		res = response.choices[0].message.content
-		# if isinstance(res, str):
-		# 	answer.append(res)
-		# 	value_list = ean.extract_all_numbers(res)
-		# 	if len(value_list) == 0:
-		# 		answer_value.append("")
-		# 	else:
-		# 		answer_value.append(value_list[-1])
-		# else:
-		# 	answer.append("")
-		# 	answer_value.append("")
-		answer.append(res)
-		print("ds-r1第", i_temp, "次已完成")
-		i_temp = i_temp + 1
-	except:
-		answer.append("")
-		answer_value.append("")
-		print("ds-r1第", i_temp, "次失败")
-		i_temp = i_temp + 1
-
-data = {
-    'CaseId' : case_id,
-    'Principle' : principle,
-    'Senario' : senario,
-    'prompt' : prompt,
-	'answer' : answer
-}
-
-df = pd.DataFrame(data)
-df.to_excel('E1_output_en/E1_en_results_deepseek-r1.xlsx', index = False)
-print("表格已保存至 E1_output_en/E1_en_results_deepseek-r1.xlsx.")
\ No newline at end of file
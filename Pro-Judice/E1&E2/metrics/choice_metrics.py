@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+E1/E2 metrics computed from the model results, replacing the hand-built formulas in E*_metrics*.xlsx
+E1: M_PA = N_No / N_tot          E2: M_PV = (N_B - N_A) / N_tot
+Every count is taken from one groupby pass, and the five chi-square comparisons are run for all
+principles at once on an array of 2x2 contingency tables
+With --scored the logprob-scored results (*_scored, see pipeline/logprob_scoring.py) are read instead,
+and probability-weighted M_PA / M_PV are reported next to the counted ones
+
+Usage:
+python choice_metrics.py E1
+python choice_metrics.py E2 --output E2_metrics_computed.xlsx
+python choice_metrics.py E1 --scored
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pipeline'))
+import answer_classifier as ac
+import logprob_scoring as ls
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODELS = ['gpt-4o', 'llama-3.3', 'deepseek-r1', 'deepseek-v3', 'qwen-2.5']
+US_MODELS = ['gpt-4o', 'llama-3.3']
+CN_MODELS = ['deepseek-r1', 'deepseek-v3', 'qwen-2.5']
+DATASETS = ['CN', 'EN']
+
+# Result files written by pipeline/run_experiments.py (a .parquet twin is preferred when present)
+RESULT_FILES = {
+    ('E1', 'CN'): '../E1 project/E1_output/E1_cn_results_{model}.xlsx',
+    ('E1', 'EN'): '../E1 project/E1_output_en/E1_en_results_{model}.xlsx',
+    ('E2', 'CN'): '../E2 project/E2_output/E2_cn_results_{model}.xlsx',
+    ('E2', 'EN'): '../E2 project/E2_output_en/E2_en_results_{model}.xlsx',
+}
+
+# Both principle sheets list the nine principles in the same order; CN names are mapped to EN ones
+# so that per-principle comparisons can pair the two datasets
+PRINCIPLE_FILES = {
+    'E1': ('../E1 project/data/Principle_cn.xlsx', '../E1 project/data/Principle_en.xlsx'),
+    'E2': ('../E2 project/data/Principle_cn.xlsx', '../E2 project/data/Principle_en.xlsx'),
+}
+
+# The label counted by the metric (procedural choice) first, the other option second
+LABELS = {
+    'E1': ('No', 'Yes'),
+    'E2': ('B', 'A'),
+}
+
+def read_result_file(file_path):
+    """Read a result table, preferring the columnar .parquet twin of the Excel file when it exists"""
+    parquet_file = os.path.splitext(file_path)[0] + '.parquet'
+    if os.path.exists(parquet_file):
+        return pd.read_parquet(parquet_file)
+    return pd.read_excel(file_path)
+
+
+def principle_mapping(experiment):
+    """Chinese principle name -> English principle name"""
+    names = [pd.read_excel(os.path.join(BASE_DIR, path), header=None, skiprows=1, nrows=9)[0].tolist()
+             for path in PRINCIPLE_FILES[experiment]]
+    return dict(zip(*names))
+
+
+def load_results(experiment, models=MODELS, scored=False):
+    """
+    Load every (dataset, model) result table of an experiment and label the answers (answer_classifier)
+    scored=True reads the logprob-scored tables and keeps their answerProb column
+    """
+    all_data = []
+    mapping = principle_mapping(experiment)
+    columns = ['CaseId', 'Principle', 'answer'] + (['answerProb'] if scored else [])
+    for dataset in DATASETS:
+        for model in models:
+            file_path = os.path.join(BASE_DIR, RESULT_FILES[(experiment, dataset)].format(model=model))
+            if scored:
+                file_path = ls.scored_path_for(file_path)
+            parquet_file = os.path.splitext(file_path)[0] + '.parquet'
+            if not os.path.exists(file_path) and not os.path.exists(parquet_file):
+                print(f"Missing: {file_path}")
+                continue
+            df = read_result_file(file_path).reindex(columns=columns)
+            df['Dataset'] = dataset
+            df['Model'] = model
+            if dataset == 'CN':
+                df['Principle'] = df['Principle'].map(mapping).fillna(df['Principle'])
+            all_data.append(df)
+
+    if not all_data:
+        return pd.DataFrame(columns=columns + ['Dataset', 'Model', 'label', 'confidence'])
+    df = pd.concat(all_data, ignore_index=True)
+    return df.join(ac.classify(df['answer'], experiment))
+
+
+def count_labels(df, experiment, min_confidence=0.0):
+    """
+    One groupby pass: counts of the two options and of non-empty answers per (Dataset, Model, Principle)
+    Answers classified with confidence below min_confidence are counted as Unparsed
+
+    Returns a DataFrame indexed by (Dataset, Model, Principle) with columns <procedural label>,
+    <other label>, Unparsed and Nonempty
+    """
+    pos, neg = LABELS[experiment]
+    label = df['label'].fillna('Unparsed')
+    label = label.where((df['confidence'] >= min_confidence) | (label == ''), 'Unparsed')
+    counts = df.groupby(['Dataset', 'Model', 'Principle', label]).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=[pos, neg, 'Unparsed', ''], fill_value=0)
+    counts['Nonempty'] = counts[[pos, neg, 'Unparsed']].sum(axis=1)
+    return counts.drop(columns=[''])
+
+
+def metric_table(counts, experiment, by=('Dataset', 'Model')):
+    """M_PA (E1) or M_PV (E2) over non-empty answers and over answers giving one of the two options"""
+    pos, neg = LABELS[experiment]
+    table = counts.groupby(list(by)).sum()
+    table['Answered'] = table[pos] + table[neg]
+    if experiment == 'E1':
+        table['M_PA'] = table[pos] / table['Nonempty']
+        table['M_PA_answered'] = table[pos] / table['Answered']
+    else:
+        table['M_PV'] = (table[pos] - table[neg]) / table['Nonempty']
+        table['M_PV_answered'] = (table[pos] - table[neg]) / table['Answered']
+    return table
+
+
+def probability_table(df, experiment, by=('Dataset', 'Model')):
+    """
+    Probability-weighted metrics from the logprob scores (answerProb = P(procedural option)):
+    E1: M_PA_prob = mean P(No)       E2: M_PV_prob = mean (P(B) - P(A)) = mean (2 P(B) - 1)
+    SE_prob and SE_answered are the standard errors of the weighted metric and of the counted one
+    (over answers giving one of the two options); Efficiency = (SE_answered / SE_prob)^2 is the factor
+    by which the number of cases can shrink for the same statistical power
+    """
+    pos, neg = LABELS[experiment]
+    scored = df[df['answerProb'].notna()]
+    prob = scored['answerProb'].astype(float)
+    hard = pd.Series(np.where(scored['label'] == pos, 1.0, np.where(scored['label'] == neg, 0.0, np.nan)),
+                     index=scored.index)
+    if experiment == 'E2':
+        prob, hard = 2 * prob - 1, 2 * hard - 1
+    name = 'M_PA' if experiment == 'E1' else 'M_PV'
+    groups = pd.DataFrame({'prob': prob, 'hard': hard}).groupby([scored[column] for column in by])
+    table = pd.DataFrame({
+        'Scored': groups['prob'].count(),
+        f'{name}_prob': groups['prob'].mean(),
+        'SE_prob': groups['prob'].std() / np.sqrt(groups['prob'].count()),
+        f'{name}_answered': groups['hard'].mean(),
+        'SE_answered': groups['hard'].std() / np.sqrt(groups['hard'].count()),
+    })
+    table['Efficiency'] = (table['SE_answered'] / table['SE_prob']) ** 2
+    return table
+
+
+def comparisons(pos, neg):
+    """
+    The five comparisons of the metrics workbooks as 2x2 tables; each cell is (datasets, models, label)
+    The first row is the first group of the name, as in the workbooks (US = EN dataset, CN = CN dataset)
+    """
+    both = DATASETS
+    return [
+        ('M(R1) vs M(V3)', [[(both, ['deepseek-r1'], pos), (both, ['deepseek-r1'], neg)],
+                            [(both, ['deepseek-v3'], pos), (both, ['deepseek-v3'], neg)]]),
+        ('D(US) vs D(CN)', [[(['EN'], MODELS, pos), (['EN'], MODELS, neg)],
+                            [(['CN'], MODELS, pos), (['CN'], MODELS, neg)]]),
+        ('M(US) vs M(CN)', [[(both, US_MODELS, pos), (both, US_MODELS, neg)],
+                            [(both, CN_MODELS, pos), (both, CN_MODELS, neg)]]),
+        ('DUS(R1,V3) vs DCN(R1,V3)', [[(['EN'], ['deepseek-r1'], pos), (['EN'], ['deepseek-v3'], pos)],
+                                      [(['CN'], ['deepseek-r1'], pos), (['CN'], ['deepseek-v3'], pos)]]),
+        ('DUS(MUS,MCN) vs DCN(MUS,MCN)', [[(['EN'], US_MODELS, pos), (['EN'], CN_MODELS, pos)],
+                                          [(['CN'], US_MODELS, pos), (['CN'], CN_MODELS, pos)]]),
+    ]
+
+
+def chi_square_2x2(tables):
+    """Pearson chi-square without continuity correction (as in the workbooks) for an array (..., 2, 2)"""
+    tables = np.asarray(tables, dtype=float)
+    rows = tables.sum(axis=-1, keepdims=True)
+    cols = tables.sum(axis=-2, keepdims=True)
+    total = tables.sum(axis=(-2, -1), keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected = rows * cols / total
+        chi2 = ((tables - expected) ** 2 / expected).sum(axis=(-2, -1))
+    return chi2, stats.chi2.sf(chi2, 1)
+
+
+def chi_square_tests(counts, experiment):
+    """
+    Run the five comparisons overall and per principle in one batch
+
+    Returns one row per (Comparison, Principle) with the observed table, chi-square and p-value;
+    Principle 'ALL' pools every principle
+    """
+    pos, neg = LABELS[experiment]
+    cube = counts[[pos, neg]].stack().rename('n')
+    cube.index = cube.index.set_names('Label', level=-1)
+    # Dense array indexed [dataset, model, principle, label]
+    principles = list(counts.index.get_level_values('Principle').unique())
+    full_index = pd.MultiIndex.from_product([DATASETS, MODELS, principles, [pos, neg]],
+                                            names=['Dataset', 'Model', 'Principle', 'Label'])
+    array = cube.reindex(full_index, fill_value=0).to_numpy().reshape(
+        len(DATASETS), len(MODELS), len(principles), 2)
+    array = np.concatenate([array, array.sum(axis=2, keepdims=True)], axis=2)
+    principles.append('ALL')
+
+    names = []
+    tables = []
+    for name, cells in comparisons(pos, neg):
+        table = np.empty((len(principles), 2, 2))
+        for i in range(2):
+            for j in range(2):
+                datasets, models, label = cells[i][j]
+                d = [DATASETS.index(x) for x in datasets]
+                m = [MODELS.index(x) for x in models]
+                table[:, i, j] = array[np.ix_(d, m)][..., (pos, neg).index(label)].sum(axis=(0, 1))
+        names.append(name)
+        tables.append(table)
+
+    tables = np.stack(tables)
+    chi2, p_values = chi_square_2x2(tables)
+    results = pd.DataFrame({
+        'Comparison': np.repeat(names, len(principles)),
+        'Principle': principles * len(names),
+        'O11': tables[..., 0, 0].ravel(),
+        'O12': tables[..., 0, 1].ravel(),
+        'O21': tables[..., 1, 0].ravel(),
+        'O22': tables[..., 1, 1].ravel(),
+        'Chi2': chi2.ravel(),
+        'P_value': p_values.ravel(),
+    })
+    results['Significant'] = results['P_value'] < 0.05
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('experiment', choices=['E1', 'E2'])
+    parser.add_argument('--min-confidence', type=float, default=0.0,
+                        help='Count answers classified below this confidence as unparsed (see answer_classifier.py)')
+    parser.add_argument('--scored', action='store_true',
+                        help='Read the logprob-scored results and add probability-weighted metrics')
+    parser.add_argument('--output', help='Excel output (default <experiment>_metrics_computed.xlsx next to this script)')
+    args = parser.parse_args()
+
+    start = time.time()
+    df = load_results(args.experiment, scored=args.scored)
+    if df.empty:
+        print("Error: No data loaded. Please check file paths and data format.")
+        return
+    counts = count_labels(df, args.experiment, args.min_confidence)
+    totals = metric_table(counts, args.experiment)
+    by_principle = metric_table(counts, args.experiment, by=('Dataset', 'Model', 'Principle'))
+    tests = chi_square_tests(counts, args.experiment)
+
+    print(f"Total answers loaded: {len(df)}, unparsed: {int(counts['Unparsed'].sum())}")
+    print("Classifier confidence:", df['confidence'].value_counts().sort_index(ascending=False).to_dict())
+    print(totals.round(4).to_string())
+    print()
+    print(tests[tests['Principle'] == 'ALL'].round(6).to_string(index=False))
+    if args.scored:
+        probability = probability_table(df, args.experiment)
+        probability_by_principle = probability_table(df, args.experiment, by=('Dataset', 'Model', 'Principle'))
+        print()
+        print(probability.round(4).to_string())
+
+    suffix = '_scored' if args.scored else ''
+    output = args.output or os.path.join(BASE_DIR, f'{args.experiment}{suffix}_metrics_computed.xlsx')
+    with pd.ExcelWriter(output) as writer:
+        totals.to_excel(writer, sheet_name='total')
+        by_principle.to_excel(writer, sheet_name='principle')
+        tests.to_excel(writer, sheet_name='chi_square', index=False)
+        if args.scored:
+            probability.to_excel(writer, sheet_name='probability')
+            probability_by_principle.to_excel(writer, sheet_name='probability_principle')
+    print(f"\nResults saved to '{output}' ({time.time() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
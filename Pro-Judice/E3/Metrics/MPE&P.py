@@ -2,23 +2,41 @@
 """
 T-test Analysis for E3 Experiment MPE (Mean Procedure Effect)
 Calculates MPE as |E_3_2 - E_3_1| for each case, then computes group differences
+Procedure-effect tests and bootstrap CIs run on the per-case paired differences; Delta MPE is tested
+with the same case-resampling bootstrap as its CI (see paired_stats.py)
 Author: Assistant
 Date: 2025
 """
 
 import pandas as pd
 import numpy as np
-from scipy import stats
 import os
 import warnings
 
+import paired_stats as ps
+
 warnings.filterwarnings('ignore')
 
 
+def parquet_twin(file_path):
+    return os.path.splitext(file_path)[0] + '.parquet'
+
+
+def result_file_exists(file_path):
+    return os.path.exists(file_path) or os.path.exists(parquet_twin(file_path))
+
+
+def read_result_file(file_path):
+    """Read a result table, preferring the columnar .parquet twin of the Excel file when it exists"""
+    if os.path.exists(parquet_twin(file_path)):
+        return pd.read_parquet(parquet_twin(file_path))
+    return pd.read_excel(file_path)
+
+
 def load_and_clean_data(file_path):
-    """Load Excel file and extract clean numeric data"""
+    """Load result file and extract clean numeric data"""
     try:
-        df = pd.read_excel(file_path)
+        df = read_result_file(file_path)
         if 'answerValue' not in df.columns:
             return pd.DataFrame()
 
@@ -48,7 +66,7 @@ def load_all_data():
     # Load Chinese data (Group1)
     for model, filename in file_mapping.items():
         cn_file = f'data/result_CN/{filename}'
-        if os.path.exists(cn_file):
+        if result_file_exists(cn_file):
             df = load_and_clean_data(cn_file)
             if not df.empty:
                 df['Dataset'] = 'CN'
@@ -59,7 +77,7 @@ def load_all_data():
     # Load English data (Group2)
     for model, filename in file_mapping.items():
         en_file = f'data/result_EN/{filename}'
-        if os.path.exists(en_file):
+        if result_file_exists(en_file):
             df = load_and_clean_data(en_file)
             if not df.empty:
                 df['Dataset'] = 'EN'
@@ -74,200 +92,117 @@ def load_all_data():
         return pd.DataFrame()
 
 
-def calculate_mpe_for_group(df, dataset=None, model_list=None):
-    """Calculate MPE for a specific group (dataset + models)"""
-    filtered_df = df.copy()
+def build_mpe_table(df):
+    """Pivot on Experiment and compute MPE = |E_3_2 - E_3_1| per (Dataset, Model, CaseId, Principle)"""
+    keys = ['Dataset', 'Model', 'CaseId', 'Principle']
+    paired = df.pivot_table(index=keys, columns='Experiment', values='answerValue', aggfunc='first')
+    if 'E_3_1' not in paired.columns or 'E_3_2' not in paired.columns:
+        return pd.DataFrame(columns=keys + ['E_3_1', 'E_3_2', 'Diff', 'MPE'])
 
-    if dataset:
-        filtered_df = filtered_df[filtered_df['Dataset'] == dataset]
-    if model_list:
-        filtered_df = filtered_df[filtered_df['Model'].isin(model_list)]
+    # Only cases answered under both experiments form a pair
+    paired = paired[['E_3_1', 'E_3_2']].dropna()
+    paired['Diff'] = paired['E_3_2'] - paired['E_3_1']
+    paired['MPE'] = paired['Diff'].abs()
+    return paired.reset_index()
 
-    if len(filtered_df) == 0:
-        return None
 
-    # Group by CaseId and Principle to calculate MPE for each case
-    mpe_values = []
+def mpe_cell_stats(mpe_table):
+    """Sum and count of per-case MPE for every (Dataset, Model) cell"""
+    return mpe_table.groupby(['Dataset', 'Model'])['MPE'].agg(['sum', 'count'])
 
-    for (case_id, principle), case_group in filtered_df.groupby(['CaseId', 'Principle']):
-        # Get E_3_1 and E_3_2 values for this case
-        e31_rows = case_group[case_group['Experiment'] == 'E_3_1']
-        e32_rows = case_group[case_group['Experiment'] == 'E_3_2']
 
-        if len(e31_rows) > 0 and len(e32_rows) > 0:
-            e31_value = e31_rows['answerValue'].iloc[0]
-            e32_value = e32_rows['answerValue'].iloc[0]
-            mpe = abs(e32_value - e31_value)
-            mpe_values.append(mpe)
-
-    if len(mpe_values) > 0:
-        return np.mean(mpe_values)
-    else:
-        return None
+def calculate_mpe_for_group(cell_stats, dataset=None, model_list=None):
+    """Calculate MPE for a specific group (dataset + models) from the per-cell sums"""
+    datasets = cell_stats.index.get_level_values('Dataset')
+    models = cell_stats.index.get_level_values('Model')
+    mask = np.ones(len(cell_stats), dtype=bool)
 
+    if dataset:
+        mask &= datasets == dataset
+    if model_list:
+        mask &= models.isin(model_list)
 
-def perform_comprehensive_t_tests(df):
-    """Perform all T-tests according to the experimental design"""
+    selected = cell_stats[mask]
+    count = selected['count'].sum()
+    if count == 0:
+        return None
+    return selected['sum'].sum() / count
+
+
+US_MODELS = ['gpt_4o', 'llama_3_3']
+CN_MODELS = ['deepseek_v3', 'qwen_2_5']
+
+# (Comparison, Groups, Group1 filter, Group2 filter); Delta MPE = Group2 MPE - Group1 MPE
+COMPARISONS = [
+    ('Dataset (LT)', 'D(US) vs D(CN)', {'dataset': 'CN'}, {'dataset': 'EN'}),
+    ('Model (ver)', 'M(R1) vs M(V3)', {'model_list': ['deepseek_v3']}, {'model_list': ['deepseek_r1']}),
+    ('Model (LT)', 'M(US) vs M(CN)', {'model_list': CN_MODELS}, {'model_list': US_MODELS}),
+    ('Dataset x Model (LT) - DUS', 'DUS(R1) vs DUS(V3)',
+     {'dataset': 'EN', 'model_list': ['deepseek_v3']}, {'dataset': 'EN', 'model_list': ['deepseek_r1']}),
+    ('Dataset x Model (LT) - DCN', 'DCN(R1) vs DCN(V3)',
+     {'dataset': 'CN', 'model_list': ['deepseek_v3']}, {'dataset': 'CN', 'model_list': ['deepseek_r1']}),
+    ('Dataset x Model (ver) - DUS', 'DUS(MUS) vs DUS(MCN)',
+     {'dataset': 'EN', 'model_list': CN_MODELS}, {'dataset': 'EN', 'model_list': US_MODELS}),
+    ('Dataset x Model (ver) - DCN', 'DCN(MUS) vs DCN(MCN)',
+     {'dataset': 'CN', 'model_list': CN_MODELS}, {'dataset': 'CN', 'model_list': US_MODELS}),
+]
+
+
+def perform_comprehensive_t_tests(df, n_boot=ps.N_BOOT, seed=0):
+    """Perform all tests according to the experimental design, on the per-case paired differences"""
     results = []
 
-    # 1. Dataset (LT): D(US) vs D(CN)
-    group1_mpe = calculate_mpe_for_group(df, dataset='CN')  # Group1 = CN
-    group2_mpe = calculate_mpe_for_group(df, dataset='EN')  # Group2 = EN
-
-    if group1_mpe is not None and group2_mpe is not None:
-        delta_mpe = group2_mpe - group1_mpe
-
-        # T-test between EN and CN datasets
-        cn_data = df[df['Dataset'] == 'CN']['answerValue']
-        en_data = df[df['Dataset'] == 'EN']['answerValue']
-        t_stat, p_val = stats.ttest_ind(en_data, cn_data)
+    # All group MPEs below come from one pivoted table of per-case differences
+    mpe_table = build_mpe_table(df)
+    cells = mpe_cell_stats(mpe_table)
+
+    # One bootstrap pass for every group, all groups resampled on the same cases
+    filters = []
+    for _, _, filter1, filter2 in COMPARISONS:
+        filters += [f for f in (filter1, filter2) if f not in filters]
+    replicates = ps.bootstrap_group_mpes(mpe_table, filters, n_boot, seed)
+
+    for comparison, groups, filter1, filter2 in COMPARISONS:
+        group1_mpe = calculate_mpe_for_group(cells, **filter1)
+        group2_mpe = calculate_mpe_for_group(cells, **filter2)
+        if group1_mpe is None or group2_mpe is None:
+            continue
+
+        group1 = ps.select_group(mpe_table, **filter1)
+        group2 = ps.select_group(mpe_table, **filter2)
+        effect1 = ps.procedure_effect(group1)
+        effect2 = ps.procedure_effect(group2)
+        boot1 = replicates[filters.index(filter1)]
+        boot2 = replicates[filters.index(filter2)]
+        delta = ps.compare_groups(group1, group2, boot1, boot2)
+        group1_ci = ps.percentile_ci(boot1)
+        group2_ci = ps.percentile_ci(boot2)
+        delta_ci = ps.percentile_ci(boot2 - boot1)
 
         results.append({
-            'Comparison': 'Dataset (LT)',
-            'Groups': 'D(US) vs D(CN)',
+            'Comparison': comparison,
+            'Groups': groups,
             'Group1_MPE': group1_mpe,
+            'Group1_CI_low': group1_ci[0],
+            'Group1_CI_high': group1_ci[1],
+            'Group1_Effect_T': effect1['T_stat'],
+            'Group1_Effect_P': effect1['P_value'],
+            'Group1_Wilcoxon_stat': effect1['Wilcoxon_stat'],
+            'Group1_Wilcoxon_P': effect1['Wilcoxon_P'],
             'Group2_MPE': group2_mpe,
-            'Delta_MPE': delta_mpe,
-            'P_value': p_val,
-            'T_stat': t_stat,
-            'Significant': p_val < 0.05
-        })
-
-    # 2. Model (ver): M(R1) vs M(V3)
-    r1_mpe = calculate_mpe_for_group(df, model_list=['deepseek_r1'])
-    v3_mpe = calculate_mpe_for_group(df, model_list=['deepseek_v3'])
-
-    if r1_mpe is not None and v3_mpe is not None:
-        delta_mpe = r1_mpe - v3_mpe
-
-        # T-test between R1 and V3 models
-        r1_data = df[df['Model'] == 'deepseek_r1']['answerValue']
-        v3_data = df[df['Model'] == 'deepseek_v3']['answerValue']
-        t_stat, p_val = stats.ttest_ind(r1_data, v3_data)
-
-        results.append({
-            'Comparison': 'Model (ver)',
-            'Groups': 'M(R1) vs M(V3)',
-            'Group1_MPE': v3_mpe,  # Group1 = V3
-            'Group2_MPE': r1_mpe,  # Group2 = R1
-            'Delta_MPE': delta_mpe,
-            'P_value': p_val,
-            'T_stat': t_stat,
-            'Significant': p_val < 0.05
-        })
-
-    # 3. Model (LT): M(US) vs M(CN)
-    us_models = ['gpt_4o', 'llama_3_3']
-    cn_models = ['deepseek_v3', 'qwen_2_5']
-
-    us_mpe = calculate_mpe_for_group(df, model_list=us_models)
-    cn_mpe = calculate_mpe_for_group(df, model_list=cn_models)
-
-    if us_mpe is not None and cn_mpe is not None:
-        delta_mpe = us_mpe - cn_mpe
-
-        # T-test between US and CN models
-        us_data = df[df['Model'].isin(us_models)]['answerValue']
-        cn_data = df[df['Model'].isin(cn_models)]['answerValue']
-        t_stat, p_val = stats.ttest_ind(us_data, cn_data)
-
-        results.append({
-            'Comparison': 'Model (LT)',
-            'Groups': 'M(US) vs M(CN)',
-            'Group1_MPE': cn_mpe,  # Group1 = CN models
-            'Group2_MPE': us_mpe,  # Group2 = US models
-            'Delta_MPE': delta_mpe,
-            'P_value': p_val,
-            'T_stat': t_stat,
-            'Significant': p_val < 0.05
-        })
-
-    # 4. Dataset x Model (LT): DUS(R1) vs DUS(V3) and DCN(R1) vs DCN(V3)
-    dus_r1_mpe = calculate_mpe_for_group(df, dataset='EN', model_list=['deepseek_r1'])
-    dus_v3_mpe = calculate_mpe_for_group(df, dataset='EN', model_list=['deepseek_v3'])
-    dcn_r1_mpe = calculate_mpe_for_group(df, dataset='CN', model_list=['deepseek_r1'])
-    dcn_v3_mpe = calculate_mpe_for_group(df, dataset='CN', model_list=['deepseek_v3'])
-
-    if dus_r1_mpe is not None and dus_v3_mpe is not None:
-        delta_mpe_dus = dus_r1_mpe - dus_v3_mpe
-
-        # T-test for DUS interaction
-        dus_r1_data = df[(df['Dataset'] == 'EN') & (df['Model'] == 'deepseek_r1')]['answerValue']
-        dus_v3_data = df[(df['Dataset'] == 'EN') & (df['Model'] == 'deepseek_v3')]['answerValue']
-        t_stat, p_val = stats.ttest_ind(dus_r1_data, dus_v3_data)
-
-        results.append({
-            'Comparison': 'Dataset x Model (LT) - DUS',
-            'Groups': 'DUS(R1) vs DUS(V3)',
-            'Group1_MPE': dus_v3_mpe,  # Group1 = V3
-            'Group2_MPE': dus_r1_mpe,  # Group2 = R1
-            'Delta_MPE': delta_mpe_dus,
-            'P_value': p_val,
-            'T_stat': t_stat,
-            'Significant': p_val < 0.05
-        })
-
-    if dcn_r1_mpe is not None and dcn_v3_mpe is not None:
-        delta_mpe_dcn = dcn_r1_mpe - dcn_v3_mpe
-
-        # T-test for DCN interaction
-        dcn_r1_data = df[(df['Dataset'] == 'CN') & (df['Model'] == 'deepseek_r1')]['answerValue']
-        dcn_v3_data = df[(df['Dataset'] == 'CN') & (df['Model'] == 'deepseek_v3')]['answerValue']
-        t_stat, p_val = stats.ttest_ind(dcn_r1_data, dcn_v3_data)
-
-        results.append({
-            'Comparison': 'Dataset x Model (LT) - DCN',
-            'Groups': 'DCN(R1) vs DCN(V3)',
-            'Group1_MPE': dcn_v3_mpe,  # Group1 = V3
-            'Group2_MPE': dcn_r1_mpe,  # Group2 = R1
-            'Delta_MPE': delta_mpe_dcn,
-            'P_value': p_val,
-            'T_stat': t_stat,
-            'Significant': p_val < 0.05
-        })
-
-    # 5. Dataset x Model (ver): DUS(MUS) vs DUS(MCN) and DCN(MUS) vs DCN(MCN)
-    dus_mus_mpe = calculate_mpe_for_group(df, dataset='EN', model_list=us_models)
-    dus_mcn_mpe = calculate_mpe_for_group(df, dataset='EN', model_list=cn_models)
-    dcn_mus_mpe = calculate_mpe_for_group(df, dataset='CN', model_list=us_models)
-    dcn_mcn_mpe = calculate_mpe_for_group(df, dataset='CN', model_list=cn_models)
-
-    if dus_mus_mpe is not None and dus_mcn_mpe is not None:
-        delta_mpe_dus_ver = dus_mus_mpe - dus_mcn_mpe
-
-        # T-test for DUS version interaction
-        dus_mus_data = df[(df['Dataset'] == 'EN') & (df['Model'].isin(us_models))]['answerValue']
-        dus_mcn_data = df[(df['Dataset'] == 'EN') & (df['Model'].isin(cn_models))]['answerValue']
-        t_stat, p_val = stats.ttest_ind(dus_mus_data, dus_mcn_data)
-
-        results.append({
-            'Comparison': 'Dataset x Model (ver) - DUS',
-            'Groups': 'DUS(MUS) vs DUS(MCN)',
-            'Group1_MPE': dus_mcn_mpe,  # Group1 = CN models
-            'Group2_MPE': dus_mus_mpe,  # Group2 = US models
-            'Delta_MPE': delta_mpe_dus_ver,
-            'P_value': p_val,
-            'T_stat': t_stat,
-            'Significant': p_val < 0.05
-        })
-
-    if dcn_mus_mpe is not None and dcn_mcn_mpe is not None:
-        delta_mpe_dcn_ver = dcn_mus_mpe - dcn_mcn_mpe
-
-        # T-test for DCN version interaction
-        dcn_mus_data = df[(df['Dataset'] == 'CN') & (df['Model'].isin(us_models))]['answerValue']
-        dcn_mcn_data = df[(df['Dataset'] == 'CN') & (df['Model'].isin(cn_models))]['answerValue']
-        t_stat, p_val = stats.ttest_ind(dcn_mus_data, dcn_mcn_data)
-
-        results.append({
-            'Comparison': 'Dataset x Model (ver) - DCN',
-            'Groups': 'DCN(MUS) vs DCN(MCN)',
-            'Group1_MPE': dcn_mcn_mpe,  # Group1 = CN models
-            'Group2_MPE': dcn_mus_mpe,  # Group2 = US models
-            'Delta_MPE': delta_mpe_dcn_ver,
-            'P_value': p_val,
-            'T_stat': t_stat,
-            'Significant': p_val < 0.05
+            'Group2_CI_low': group2_ci[0],
+            'Group2_CI_high': group2_ci[1],
+            'Group2_Effect_T': effect2['T_stat'],
+            'Group2_Effect_P': effect2['P_value'],
+            'Group2_Wilcoxon_stat': effect2['Wilcoxon_stat'],
+            'Group2_Wilcoxon_P': effect2['Wilcoxon_P'],
+            'Delta_MPE': group2_mpe - group1_mpe,
+            'Delta_CI_low': delta_ci[0],
+            'Delta_CI_high': delta_ci[1],
+            'Test': delta['Test'],
+            'N_items': delta['N_items'],
+            'P_value': delta['P_value'],
+            'Significant': delta['P_value'] < 0.05
         })
 
     return results
@@ -275,30 +210,44 @@ def perform_comprehensive_t_tests(df):
 
 def create_summary_table(results):
     """Create a summary table of all results"""
-    print("\n" + "=" * 100)
+    print("\n" + "=" * 130)
     print("CORRECTED MPE ANALYSIS SUMMARY TABLE")
-    print("=" * 100)
+    print("=" * 130)
 
     if results:
         df_results = pd.DataFrame(results)
 
         print(
-            f"{'Comparison':<30} {'Groups':<25} {'Group1 MPE':<12} {'Group2 MPE':<12} {'Δ MPE':<10} {'P-value':<12} {'Sig':<5}")
-        print("-" * 100)
+            f"{'Comparison':<30} {'Groups':<25} {'Group1 MPE':<12} {'Group2 MPE':<12} {'Δ MPE':<10} {'Δ 95% CI':<18} {'Test':<12} {'P-value':<12} {'Sig':<5}")
+        print("-" * 130)
 
         for _, row in df_results.iterrows():
-            sig_marker = "***" if row['P_value'] < 0.001 else "**" if row['P_value'] < 0.01 else "*" if row[
-                                                                                                            'P_value'] < 0.05 else ""
+            sig_marker = ps.significance_marker(row['P_value'])
             g1_mpe = f"{row['Group1_MPE']:.3f}" if row['Group1_MPE'] is not None else "N/A"
             g2_mpe = f"{row['Group2_MPE']:.3f}" if row['Group2_MPE'] is not None else "N/A"
             delta_mpe = f"{row['Delta_MPE']:.3f}" if row['Delta_MPE'] is not None else "N/A"
+            delta_ci = f"[{row['Delta_CI_low']:.3f}, {row['Delta_CI_high']:.3f}]"
 
             print(
-                f"{row['Comparison']:<30} {row['Groups']:<25} {g1_mpe:<12} {g2_mpe:<12} {delta_mpe:<10} {row['P_value']:<12.6f} {sig_marker:<5}")
+                f"{row['Comparison']:<30} {row['Groups']:<25} {g1_mpe:<12} {g2_mpe:<12} {delta_mpe:<10} {delta_ci:<18} {row['Test']:<12} {row['P_value']:<12.6f} {sig_marker:<5}")
+
+        print("\nPROCEDURE EFFECT WITHIN EACH GROUP (E_3_2 vs E_3_1)")
+        print(f"{'Groups':<25} {'Group':<7} {'T-stat':<10} {'T-test P':<12} {'Wilcoxon W':<14} {'Wilcoxon P':<12} {'Sig':<5}")
+        print("-" * 90)
+        for _, row in df_results.iterrows():
+            for group in ('Group1', 'Group2'):
+                print(f"{row['Groups']:<25} {group:<7} {row[group + '_Effect_T']:<10.3f} {row[group + '_Effect_P']:<12.6f} "
+                      f"{row[group + '_Wilcoxon_stat']:<14.1f} {row[group + '_Wilcoxon_P']:<12.6f} "
+                      f"{ps.significance_marker(row[group + '_Wilcoxon_P']):<5}")
 
         print("\nSignificance levels: *** p<0.001, ** p<0.01, * p<0.05")
         print("Δ MPE = Group2 MPE - Group1 MPE")
         print("MPE calculated as |E_3_2 - E_3_1| for each case, then averaged")
+        print(f"CIs: 95% percentile bootstrap over cases, resampled within each dataset ({ps.N_BOOT} replicates)")
+        print("Procedure effect: paired t-test and Wilcoxon signed-rank test of E_3_2 vs E_3_1 within each group; "
+              "Sig marks the Wilcoxon P")
+        print("P-value: two-sided bootstrap test of Δ MPE = 0 on the same replicates as the Δ CI "
+              "(paired when both groups share cases, independent otherwise)")
 
         return df_results
     else:
@@ -325,4 +274,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
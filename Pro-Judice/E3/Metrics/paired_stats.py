@@ -0,0 +1,159 @@
+"""
+Paired-difference statistics for E3 MPE
+Works on the per-case table built by MPE&P.build_mpe_table
+(Dataset, Model, CaseId, Principle, E_3_1, E_3_2, Diff, MPE), where Diff = E_3_2 - E_3_1 and MPE = |Diff|
+
+A case is one (Dataset, CaseId, Principle); a group is a dataset and/or a list of models, and its MPE is
+the mean of MPE over every (model, case) pair in it.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+ITEM_KEYS = ['Dataset', 'CaseId', 'Principle']
+N_BOOT = 10000
+ALPHA = 0.05
+# Upper bound on resampling weights held in memory at once (replicates x cases)
+BOOT_BLOCK_VALUES = 20_000_000
+
+
+def select_group(mpe_table, dataset=None, model_list=None):
+    """Rows of the MPE table belonging to one group (dataset + models)"""
+    mask = np.ones(len(mpe_table), dtype=bool)
+    if dataset:
+        mask &= (mpe_table['Dataset'] == dataset).to_numpy()
+    if model_list:
+        mask &= mpe_table['Model'].isin(model_list).to_numpy()
+    return mpe_table[mask]
+
+
+def item_sums(rows):
+    """Sum and count of MPE per case, pooled over the models of a group"""
+    return rows.groupby(ITEM_KEYS)['MPE'].agg(['sum', 'count'])
+
+
+def group_matrices(mpe_table, filters):
+    """
+    Per-case MPE sums and counts of several groups, aligned on all cases of the table
+
+    Returns (cases, sums, counts) where sums and counts have shape (n_cases, n_groups)
+    """
+    cases = pd.MultiIndex.from_frame(mpe_table[ITEM_KEYS].drop_duplicates()).sort_values()
+    sums = np.zeros((len(cases), len(filters)))
+    counts = np.zeros((len(cases), len(filters)))
+    for j, group_filter in enumerate(filters):
+        items = item_sums(select_group(mpe_table, **group_filter)).reindex(cases, fill_value=0)
+        sums[:, j] = items['sum'].to_numpy()
+        counts[:, j] = items['count'].to_numpy()
+    return cases, sums, counts
+
+
+def resampling_weights(strata, n_rows, rng):
+    """
+    Bootstrap weights of shape (n_rows, n_cases): each row counts how often every case was drawn when
+    resampling with replacement within its stratum (dataset), so stratum sizes stay fixed
+    """
+    n = len(strata)
+    weights = np.zeros((n_rows, n))
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        draws = members[rng.integers(0, len(members), size=(n_rows, len(members)))]
+        flat = (np.arange(n_rows)[:, None] * n + draws).ravel()
+        weights += np.bincount(flat, minlength=n_rows * n).reshape(n_rows, n)
+    return weights
+
+
+def bootstrap_group_mpes(mpe_table, filters, n_boot=N_BOOT, rng=None):
+    """
+    Stratified case-resampling bootstrap of the MPE of every group in filters
+
+    All groups are evaluated on the same resampled cases in each replicate, so the difference of two rows
+    is a paired bootstrap for groups sharing cases and an independent one for groups in different datasets.
+    Replicates are computed in blocks as weight-matrix products, without a Python loop over replicates.
+
+    Returns an array of shape (n_groups, n_boot)
+    """
+    rng = np.random.default_rng(rng)
+    cases, sums, counts = group_matrices(mpe_table, filters)
+    strata = cases.get_level_values('Dataset').to_numpy()
+    block = max(1, BOOT_BLOCK_VALUES // max(len(cases), 1))
+    replicates = np.empty((len(filters), n_boot))
+    for start in range(0, n_boot, block):
+        stop = min(n_boot, start + block)
+        weights = resampling_weights(strata, stop - start, rng)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            replicates[:, start:stop] = ((weights @ sums) / (weights @ counts)).T
+    return replicates
+
+
+def percentile_ci(replicates, alpha=ALPHA):
+    low, high = np.nanpercentile(replicates, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return low, high
+
+
+def wilcoxon_signed_rank(diffs):
+    """Wilcoxon signed-rank test, NaN when every difference is zero"""
+    try:
+        result = stats.wilcoxon(diffs)
+        return result.statistic, result.pvalue
+    except ValueError:
+        return np.nan, np.nan
+
+
+def procedure_effect(rows):
+    """Procedure effect within one group: paired t-test and Wilcoxon signed-rank test of E_3_2 vs E_3_1"""
+    if len(rows) == 0:
+        return None
+    t_stat, p_val = stats.ttest_rel(rows['E_3_2'], rows['E_3_1'])
+    w_stat, w_p = wilcoxon_signed_rank(rows['Diff'])
+    return {
+        'N': len(rows),
+        'T_stat': t_stat,
+        'P_value': p_val,
+        'Wilcoxon_stat': w_stat,
+        'Wilcoxon_P': w_p,
+    }
+
+
+def bootstrap_p_value(replicates):
+    """
+    Two-sided bootstrap p-value for a statistic being zero, from its bootstrap replicates
+
+    Twice the share of replicates on the far side of zero, so p < ALPHA exactly when zero lies outside the
+    percentile CI of the same replicates. The +1 terms keep p above zero for a finite number of replicates.
+    """
+    replicates = replicates[~np.isnan(replicates)]
+    if len(replicates) == 0:
+        return np.nan
+    tail = min((replicates <= 0).sum(), (replicates >= 0).sum())
+    return min(1.0, 2 * (tail + 1) / (len(replicates) + 1))
+
+
+def compare_groups(group1, group2, boot1, boot2):
+    """
+    Test for Delta MPE = MPE(group2) - MPE(group1), where each MPE pools every (model, case) pair of the group
+
+    The p-value comes from the same stratified case-resampling bootstrap as the CI (boot1 and boot2 are the
+    groups' rows of bootstrap_group_mpes), so it tests the pooled Delta MPE that is reported. The resampling
+    is paired when both groups were asked the same cases (e.g. R1 vs V3) and independent otherwise
+    (e.g. CN vs EN datasets).
+    """
+    cases1 = item_sums(group1).index
+    cases2 = item_sums(group2).index
+    shared = cases1.intersection(cases2)
+    if len(shared) > 0:
+        test, n = 'paired', len(cases1.union(cases2))
+    else:
+        test, n = 'independent', len(cases1) + len(cases2)
+    return {
+        'Test': test,
+        'N_items': n,
+        'P_value': bootstrap_p_value(boot2 - boot1),
+    }
+
+
+def significance_marker(p_val):
+    if pd.isna(p_val):
+        return ""
+    return "***" if p_val < 0.001 else "**" if p_val < 0.01 else "*" if p_val < 0.05 else ""
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Variance-aware MPE for E3 from the self-consistency samples (*_sampled results, see pipeline/sampling.py)
+Every row holds k answers of the same prompt (answerValues), so the spread of a case's answers measures
+model noise, and the procedure effect can be separated from it:
+  per case   mean_1, var_1, mean_2, var_2     sample mean and variance of the k months under E_3_1 / E_3_2
+             MPE            |x_2 - x_1| of the first samples (what a single-answer run measures)
+             MPE_mean       |mean_2 - mean_1|
+             Effect_sq      (mean_2 - mean_1)^2 - var_1/k_1 - var_2/k_2, an unbiased estimate of the squared
+                            procedure effect (the sampling noise of the two means removed; may be negative)
+             Noise_floor    sqrt(2/pi * (var_1 + var_2)), the expected |x_2 - x_1| of single answers when the
+                            procedure has no effect at all
+  per group  MPE_corrected  sqrt(max(0, mean Effect_sq)), the root-mean-square procedure effect in months.
+                            Per-case |mean_2 - mean_1| stays inflated by noise however it is truncated, so the
+                            correction is made on the mean of the squared effects
+Everything is computed with NumPy on (cases x k) arrays; CIs of the corrected MPE come from the stratified
+case-resampling bootstrap of paired_stats.py applied to Effect_sq
+
+Usage:
+python sampled_mpe.py
+python sampled_mpe.py --models gpt-4o deepseek-v3 --output e3_sampled_mpe.csv
+"""
+
+import argparse
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import paired_stats as ps
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pipeline'))
+import sampling
+
+warnings.filterwarnings('ignore')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODELS = ['deepseek-r1', 'deepseek-v3', 'gpt-4o', 'llama-3.3', 'qwen-2.5']
+# Result files written by pipeline/run_experiments.py; the sampled twin is <result>_sampled.parquet
+RESULT_FILES = {
+    'CN': '../cn/results_{model}.xlsx',
+    'EN': '../en/results/results_en/results_{model}.xlsx',
+}
+KEYS = ['Dataset', 'Model', 'CaseId', 'Principle']
+
+
+def load_sampled(models=MODELS):
+    """Load every sampled E3 result table that exists, with the months of all samples in answerValues"""
+    all_data = []
+    for dataset, pattern in RESULT_FILES.items():
+        for model in models:
+            path = os.path.splitext(sampling.sampled_path_for(os.path.join(BASE_DIR, pattern.format(model=model))))[0]
+            if not os.path.exists(path + '.parquet'):
+                print(f"Missing: {path}.parquet")
+                continue
+            df = pd.read_parquet(path + '.parquet', columns=['CaseId', 'Principle', 'Experiment', 'answerValues'])
+            df['Dataset'] = dataset
+            df['Model'] = model
+            all_data.append(df)
+    return pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
+
+
+def sample_matrix(cells):
+    """Array column (one list of months per row) -> float array of shape (rows, k), padded with NaN"""
+    lengths = np.array([0 if cell is None else len(cell) for cell in cells], dtype=int)
+    k = lengths.max() if len(lengths) else 0
+    matrix = np.full((len(cells), k), np.nan)
+    if k:
+        matrix[np.arange(k) < lengths[:, None]] = np.concatenate(
+            [np.asarray(cell, dtype=float) for cell in cells if cell is not None and len(cell)])
+    return matrix
+
+
+def sample_moments(matrix):
+    """Per-row number of valid samples, first sample, mean and variance (ddof=1, NaN below two samples)"""
+    valid = ~np.isnan(matrix)
+    n = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(matrix, axis=1)
+        var = np.where(n >= 2, np.nanvar(matrix, axis=1, ddof=1), np.nan)
+    first = matrix[:, 0] if matrix.shape[1] else np.full(len(matrix), np.nan)
+    return n, first, mean, var
+
+
+def build_sampled_table(df):
+    """Per-case moments under E_3_1 and E_3_2 and the three MPE estimates (see the module docstring)"""
+    sides = []
+    for experiment, suffix in (('E_3_1', '_1'), ('E_3_2', '_2')):
+        rows = df[df['Experiment'] == experiment].drop_duplicates(KEYS, keep='last')
+        n, first, mean, var = sample_moments(sample_matrix(rows['answerValues'].tolist()))
+        sides.append(pd.DataFrame({'k' + suffix: n, 'first' + suffix: first, 'mean' + suffix: mean,
+                                   'var' + suffix: var}, index=pd.MultiIndex.from_frame(rows[KEYS])))
+    table = sides[0].join(sides[1], how='inner')
+    # A case needs at least two valid samples on both sides for its variance
+    table = table[(table['k_1'] >= 2) & (table['k_2'] >= 2)]
+
+    diff = table['mean_2'].to_numpy() - table['mean_1'].to_numpy()
+    noise = table['var_1'].to_numpy() / table['k_1'].to_numpy() + table['var_2'].to_numpy() / table['k_2'].to_numpy()
+    table['Diff'] = table['first_2'] - table['first_1']
+    table['MPE'] = table['Diff'].abs()
+    table['MPE_mean'] = np.abs(diff)
+    table['Effect_sq'] = diff ** 2 - noise
+    table['Noise_floor'] = np.sqrt(2 / np.pi * (table['var_1'] + table['var_2']))
+    return table.reset_index()
+
+
+def summarize(table, n_boot=ps.N_BOOT, seed=0):
+    """Per (Dataset, Model): within-case SD, the MPE estimates, the share of MPE explained by noise, and a CI"""
+    cells = table.groupby(['Dataset', 'Model'])
+    summary = pd.DataFrame({
+        'Cases': cells.size(),
+        'k': cells[['k_1', 'k_2']].mean().mean(axis=1),
+        'SD_within': np.sqrt(cells[['var_1', 'var_2']].mean().mean(axis=1)),
+        'MPE': cells['MPE'].mean(),
+        'MPE_mean': cells['MPE_mean'].mean(),
+        'MPE_corrected': np.sqrt(cells['Effect_sq'].mean().clip(lower=0)),
+        'Noise_floor': cells['Noise_floor'].mean(),
+    })
+    summary['Noise_share'] = 1 - summary['MPE_corrected'] / summary['MPE']
+
+    # Bootstrap mean Effect_sq with the same case resampling as the single-answer analysis, then take the root
+    filters = [{'dataset': dataset, 'model_list': [model]} for dataset, model in summary.index]
+    replicates = ps.bootstrap_group_mpes(table.assign(MPE=table['Effect_sq']), filters, n_boot, seed)
+    ci = np.sqrt(np.array([ps.percentile_ci(row) for row in replicates]).reshape(-1, 2).clip(min=0))
+    summary['Corrected_CI_low'] = ci[:, 0]
+    summary['Corrected_CI_high'] = ci[:, 1]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', nargs='+', default=MODELS)
+    parser.add_argument('--n-boot', type=int, default=ps.N_BOOT)
+    parser.add_argument('--output', help='CSV of the per-cell summary (the per-case table goes next to it)')
+    args = parser.parse_args()
+
+    df = load_sampled(args.models)
+    if df.empty:
+        print("Error: No sampled results loaded. Run pipeline/run_experiments.py --samples K --experiments E3 first.")
+        return
+    table = build_sampled_table(df)
+    if table.empty:
+        print("Error: No case has at least two valid samples under both E_3_1 and E_3_2.")
+        return
+    summary = summarize(table, args.n_boot)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summary.round(3).to_string())
+    print("\nMPE: first samples (single-answer run); MPE_mean: |mean_2 - mean_1|; "
+          "MPE_corrected: root-mean-square effect with the sampling noise of the means removed")
+    print("Noise_floor: expected single-answer MPE with no procedure effect; "
+          "Noise_share: 1 - MPE_corrected / MPE")
+    print(f"CIs: 95% percentile bootstrap of MPE_corrected over cases ({args.n_boot} replicates)")
+
+    if args.output:
+        summary.to_csv(args.output)
+        cases_file = os.path.splitext(args.output)[0] + '_cases.csv'
+        table.to_csv(cases_file, index=False)
+        print(f"\nResults saved to '{args.output}' and '{cases_file}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,31 @@
-import pandas as pd
-from openai import OpenAI
-import re
+import asyncio
+import os
+import sys
 
-def extract_all_numbers(s):
-    """
-    从字符串中提取所有连续的数字。
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pipeline'))
+import collect
+import sentence_extractor
+from response_cache import ResponseCache
 
-    参数:
-    s -- 输入字符串
+SYSTEM_PROMPT = "You are a helpful assistant."
+FORMAT_SUFFIX = "\nStrictly limit your response format to only: x months\nAmong which, x must consist of Arabic numerals.You cannot avoid answering the question and must provide the value of x."
 
-    返回:
-    一个包含所有连续数字的列表。
-    """
-    return re.findall(r'\d+', s)
 
-def get_answers_by_llm(llm_name, model, api_key, base_url, result_file):
-    start_row = 1
-    # 检查文件是否存在，如果存在就先读取已有的数据
+async def get_answers_by_llm_async(llm_name, model, api_key, base_url, result_file, pool=None, api="chat",
+                                   cache=None):
+    # 断点续跑、并发、回复缓存与结果格式由 pipeline/collect.py 统一处理
+    own_cache = cache is None
+    if own_cache:
+        cache = ResponseCache()
     try:
-        existing_df = pd.read_excel(result_file)
-        start_row = len(existing_df) + 1
-    except FileNotFoundError:
-        existing_df = None
-    # 读取 Excel 文件
-    df = pd.read_excel('data/prompts_new_EN.xlsx', header=None, skiprows=start_row)
-    case_id = df[0].tolist()
-    principle = df[1].tolist()
-    experiment = df[2].tolist()
-    answer = []
-    answer_value = []
-    prompt = df[4].tolist()
-
-    client = OpenAI(
-        api_key=api_key,
-        base_url=base_url
-    )
-
-    i_temp = start_row
-    # result_file = 'results/results_llama-3.3.xlsx'
-    for pro in prompt:
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": pro + "\nStrictly limit your response format to only: x months\nAmong which, x must consist of Arabic numerals.You cannot avoid answering the question and must provide the value of x."}
-                ],
-            )
-            res = response.choices[0].message.content
-            if isinstance(res, str):
-                answer.append(res)
-                value_list = extract_all_numbers(res)
-                if len(value_list) == 0:
-                    answer_value.append("")
-                else:
-                    answer_value.append(value_list[-1])
-            else:
-                answer.append("")
-                answer_value.append("")
-            print(llm_name, "第", i_temp, "次已完成")
-        except:
-            answer.append("")
-            answer_value.append("")
-            print(llm_name, "第", i_temp, "次失败")
+        await collect.collect_answers(llm_name, model, api_key, base_url, 'data/prompts_new_EN.xlsx', result_file,
+                                      system_prompt=SYSTEM_PROMPT, suffix=FORMAT_SUFFIX, extract_value=sentence_extractor.months_of,
+                                      pool=pool, api=api, cache=cache,
+                                      meta={"model": llm_name, "dataset": "EN"}, xlsx=True)
+    finally:
+        if own_cache:
+            cache.close()
 
-        # 每次循环迭代后保存到文件中
-        data = {
-            'CaseId': [case_id[i_temp-start_row]],
-            'Principle': [principle[i_temp-start_row]],
-            'Experiment': [experiment[i_temp-start_row]],
-            'answer': [answer[i_temp-start_row]],
-            'answerValue': [answer_value[i_temp-start_row]],
-            'prompt': [prompt[i_temp-start_row]]
-        }
 
-        df_row = pd.DataFrame(data)
-        # 如果文件存在，就追加写入，否则就新建文件
-        if existing_df is not None:
-            # 每次写入前重新读取文件，以确保数据是最新的
-            existing_df = pd.read_excel(result_file)
-            existing_df = pd.concat([existing_df, df_row])
-            existing_df.to_excel(result_file, index=False)
-        else:
-            df_row.to_excel(result_file, index=False)
-            existing_df = pd.read_excel(result_file)
-
-        print(llm_name, "第", i_temp, "条数据已保存至 ", result_file)
-        i_temp = i_temp + 1
-    print("结果已保存至 ", result_file)
+def get_answers_by_llm(llm_name, model, api_key, base_url, result_file):
+    asyncio.run(get_answers_by_llm_async(llm_name, model, api_key, base_url, result_file))
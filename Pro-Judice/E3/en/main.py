@@ -1,6 +1,10 @@
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
 import llm_qa_process as lp
+# llm_qa_process 已把 pipeline 目录加入 sys.path
+import async_engine as ae
 
+# api_key 处可以写 key 的列表，请求会分散到各个 key 上(见 pipeline/key_pool.py)
 tasks = [
 	("llama-3.3", "meta-llama/llama-3.3-70b-instruct", "**********"
 	, "https://openrouter.ai/api/v1", "results/results_llama-3.3.xlsx"),
@@ -12,26 +16,28 @@ tasks = [
 	# , "https://api.deepseek.com", "results/results_deepseek-r1.xlsx")
 ]
 
+async def run_tasks():
+	# 所有任务共用一个事件循环，同一 base_url 的模型共享并发上限
+	pool = ae.ProviderPool()
+	cache = lp.ResponseCache()
+	coroutines = [lp.get_answers_by_llm_async(*task, pool=pool, cache=cache) for task in tasks]
+	try:
+		return await asyncio.gather(*coroutines, return_exceptions=True)
+	finally:
+		cache.close()
+		await pool.close()
+
 def main():
-	if len(tasks) > 5:
-		print("线程数大于5，请人工复查后重新运行代码")
-		return
 	print(f"启动 {len(tasks)} 个并行数据处理任务")
 	failed_tasks = []
 
-	with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
-		# 提交所有任务
-		futures = {executor.submit(lp.get_answers_by_llm, *task): task for task in tasks}
-
-		# 等待并检查所有任务
-		for future in futures:
-			task_params = futures[future]
-			try:
-				future.result()  # 仅用于捕获异常
-				print(f"!!!!任务成功: {task_params[0]}")
-			except Exception as e:
-				failed_tasks.append(task_params)
-				print(f"!!!!任务失败: {task_params[0]} - {e}")
+	results = asyncio.run(run_tasks())
+	for task_params, result in zip(tasks, results):
+		if isinstance(result, Exception):
+			failed_tasks.append(task_params)
+			print(f"!!!!任务失败: {task_params[0]} - {result}")
+		else:
+			print(f"!!!!任务成功: {task_params[0]}")
 
 	# 结果统计
 	success_count = len(tasks) - len(failed_tasks)
@@ -43,4 +49,4 @@ def main():
 			print(f"  - {task[0]}")
 
 if __name__ == "__main__":
-	main()
\ No newline at end of file
+	main()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+E1(是/否、Yes/No)与 E2(A/B)回答的分类器，对整列回答做向量化的 Series.str 处理。
+
+先统一格式：去掉 DeepSeek-R1 等模型的 <think>…</think> 推理段、全角字符转半角、去掉 markdown 标记；
+再按可信度从高到低依次尝试预编译的正则，每一级只处理上一级未识别的行：
+  1.0  整个回答就是选项本身，如 "否。"、"**B**"
+  0.9  回答以选项开头，如 "No, because..."、"答案：A"
+  0.7  正文中明确给出选项，如 "the answer is no"、"判决不公正"、"选择B"
+  0.5  正文中只提到一个选项
+  0.3  正文中两个选项都出现，取第一个
+空回答的 label 为 ""，无法识别的为 None，两者 confidence 均为 0。
+
+用法:
+python answer_classifier.py E1 results/E1_en_results_gpt-4o.parquet
+"""
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+EMPTY = ""
+
+# 全角 ASCII(！到～)与全角空格转为半角
+FULL_WIDTH = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+FULL_WIDTH[0x3000] = 0x20
+
+THINK_CLOSED = re.compile(r'(?s)<think>.*?</think>')
+# 没有闭合标签时(输出被截断)，只保留 </think> 之后的部分；连 </think> 都没有则整段都是推理
+THINK_OPEN = re.compile(r'(?s)^.*</think>|<think>.*$')
+MARKDOWN = re.compile(r'[*_`#>~]+|\[|\]')
+SPACES = re.compile(r'\s+')
+
+PUNCT = r'[\s.,;:!?。，；：！？、)\]）】"\'“”]*'
+PREFIX = r'(?:final\s+answer|answer|option|choice|最终答案|我的回答|我选择|回答|答案|选项|结论|选择|选)?(?:\s|[:：(（]|是|为)*'
+# 照抄题目中的 "A 或 B" / "A or B" 不算作选择
+NOT_ECHO = r'(?!\s*(?:或|or|/)\s*[AB](?![A-Za-z]))'
+
+# 是/否 选项："不是" 是否定回答；"是不公正的" 中的 "是" 不是肯定回答
+CN_YES_NO = r'不是|是(?!\s*不)|否'
+YES_NO = rf'(yes|no|{CN_YES_NO})'
+# "不公正"、"不是公正的"、"不太公平" 等否定说法只捕获 "不"，先于 "公正"/"公平" 匹配
+NOT_FAIR = r'不(?=(?:是|太|很|够|完全)?(?:公正|公平))'
+
+# 各级正则: (可信度, 正则)，捕获组即选项，同一级有多个捕获组时取第一个匹配到的
+YES_NO_TIERS = [
+    (1.0, re.compile(rf'(?i)^{PREFIX}{YES_NO}{PUNCT}$')),
+    (0.9, re.compile(rf'(?i)^{PREFIX}{YES_NO}(?![a-z])')),
+    (0.7, re.compile(rf'(?i)(?:answer\s+is|answer\s*:|回答[:：]?|答案[:：]?(?:是|为)?|选择?)\s*{YES_NO}(?![a-z])'
+                     rf'|(not\s+fair|unfair|is\s+fair|{NOT_FAIR}|公正|公平)')),
+    (0.5, re.compile(rf'(?i)(?<![a-z])(yes|no)(?![a-z])|({CN_YES_NO})')),
+]
+YES_NO_LABELS = {
+    'yes': 'Yes', 'no': 'No', '是': 'Yes', '否': 'No', '不是': 'No',
+    'not fair': 'No', 'unfair': 'No', 'is fair': 'Yes',
+    '不': 'No', '公正': 'Yes', '公平': 'Yes',
+}
+# 题干中的 "是否公正" / "Is the judgment fair?" 不是回答
+YES_NO_STRIP = re.compile(r'(?i)是否(?:公正|公平)?|is\s+the\s+judgment\s+fair\??')
+
+CHOICE_TIERS = [
+    (1.0, re.compile(rf'(?i)^{PREFIX}(?:option\s*|选项\s*)?([AB]){PUNCT}$')),
+    (0.9, re.compile(rf'^{PREFIX}(?:[Oo]ption\s*|选项\s*)?([AB])(?![A-Za-z]){NOT_ECHO}')),
+    (0.7, re.compile(r'(?:[Aa]nswer\s+is|[Cc]hoose|[Ss]elect|[Oo]ption|选择|选项|应选|选|答案[:：]?(?:是|为)?)\s*[:：]?\s*([AB])(?![A-Za-z])'
+                     + NOT_ECHO)),
+    (0.5, re.compile(r'(?<![A-Za-z])([AB])(?![A-Za-z])')),
+]
+CHOICE_LABELS = {'a': 'A', 'b': 'B'}
+
+KINDS = {
+    # 实验 -> (各级正则, 匹配文本 -> 标签, 匹配前需去掉的词)
+    'E1': (YES_NO_TIERS, YES_NO_LABELS, YES_NO_STRIP),
+    'E2': (CHOICE_TIERS, CHOICE_LABELS, None),
+}
+AMBIGUOUS = 0.3
+
+
+def normalize(answers):
+    """去掉推理段、全角转半角、去掉 markdown 标记并压缩空白。"""
+    s = answers.fillna('').astype(str)
+    s = s.str.replace(THINK_CLOSED, ' ', regex=True)
+    has_think = s.str.contains('<think>|</think>', regex=True)
+    if has_think.any():
+        s[has_think] = s[has_think].str.replace(THINK_OPEN, ' ', regex=True)
+    s = s.str.translate(FULL_WIDTH)
+    s = s.str.replace(MARKDOWN, '', regex=True)
+    return s.str.replace(SPACES, ' ', regex=True).str.strip()
+
+
+def _first_group(matches):
+    """str.extract 的多个捕获组中取第一个非空的。"""
+    if isinstance(matches, pd.Series):
+        return matches
+    result = matches.iloc[:, 0]
+    for column in matches.columns[1:]:
+        result = result.fillna(matches[column])
+    return result
+
+
+def classify(answers, experiment):
+    """
+    对一列回答分类。
+
+    参数:
+    answers -- 回答文本的 Series
+    experiment -- "E1"(是/否) 或 "E2"(A/B)
+
+    返回:
+    与 answers 同索引的 DataFrame，列 label(Yes/No/A/B，空回答为 ""，无法识别为 None)与 confidence。
+    """
+    tiers, labels, strip = KINDS[experiment]
+    text = normalize(answers)
+    if strip is not None:
+        text = text.str.replace(strip, ' ', regex=True)
+    empty = (answers.fillna('').astype(str).str.strip() == '').to_numpy()
+    label = pd.Series(None, index=answers.index, dtype=object)
+    confidence = np.zeros(len(answers))
+    pending = (text != '').to_numpy().copy()
+
+    for score, pattern in tiers:
+        if not pending.any():
+            break
+        found = _first_group(text[pending].str.extract(pattern, expand=False))
+        mapped = found.str.lower().str.replace(SPACES, ' ', regex=True).map(labels)
+        hit = mapped.notna()
+        rows = np.flatnonzero(pending)[hit.to_numpy()]
+        label.iloc[rows] = mapped[hit].to_numpy()
+        confidence[rows] = score
+        pending[rows] = False
+
+    # 最低一级中两个选项都出现时降低可信度
+    lowest, pattern = tiers[-1]
+    low = confidence == lowest
+    if low.any():
+        mentions = text[low].str.findall(pattern).map(
+            lambda found: {labels.get((m if isinstance(m, str) else ''.join(m)).lower()) for m in found})
+        confidence[np.flatnonzero(low)[(mentions.map(len) > 1).to_numpy()]] = AMBIGUOUS
+
+    label[empty] = EMPTY
+    return pd.DataFrame({'label': label, 'confidence': confidence}, index=answers.index)
+
+
+def first_char_label(answers, experiment):
+    """旧脚本的做法：只看回答的第一个字符(get_answers_by_qwen-2.5.py 中的 res[0])，用作基准对照。"""
+    first = answers.fillna('').astype(str).str[:1].str.upper()
+    mapping = {'Y': 'Yes', 'N': 'No', '是': 'Yes', '否': 'No'} if experiment == 'E1' else {'A': 'A', 'B': 'B'}
+    return first.map(mapping).astype(object).where(lambda s: s.notna(), None)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in KINDS:
+        print("用法: python answer_classifier.py E1|E2 <结果文件.parquet|.xlsx>")
+        sys.exit(1)
+    path = sys.argv[2]
+    df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_excel(path)
+    result = classify(df['answer'], sys.argv[1])
+    print(result['label'].value_counts(dropna=False).to_string())
+    print(result['confidence'].value_counts().sort_index(ascending=False).to_string())
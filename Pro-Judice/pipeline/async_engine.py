@@ -0,0 +1,428 @@
+import asyncio
+import contextlib
+import time
+
+from openai import AsyncOpenAI
+
+import hedging as hg
+import key_pool as kp
+import rate_limit as rl
+import telemetry as tm
+from response_cache import cache_key
+
+# 各服务商(按 base_url 区分)同时在途的请求数上限，可按账号额度在此调整
+PROVIDER_CONCURRENCY = {
+    "https://api.deepseek.com": 16,
+    "https://dashscope.aliyuncs.com/compatible-mode/v1": 8,
+    "https://openrouter.ai/api/v1": 8,
+    "https://api.openai.com/v1": 16,
+}
+# 未登记的 base_url(如本地 mock 服务)使用的默认上限
+DEFAULT_CONCURRENCY = 4
+# 可重试错误的最大尝试次数(含第一次)
+MAX_ATTEMPTS = 6
+# 按组调度(run_prompts 的 groups)时同时展开的组数
+DEFAULT_GROUP_WINDOW = 16
+
+
+def provider_setting(base_url, name, overrides=None):
+    """
+    查询某个服务商的并发上限(name="concurrency")或每分钟请求数(name="rpm")。
+
+    参数:
+    base_url -- 服务商接口地址
+    name -- 设置项名称
+    overrides -- 可选的 {base_url: {"concurrency": n, "rpm": m}} 字典，优先于模块内默认值
+
+    返回:
+    对应的设置值。
+    """
+    key = base_url.rstrip('/')
+    if overrides and name in overrides.get(key, {}):
+        return overrides[key][name]
+    if name == "concurrency":
+        return PROVIDER_CONCURRENCY.get(key, DEFAULT_CONCURRENCY)
+    return rl.PROVIDER_RPM.get(key, rl.DEFAULT_RPM)
+
+
+class ProviderPool:
+    """
+    按 base_url 共享的并发信号量与限速器，同一服务商下的多个模型共用一套上限。
+    """
+
+    def __init__(self, overrides=None, hedge_budget=0):
+        self.overrides = {k.rstrip('/'): v for k, v in (overrides or {}).items()}
+        self.hedge_budget = hedge_budget
+        self._semaphores = {}
+        self._limiters = {}
+        self._hedges = {}
+        self._keys = {}
+
+    def semaphore(self, base_url):
+        key = base_url.rstrip('/')
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(provider_setting(key, "concurrency", self.overrides))
+        return self._semaphores[key]
+
+    def limiter(self, base_url):
+        key = base_url.rstrip('/')
+        if key not in self._limiters:
+            self._limiters[key] = rl.AdaptiveRateLimiter(provider_setting(key, "rpm", self.overrides))
+        return self._limiters[key]
+
+    def hedger(self, base_url, model):
+        """
+        该服务商该模型的 HedgePolicy(见 hedging.py)；overrides 中的 hedge_budget 优先于 hedge_budget，
+        预算为 0 时返回 None(不对冲)。
+        """
+        key = base_url.rstrip('/')
+        budget = self.overrides.get(key, {}).get("hedge_budget", self.hedge_budget)
+        if not budget:
+            return None
+        if (key, model) not in self._hedges:
+            self._hedges[(key, model)] = hg.HedgePolicy(budget)
+        return self._hedges[(key, model)]
+
+    def keys(self, base_url, api_keys):
+        """
+        该服务商这组 key 的 KeyPool(见 key_pool.py)，同一组 key 的各模型共用；
+        每个 key 有自己的客户端、并发信号量与限速器，上限为该服务商的 concurrency / rpm。
+        """
+        key = base_url.rstrip('/')
+        api_keys = tuple(api_keys)
+        if (key, api_keys) not in self._keys:
+            concurrency = provider_setting(key, "concurrency", self.overrides)
+            rpm = provider_setting(key, "rpm", self.overrides)
+            self._keys[(key, api_keys)] = kp.KeyPool(
+                kp.Credential(api_key, make_client(api_key, base_url), asyncio.Semaphore(concurrency),
+                              rl.AdaptiveRateLimiter(rpm)) for api_key in api_keys)
+        return self._keys[(key, api_keys)]
+
+    async def close(self):
+        """关闭各 KeyPool 的客户端。"""
+        for keys in self._keys.values():
+            await keys.close()
+
+
+@contextlib.asynccontextmanager
+async def provider_slot(semaphore, limiter=None):
+    """单个 key 时一次发送的名额：先取限速令牌，再占用服务商的并发信号量。"""
+    if limiter is not None:
+        await limiter.acquire()
+    async with semaphore:
+        yield None
+
+
+def make_client(api_key, base_url):
+    # 重试由 run_prompts 统一处理，关闭 SDK 自带的重试以免叠加
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+
+async def request_answer(client, model, messages, api="chat", **params):
+    """
+    发送一次请求并返回模型回复文本。
+
+    参数:
+    client -- AsyncOpenAI 客户端
+    model -- 模型名
+    messages -- chat 格式的消息列表
+    api -- "chat" 使用 chat.completions，"responses" 使用 responses 接口(gpt-4o 脚本的调用方式)
+
+    返回:
+    (回复文本, token 用量, 首个 token 的候选)，回复文本可能为 None，token 用量见 telemetry.usage_of；
+    请求了 logprobs 时第三项为 [{"token", "logprob"}, ...]，否则为 None。
+    参数中 n > 1 时(一次请求取多个回答)回复文本为各 choice 的文本列表。
+    """
+    if api == "responses":
+        # responses 接口只接收一段输入，沿用 gpt4o_qa_process 的做法只发送用户消息
+        response = await client.responses.create(model=model, input=messages[-1]["content"], **params)
+        return response.output_text, tm.usage_of(response), None
+    response = await client.chat.completions.create(model=model, messages=messages, **params)
+    if params.get("n", 1) > 1:
+        return [choice.message.content for choice in response.choices], tm.usage_of(response), None
+    choice = response.choices[0]
+    top_logprobs = None
+    if params.get("logprobs"):
+        content = getattr(choice.logprobs, "content", None) or []
+        top_logprobs = [{"token": t.token, "logprob": t.logprob} for t in content[0].top_logprobs] if content else []
+    return choice.message.content, tm.usage_of(response), top_logprobs
+
+
+async def stream_answer(client, model, messages, api="chat", stop_when=None, **params):
+    """
+    以流式方式发送一次请求，逐块拼接回复；stop_when(已收到的回复) 为 True 时关闭连接，不再等待其余内容。
+
+    返回:
+    (回复文本, token 用量, None, 流式信息)，流式信息为 {"ttft": 首 token 时间, "tta": 回答可判定的时间,
+    "stopped": 是否提前结束, "reasoning": 推理模型的思考过程(reasoning_content)，没有时为 None}；
+    提前结束时收不到服务商的 usage，token 数按 telemetry.estimate_tokens 估算。
+    """
+    start = time.perf_counter()
+    content, reasoning, usage = [], [], {}
+    info = {"ttft": None, "tta": None, "stopped": False, "reasoning": None}
+    if api == "responses":
+        stream = await client.responses.create(model=model, input=messages[-1]["content"], stream=True, **params)
+    else:
+        stream = await client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                      stream_options={"include_usage": True}, **params)
+    try:
+        async for event in stream:
+            if api == "responses":
+                if event.type == "response.completed":
+                    usage = tm.usage_of(event.response)
+                text, thought = (event.delta if event.type == "response.output_text.delta" else None), None
+            else:
+                if getattr(event, "usage", None):
+                    usage = tm.usage_of(event)
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta
+                text, thought = delta.content, getattr(delta, "reasoning_content", None)
+            if (text or thought) and info["ttft"] is None:
+                info["ttft"] = time.perf_counter() - start
+            if thought:
+                reasoning.append(thought)
+            if text:
+                content.append(text)
+                if stop_when is not None and stop_when("".join(content)):
+                    info["stopped"] = True
+                    break
+    finally:
+        await stream.close()
+    info["tta"] = time.perf_counter() - start
+    content, info["reasoning"] = "".join(content), "".join(reasoning) or None
+    if info["stopped"]:
+        prompt_text = "".join(str(message["content"]) for message in messages)
+        usage = {"prompt_tokens": tm.estimate_tokens(prompt_text),
+                 "completion_tokens": tm.estimate_tokens(content + (info["reasoning"] or "")),
+                 "reasoning_tokens": tm.estimate_tokens(info["reasoning"] or "")}
+    return content, usage, None, info
+
+
+async def request_with_retry(llm_name, index, model, client, semaphore, messages, limiter=None,
+                             max_attempts=MAX_ATTEMPTS, api="chat", stream=False, stop_when=None, hedge=None,
+                             keys=None, **params):
+    """
+    带限速与重试的单次请求。可重试的错误按 Retry-After 或带抖动的指数退避等待后重发，
+    等待期间不占用并发名额；不可重试的错误立即放弃。stream 为 True 时以流式方式请求(见 stream_answer)；
+    给定 hedge(hedging.HedgePolicy)时，耗时超过阈值的发送另发一份副本，先返回者为准(见 hedging.race)。
+    给定 keys(key_pool.KeyPool)时，每次发送从池中挑一个 key，使用它的客户端、并发信号量与限速器
+    (client、semaphore、limiter 不再使用)；key 鉴权失败或额度耗尽时隔离该 key，立即换一个 key 重发。
+
+    返回:
+    (回复文本, 错误描述, 遥测)，成功时错误描述为 None；
+    遥测为 {"attempts": 发送次数, "latency": 最后一次发送的耗时, "usage": token 用量, "top_logprobs": 首个 token 的候选}，
+    流式请求另有 stream_answer 的 ttft、tta、stopped 与 reasoning，对冲的请求另有 hedged、hedge_won 与 hedge_saved，
+    使用 key 池时 key 为最后一次发送所用 key 的标识(key_pool.mask)。
+    """
+    info = {"attempts": 0, "latency": None, "usage": {}, "top_logprobs": None,
+            "ttft": None, "tta": None, "stopped": False, "reasoning": None,
+            "hedged": False, "hedge_won": False, "hedge_saved": None, "key": None}
+
+    async def send():
+        if stream:
+            return await stream_answer(client, model, messages, api=api, stop_when=stop_when, **params)
+        return (*await request_answer(client, model, messages, api=api, **params), {})
+
+    for attempt in range(max_attempts):
+        credential = None
+        try:
+            async with (keys.slot() if keys is not None else provider_slot(semaphore, limiter)) as credential:
+                if credential is not None:
+                    client, limiter = credential.client, credential.limiter
+                    info["key"] = credential.label
+                info["attempts"] += 1
+                start = time.perf_counter()
+                try:
+                    if hedge is None:
+                        res, info["usage"], info["top_logprobs"], streamed = await send()
+                    else:
+                        (res, info["usage"], info["top_logprobs"], streamed), hedged = await hg.race(
+                            send, hedge, limiter)
+                        info.update(hedged)
+                    info.update(streamed)
+                    info["latency"] = time.perf_counter() - start
+                    if limiter is not None:
+                        limiter.on_success()
+                    return res, None, info
+                except Exception as e:
+                    info["latency"] = time.perf_counter() - start
+                    error = e
+        except kp.NoActiveKey as e:
+            error = e
+        key_kind = kp.key_error(error) if credential is not None else None
+        if key_kind is not None and attempt < max_attempts - 1:
+            # 问题出在 key 本身，换一个 key 立即重发，不必退避
+            keys.quarantine(credential, key_kind, error)
+            continue
+        kind = rl.classify_error(error)
+        if kind == rl.PERMANENT or attempt == max_attempts - 1:
+            print(llm_name, "第", index, "次失败", f"({kind})", error)
+            return None, f"{kind}: {error}", info
+        delay = rl.retry_after_seconds(error)
+        if limiter is not None and rl.is_rate_limited(error):
+            limiter.on_rate_limited(delay)
+        if delay is None:
+            delay = rl.backoff_delay(attempt)
+        print(llm_name, "第", index, "次出错，", f"{delay:.1f}s 后重试:", error)
+        await asyncio.sleep(delay)
+
+
+async def request_samples(llm_name, index, model, client, semaphore, messages, samples, n_param=False, limiter=None,
+                          api="chat", hedge=None, keys=None, **params):
+    """
+    同一条 prompt 取 samples 个回答。n_param 为 True 时一次请求带 n=samples(服务商返回的回答不足 n 个时，
+    其余的逐次补齐)，否则并发发送 samples 次请求。
+
+    返回:
+    (回答列表, 错误描述, 遥测)，任一次请求失败时错误描述不为 None，整行下次重新采样；
+    遥测同 request_with_retry，attempts 与 usage 为各次请求之和，latency 为最慢的一次，另有 calls 为请求数；
+    任一次请求对冲时 hedged 为 True，hedge_won 与 hedge_saved 按各次请求合计。
+    """
+    outcomes = []
+    answers = []
+    if n_param:
+        outcome = await request_with_retry(llm_name, index, model, client, semaphore, messages, limiter=limiter,
+                                           api=api, hedge=hedge, keys=keys, n=samples, **params)
+        outcomes.append(outcome)
+        answers = list(outcome[0] or [])[:samples]
+    missing = samples - len(answers)
+    if missing > 0 and not (outcomes and outcomes[0][1] is not None):
+        extra = await asyncio.gather(*(request_with_retry(llm_name, index, model, client, semaphore, messages,
+                                                          limiter=limiter, api=api, hedge=hedge, keys=keys,
+                                                          **params)
+                                       for _ in range(missing)))
+        outcomes.extend(extra)
+        answers.extend(res for res, _, _ in extra)
+    error = next((error for _, error, _ in outcomes if error is not None), None)
+    infos = [info for _, _, info in outcomes]
+    info = dict(infos[0], attempts=sum(i["attempts"] for i in infos), calls=len(infos),
+                hedged=any(i["hedged"] for i in infos), hedge_won=any(i["hedge_won"] for i in infos),
+                hedge_saved=sum(i["hedge_saved"] or 0.0 for i in infos) if any(i["hedged"] for i in infos) else None,
+                latency=max((i["latency"] for i in infos if i["latency"] is not None), default=None),
+                usage={column: sum(i["usage"].get(column, 0) for i in infos) for column in tm.TOKEN_COLUMNS})
+    return answers, error, info
+
+
+async def run_prompts(llm_name, model, client, semaphore, messages_list, on_result=None,
+                      indices=None, api="chat", cache=None, limiter=None, telemetry=None,
+                      groups=None, group_window=None, stream=False, stop_when=None, samples=1, n_param=False,
+                      hedge=None, keys=None, **params):
+    """
+    在并发与速率限制下发送一组对话，结果按 prompt 顺序回写。
+
+    参数:
+    llm_name -- 用于打印进度的模型简称
+    model -- 模型名
+    client -- AsyncOpenAI 客户端
+    semaphore -- 该服务商共享的 asyncio.Semaphore
+    messages_list -- 每条 prompt 对应的消息列表
+    on_result -- 可选回调 on_result(序号, 回复, 错误描述, 遥测)，严格按 prompt 顺序调用，可用于断点保存；
+                 成功时错误描述为 None，遥测为 telemetry.request_record 的记录(耗时、重试与 token)，
+                 另有 top_logprobs(请求了 logprobs 时为首个 token 的候选)与 reasoning(流式请求中推理模型的思考过程)
+    indices -- 每条 prompt 的序号(输入表中的行号)，默认 1..n，仅用于打印与回调
+    api -- 见 request_answer
+    cache -- 可选的 ResponseCache，命中时不发送请求，成功的回复写入缓存
+    limiter -- 可选的 AdaptiveRateLimiter，同一服务商共享
+    telemetry -- 可选的 telemetry.Telemetry，每条 prompt 记录一行耗时、token、重试与费用
+    groups -- 可选，每条 prompt 所属的组(如 CaseId)，同组 prompt 共用同一段前缀(系统提示 + 案件事实)。
+              给定时按组调度：每组先发第一条，完成后服务商已缓存共同前缀，再并发发送其余各条；
+              同时展开的组数不超过 group_window(默认 16)，使同一案件的请求在时间上相邻
+    group_window -- 见 groups
+    stream -- 为 True 时以流式方式请求，遥测中记录首 token 时间(ttft)与回答可判定的时间(tta)
+    stop_when -- 可选函数 已收到的回复 -> 是否提前结束(streaming.stopper)，只在流式请求时生效；
+                 提前结束的回复不写入缓存
+    samples -- 每条 prompt 取的回答数，大于 1 时回复为回答列表(见 request_samples)，不读写缓存
+    n_param -- 服务商支持 n 参数时为 True，samples 个回答在一次请求中取得
+    hedge -- 可选的 hedging.HedgePolicy，同一服务商同一模型共享；耗时超过近期 p95 的请求另发一份副本
+    keys -- 可选的 key_pool.KeyPool，给定时请求分散到池中的各个 key 上，client、semaphore 与 limiter 不再使用
+
+    返回:
+    与 messages_list 等长的回复列表，失败或非文本回复记为空字符串(samples > 1 时每项为回答列表)。
+    """
+    if samples > 1:
+        # 缓存只保存一条回复，采样要的正是每次不同的回答
+        cache = None
+    total = len(messages_list)
+    if indices is None:
+        indices = range(1, total + 1)
+    results = [None] * total
+    errors = [None] * total
+    infos = [None] * total
+    done = [False] * total
+    next_emit = 0
+
+    async def worker(i, messages):
+        nonlocal next_emit
+        key = cache_key(model, messages, api=api, **params) if cache is not None else None
+        res = cache.get(key) if cache is not None else None
+        started = time.time()
+        start = time.perf_counter()
+        if res is not None:
+            print(llm_name, "第", indices[i], "次命中缓存")
+            status, info = "cached", {"attempts": 0, "latency": None, "usage": {}, "top_logprobs": None,
+                                      "ttft": None, "tta": None, "stopped": False, "reasoning": None,
+                                      "hedged": False, "hedge_won": False, "hedge_saved": None, "key": None}
+        else:
+            if samples > 1:
+                res, errors[i], info = await request_samples(llm_name, indices[i], model, client, semaphore,
+                                                             messages, samples, n_param, limiter=limiter, api=api,
+                                                             hedge=hedge, keys=keys, **params)
+            else:
+                res, errors[i], info = await request_with_retry(llm_name, indices[i], model, client, semaphore,
+                                                                messages, limiter=limiter, api=api, stream=stream,
+                                                                stop_when=stop_when, hedge=hedge, keys=keys,
+                                                                **params)
+            status = "ok" if errors[i] is None else "error"
+            if errors[i] is None:
+                print(llm_name, "第", indices[i], "次已完成" + ("(提前结束)" if info["stopped"] else ""))
+            # 只缓存完整的有效回复，失败、空回复与提前结束的回复下次仍会重新请求
+            if cache is not None and isinstance(res, str) and res and not info["stopped"]:
+                cache.put(key, model, res)
+        infos[i] = tm.request_record(indices[i], status, info["attempts"], started, info["latency"],
+                                     time.perf_counter() - start, ttft=info["ttft"], usage=info["usage"],
+                                     tta=info["tta"], stopped=info["stopped"], calls=info.get("calls", 1),
+                                     hedged=info["hedged"], hedge_won=info["hedge_won"],
+                                     hedge_saved=info["hedge_saved"], key=info["key"])
+        if telemetry is not None:
+            infos[i] = telemetry.record(infos[i])
+        # 首个 token 的候选与思考过程不写入遥测，只交给回调(logprob 打分模式、keep_reasoning)
+        infos[i]["top_logprobs"] = info["top_logprobs"]
+        infos[i]["reasoning"] = info["reasoning"]
+        results[i] = res if isinstance(res, (str, list)) else ""
+        done[i] = True
+        # 只回写已连续完成的前缀，保证落盘顺序与 prompt 顺序一致
+        while next_emit < total and done[next_emit]:
+            if on_result is not None:
+                on_result(indices[next_emit], results[next_emit], errors[next_emit], infos[next_emit])
+            next_emit += 1
+
+    if groups is None:
+        await asyncio.gather(*(worker(i, m) for i, m in enumerate(messages_list)))
+        return results
+
+    window = asyncio.Semaphore(group_window or DEFAULT_GROUP_WINDOW)
+    states = {}
+    for i, group in enumerate(groups):
+        state = states.setdefault(group, {"leader": i, "left": 0, "ready": asyncio.Event()})
+        state["left"] += 1
+
+    async def grouped_worker(i, messages):
+        state = states[groups[i]]
+        try:
+            if i == state["leader"]:
+                await window.acquire()
+                try:
+                    await worker(i, messages)
+                finally:
+                    state["ready"].set()
+            else:
+                await state["ready"].wait()
+                await worker(i, messages)
+        finally:
+            state["left"] -= 1
+            if state["left"] == 0:
+                window.release()
+
+    await asyncio.gather(*(grouped_worker(i, m) for i, m in enumerate(messages_list)))
+    return results
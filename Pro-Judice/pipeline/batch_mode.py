@@ -0,0 +1,193 @@
+"""
+Batch API 提交模式：把一个 prompt 表中尚未完成的行写成 Batch 输入 JSONL，提交、轮询，
+完成后按行号把结果合并回结果日志(每行携带 CaseId/Principle/Experiment 等原始列)。
+
+批处理价格约为实时接口的一半，且不占用实时接口的速率额度，也不需要客户端并发。
+提交后的批次号保存在结果文件旁的 .batch.json 中，中断后再次运行会继续轮询同一批次，不会重复提交。
+
+LocalBatchBackend 是基于本地目录的替身，接口与 OpenAIBatchBackend 相同，用于离线测试。
+"""
+import asyncio
+import json
+import os
+import uuid
+
+import pandas as pd
+
+import collect
+import telemetry as tm
+from openai_bodies import chat_completion_body
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "expired", "cancelled", "failed")
+
+
+def custom_id_for(job_name, row):
+    return f"{job_name}:{row}"
+
+
+def row_of(custom_id):
+    return int(custom_id.rsplit(':', 1)[1])
+
+
+def write_batch_input(path, job_name, model, table, system_prompt=None, suffix="", **params):
+    """把 table 中未完成的行写成 Batch 输入文件，返回写入的行号列表。"""
+    rows = table.pending_rows
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            body = dict(params, model=model,
+                        messages=collect.build_messages(table.prompt(row), system_prompt, suffix))
+            line = {"custom_id": custom_id_for(job_name, row), "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+            f.write(json.dumps(line, ensure_ascii=False) + '\n')
+    return rows
+
+
+def parse_batch_output(text):
+    """
+    解析 Batch 输出(或错误)文件。
+
+    返回:
+    [(行号, 回复文本, 错误描述, token 用量)]，成功时错误描述为 None。
+    """
+    results = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        row = row_of(item["custom_id"])
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            error = item.get("error") or response.get("body", {}).get("error")
+            results.append((row, "", f"batch: {error}", {}))
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        results.append((row, content if isinstance(content, str) else "", None, tm.usage_of(response["body"])))
+    return results
+
+
+class OpenAIBatchBackend:
+    """OpenAI 兼容服务商的 Batch API(files + batches 接口)。"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def submit(self, input_path):
+        with open(input_path, 'rb') as f:
+            batch_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(input_file_id=batch_file.id, endpoint=BATCH_ENDPOINT,
+                                                 completion_window="24h")
+        return batch.id
+
+    async def poll(self, batch_id):
+        """返回 (状态, 输出文本)，批次未结束时输出文本为 None。"""
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status not in TERMINAL_STATUSES:
+            return batch.status, None
+        text = ""
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                text += content.text + '\n'
+        return batch.status, text
+
+
+class LocalBatchBackend:
+    """
+    基于本地目录的 Batch 替身：提交时复制输入文件，第一次轮询返回 in_progress，
+    第二次轮询用固定回复生成与 OpenAI 格式一致的输出文件并返回 completed。
+    """
+
+    def __init__(self, directory, answer="36 months"):
+        self.directory = directory
+        self.answer = answer
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id, kind):
+        return os.path.join(self.directory, f"{batch_id}.{kind}")
+
+    async def submit(self, input_path):
+        batch_id = "batch_" + uuid.uuid4().hex
+        with open(input_path, 'r', encoding='utf-8') as src, open(self._path(batch_id, 'input.jsonl'), 'w', encoding='utf-8') as dst:
+            dst.write(src.read())
+        with open(self._path(batch_id, 'status'), 'w') as f:
+            f.write("validating")
+        return batch_id
+
+    async def poll(self, batch_id):
+        with open(self._path(batch_id, 'status')) as f:
+            status = f.read()
+        if status == "validating":
+            with open(self._path(batch_id, 'status'), 'w') as f:
+                f.write("in_progress")
+            return "in_progress", None
+        output_path = self._path(batch_id, 'output.jsonl')
+        if status == "in_progress":
+            with open(self._path(batch_id, 'input.jsonl'), 'r', encoding='utf-8') as src, \
+                    open(output_path, 'w', encoding='utf-8') as dst:
+                for line in src:
+                    request = json.loads(line)
+                    dst.write(json.dumps({
+                        "id": "batch_req_" + uuid.uuid4().hex,
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200,
+                                     "body": chat_completion_body(request["body"]["model"], self.answer)},
+                        "error": None,
+                    }, ensure_ascii=False) + '\n')
+            with open(self._path(batch_id, 'status'), 'w') as f:
+                f.write("completed")
+        with open(output_path, 'r', encoding='utf-8') as f:
+            return "completed", f.read()
+
+
+async def run_batch_job(job_name, model, backend, prompts, result_file, system_prompt=None, suffix="",
+                        extract_value=None, poll_interval=60, meta=None, xlsx=False, parse_answer=None, **params):
+    """
+    以 Batch 方式完成一个 prompt 表。参数含义同 collect.collect_answers，
+    backend 为 OpenAIBatchBackend 或 LocalBatchBackend。
+    """
+    if not isinstance(prompts, (str, pd.DataFrame)):
+        # 批处理需要一次写出全部待提交行，分块生成的 prompt 在此合并
+        prompts = pd.concat(prompts, ignore_index=True)
+    table = collect.PromptTable(prompts, result_file, extract_value, meta=meta, parse_answer=parse_answer)
+    base = os.path.splitext(result_file)[0]
+    state_file = base + '.batch.json'
+    directory = os.path.dirname(result_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+        print(job_name, "继续轮询批次", state["batch_id"])
+    elif table.pending_rows:
+        input_path = base + '.batch_input.jsonl'
+        rows = write_batch_input(input_path, job_name, model, table, system_prompt, suffix, **params)
+        state = {"batch_id": await backend.submit(input_path), "rows": len(rows)}
+        with open(state_file, 'w') as f:
+            json.dump(state, f)
+        print(job_name, "已提交批次", state["batch_id"], "共", len(rows), "条")
+    else:
+        state = None
+
+    if state is not None:
+        while True:
+            status, output = await backend.poll(state["batch_id"])
+            if status in TERMINAL_STATUSES:
+                break
+            print(job_name, "批次", state["batch_id"], "状态:", status)
+            await asyncio.sleep(poll_interval)
+        if status == "failed":
+            os.remove(state_file)
+            raise RuntimeError(f"批次 {state['batch_id']} 失败")
+        # expired / cancelled 的批次也会返回已完成部分，未返回的行留待下次重新提交
+        results = parse_batch_output(output or "")
+        # 批处理没有逐条耗时，遥测只记录 token 与费用
+        telemetry = tm.Telemetry(tm.telemetry_path_for(result_file), job_name, model, meta)
+        for row, res, error, usage in results:
+            info = telemetry.record(tm.request_record(row, "error" if error else "ok", 1, usage=usage))
+            table.record_answer(row, res, error, info)
+        telemetry.close()
+        os.remove(state_file)
+        print(job_name, "批次", state["batch_id"], status, "，合并", len(results), "条结果")
+
+    table.export(xlsx)
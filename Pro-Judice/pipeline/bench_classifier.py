@@ -0,0 +1,126 @@
+"""
+回答分类器基准：比较 answer_classifier.classify 与旧做法的准确率和速度。
+  first_char   只看第一个字符(旧 get_answers_by_qwen-2.5.py 的 res[0])
+  first_match  取正文中第一次出现的选项词
+
+准确率只在人工标注的 classifier_cases.jsonl 上计算，不用分类器自己的正则生成语料。每行是一条回答及其标签：
+category 为 bare / format / think / explained / negation / echo / hedged / empty，
+label 为 Yes/No/A/B，没有明确选项(含糊、拒答)为 null，空回答为 ""。
+
+真实回复取自 experiments.toml 中 E1/E2 的结果文件(存在时)，随机抽取 --real 条：没有标签，只报告各做法
+与 classify 不一致的比例与无法识别的比例；--dump 把抽到的回复与各做法的标签写成 jsonl，
+人工填写 label 后可追加到 classifier_cases.jsonl。速度在 人工标注 + 真实回复 重复到 --answers 条的语料上测量。
+
+用法:
+python bench_classifier.py --answers 120000
+python bench_classifier.py --real 500 --dump real_sample.jsonl
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import answer_classifier as ac
+import storage
+from run_experiments import load_config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CASES_PATH = os.path.join(HERE, "classifier_cases.jsonl")
+CONFIG_PATH = os.path.join(HERE, "experiments.toml")
+
+
+def load_cases(path=CASES_PATH):
+    """人工标注的回答，列 experiment、category、answer、label。"""
+    with open(path, encoding='utf-8') as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def real_replies(experiment, n, config_path=CONFIG_PATH, seed=0):
+    """从 experiments.toml 中该实验各语言、各模型的结果文件里随机抽取 n 条回复，没有结果文件时为空。"""
+    config = load_config(config_path)
+    config_dir = os.path.dirname(os.path.abspath(config_path))
+    frames = []
+    for language, exp_cfg in config["experiments"].get(experiment, {}).items():
+        for llm_name in config["models"]:
+            path = os.path.normpath(os.path.join(config_dir, exp_cfg["output"].format(model=llm_name)))
+            if os.path.exists(path) or os.path.exists(storage.parquet_path_for(path)):
+                frames.append(storage.read_table(path)[['answer']].assign(source=f"{language}/{llm_name}"))
+    if not frames:
+        return pd.DataFrame(columns=['answer', 'source'])
+    replies = pd.concat(frames, ignore_index=True)
+    return replies.sample(min(n, len(replies)), random_state=seed).reset_index(drop=True)
+
+
+def first_match_label(answers, experiment):
+    """取正文中第一次出现的选项词(分类器最低一级的正则，不做任何预处理)。"""
+    tiers, labels, _ = ac.KINDS[experiment]
+    found = ac._first_group(answers.fillna('').astype(str).str.extract(tiers[-1][1], expand=False))
+    return found.str.lower().map(labels)
+
+
+def same(predicted, truth):
+    """逐行比较标签，None 与 None 视为相同。"""
+    predicted = pd.Series(predicted).astype(object).where(lambda v: v.notna(), None).to_numpy()
+    truth = pd.Series(truth).astype(object).where(lambda v: v.notna(), None).to_numpy()
+    return np.array([p == t for p, t in zip(predicted, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=120000, help="测速语料的条数")
+    parser.add_argument("--cases", default=CASES_PATH, help="人工标注的回答")
+    parser.add_argument("--real", type=int, default=2000, help="从结果文件中抽取的真实回复条数")
+    parser.add_argument("--dump", help="把抽到的真实回复及各做法的标签写入该 jsonl，供人工标注")
+    args = parser.parse_args()
+
+    methods = {
+        "first_char": ac.first_char_label,
+        "first_match": first_match_label,
+        "classify": lambda answers, experiment: ac.classify(answers, experiment)['label'],
+    }
+    cases = load_cases(args.cases)
+    dumped = []
+    for experiment in ("E1", "E2"):
+        labelled = cases[cases['experiment'] == experiment].reset_index(drop=True)
+        print(f"{experiment} 人工标注 {len(labelled)} 条")
+        for name, method in methods.items():
+            correct = same(method(labelled['answer'], experiment), labelled['label'])
+            by_category = pd.Series(correct).groupby(labelled['category']).mean()
+            print(f"  {name:<12} 准确率 {correct.mean():.2%}  "
+                  + "  ".join(f"{category} {share:.0%}" for category, share in by_category.items()))
+        for _, row in labelled[~same(methods["classify"](labelled['answer'], experiment), labelled['label'])].iterrows():
+            expected = row['label'] if pd.notna(row['label']) else None
+            print(f"    classify 错误 [{row['category']}] {row['answer']!r} -> 应为 {expected!r}")
+
+        real = real_replies(experiment, args.real)
+        if len(real):
+            labels = {name: method(real['answer'], experiment) for name, method in methods.items()}
+            print(f"{experiment} 真实回复 {len(real)} 条(来自 {real['source'].nunique()} 个结果文件)，"
+                  f"classify 无法识别 {labels['classify'].isna().mean():.2%}")
+            for name in ("first_char", "first_match"):
+                print(f"  {name:<12} 与 classify 不一致 {1 - same(labels[name], labels['classify']).mean():.2%}")
+            dumped += [dict(experiment=experiment, source=row.source, answer=row.answer, label=None,
+                            **{name: labels[name].iloc[i] for name in methods}) for i, row in enumerate(real.itertuples())]
+        else:
+            print(f"{experiment} 没有找到结果文件，跳过真实回复")
+
+        corpus = pd.concat([labelled['answer'], real['answer']], ignore_index=True)
+        corpus = corpus.iloc[np.arange(args.answers) % len(corpus)].reset_index(drop=True)
+        for name, method in methods.items():
+            start = time.perf_counter()
+            method(corpus, experiment)
+            elapsed = time.perf_counter() - start
+            print(f"  {name:<12} 用时 {elapsed:.2f}s  ({len(corpus) / elapsed:,.0f} 条/秒)")
+
+    if args.dump and dumped:
+        with open(args.dump, 'w', encoding='utf-8') as f:
+            for item in dumped:
+                f.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+        print(f"已写入 {len(dumped)} 条待标注回复: {args.dump}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+并发引擎基准：启动本地 mock 服务，比较不同并发上限下的完成时间；
+加上服务端限速与故障注入时，同时检验重试、限速与失败行的记录(容错基准)。
+--prefix-cache 时每 9 条 prompt 共用一段案件事实，mock 服务模拟前缀缓存，
+分别按 prompt 顺序直接发送与按案件分组调度(run_prompts 的 groups)，比较前缀缓存命中率。
+--keys 时 mock 服务按 key 限速(--key-rpm)，比较 1、2、4…个 key 的吞吐量(key_pool.py)；
+--bad-keys 个 key 返回 401，检验 key 的隔离。
+
+用法:
+python bench_engine.py --prompts 500 --latency 0.2 --concurrency 1 8 32
+python bench_engine.py --prompts 9000 --latency 0.3 --distribution lognormal --concurrency 64 \
+    --server-rpm 6000 --error-rate 0.02 --rate-limit-rate 0.01
+python bench_engine.py --prompts 900 --latency 0.2 --concurrency 16 --prefix-cache
+python bench_engine.py --prompts 600 --latency 0.1 --concurrency 16 --keys 1 2 4 --key-rpm 1200 --bad-keys 1
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import async_engine as ae
+from mock_server import DISTRIBUTIONS, start_server
+
+PROMPT_SUFFIXES = [
+    "\nStrictly limit your reply format to one of the following: Yes or No",
+    "\n严格限制你的回复格式必须有且仅有：A 或 B",
+    "\nStrictly limit your response format to only: x months",
+]
+# --prefix-cache 时每个案件的 prompt 数(E1/E2 的 9 条原则)
+PROMPTS_PER_CASE = 9
+
+
+def case_prompt(i):
+    """第 i 条 prompt：同一案件的 9 条共用一段约 600 token 的事实，其后是各自的场景。"""
+    case = i // PROMPTS_PER_CASE
+    fact = f"Case {case}: " + "The defendant was charged with theft of property. " * 50
+    return f"fact:\n{fact}\nscenario {i % PROMPTS_PER_CASE}" + PROMPT_SUFFIXES[0]
+
+
+def mock_keys(n_keys):
+    """n_keys 个 key 时使用的 key；不同 key 数的 key 互不重名，--bad-keys 只影响对应的那一轮。"""
+    return ["mock-key"] if n_keys == 1 else [f"mock-key-{n_keys}-{k}" for k in range(n_keys)]
+
+
+async def bench_once(base_url, n_prompts, concurrency, client_rpm=10 ** 9, cases=False, grouped=False, n_keys=1):
+    """
+    返回:
+    (用时, 最终失败条数, 前缀缓存命中率)。cases 为 True 时使用共用案件事实的 prompt，grouped 时按案件分组调度；
+    n_keys 大于 1 时请求分散到 n_keys 个 key 上(每个 key 的并发上限与限速均为 concurrency / client_rpm)。
+    """
+    client = ae.make_client("mock-key", base_url)
+    pool = ae.ProviderPool({base_url: {"concurrency": concurrency, "rpm": client_rpm}})
+    keys = pool.keys(base_url, mock_keys(n_keys)) if n_keys > 1 else None
+    if cases:
+        messages_list = [[{"role": "user", "content": case_prompt(i)}] for i in range(n_prompts)]
+    else:
+        messages_list = [[{"role": "user", "content": f"prompt {i}" + PROMPT_SUFFIXES[i % len(PROMPT_SUFFIXES)]}]
+                         for i in range(n_prompts)]
+    groups = [i // PROMPTS_PER_CASE for i in range(n_prompts)] if grouped else None
+    order = []
+    failed = []
+    tokens = {"prompt": 0, "cached": 0}
+
+    def on_result(i, res, error, info):
+        order.append(i)
+        if error:
+            failed.append(i)
+        tokens["prompt"] += info["prompt_tokens"]
+        tokens["cached"] += info["cached_tokens"]
+
+    start = time.perf_counter()
+    # 屏蔽逐条进度输出，只保留基准结果
+    with contextlib.redirect_stdout(io.StringIO()):
+        await ae.run_prompts("mock", "mock-model", client, pool.semaphore(base_url), messages_list,
+                             on_result=on_result, limiter=pool.limiter(base_url),
+                             groups=groups, group_window=concurrency, keys=keys)
+    elapsed = time.perf_counter() - start
+    await client.close()
+    await pool.close()
+    assert order == list(range(1, n_prompts + 1)), "结果未按 prompt 顺序回写"
+    return elapsed, len(failed), tokens["cached"] / tokens["prompt"] if tokens["prompt"] else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, help="默认为 latency 的 1/4")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--client-rpm", type=float,
+                        help="客户端限速器的初始每分钟请求数，默认与 --key-rpm / --server-rpm 相同，都没有时不限速")
+    parser.add_argument("--server-rpm", type=float, help="mock 服务端每分钟请求上限")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--bad-request-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix-cache", action="store_true", help="共用案件事实的 prompt，比较分组调度前后的前缀缓存命中率")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1], help="key 的数量，可给出多个值比较吞吐量")
+    parser.add_argument("--key-rpm", type=float, help="mock 服务端每个 key 的每分钟请求上限(代替 --server-rpm)")
+    parser.add_argument("--bad-keys", type=int, default=0, help="多个 key 时其中返回 401 的 key 数")
+    args = parser.parse_args()
+
+    jitter = args.latency / 4 if args.jitter is None else args.jitter
+    # 客户端限速从服务端上限起步：从 10^9 开始时遇到 429 逐次减半也降不到服务端上限，请求会在重试中耗尽
+    client_rpm = args.client_rpm or args.key_rpm or args.server_rpm or 10 ** 9
+    bad_keys = [key for n_keys in args.keys if n_keys > 1 for key in mock_keys(n_keys)[n_keys - args.bad_keys:]]
+    server, base_url = start_server(latency=args.latency, jitter=jitter, distribution=args.distribution,
+                                    rpm=args.key_rpm or args.server_rpm, error_rate=args.error_rate,
+                                    rate_limit_rate=args.rate_limit_rate, bad_request_rate=args.bad_request_rate,
+                                    seed=args.seed, per_key_rpm=args.key_rpm is not None,
+                                    bad_keys=bad_keys if args.bad_keys else ())
+    # 分组调度的对照组与实验组各用一个 mock 服务，互不共享前缀缓存
+    modes = [("", False)] if not args.prefix_cache else [("按顺序", False), ("按案件分组", True)]
+    try:
+        for concurrency, n_keys in ((c, k) for c in args.concurrency for k in args.keys):
+            for label, grouped in modes:
+                if args.prefix_cache:
+                    server.shutdown()
+                    server, base_url = start_server(latency=args.latency, jitter=jitter, distribution=args.distribution,
+                                                    rpm=args.server_rpm, error_rate=args.error_rate,
+                                                    rate_limit_rate=args.rate_limit_rate,
+                                                    bad_request_rate=args.bad_request_rate, seed=args.seed,
+                                                    prefix_cache=True)
+                before = server.stats()
+                elapsed, failed, hit_rate = asyncio.run(bench_once(base_url, args.prompts, concurrency, client_rpm,
+                                                                   cases=args.prefix_cache, grouped=grouped,
+                                                                   n_keys=n_keys))
+                after = server.stats()
+                counts = {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+                cache_note = f", 前缀缓存命中 {hit_rate:.1%}" if args.prefix_cache else ""
+                key_note = f", {n_keys} 个 key" if len(args.keys) > 1 or n_keys > 1 else ""
+                print(f"并发 {concurrency:>4}{label}{key_note}: {args.prompts} 条 prompt 用时 {elapsed:.2f}s, "
+                      f"吞吐 {args.prompts / elapsed:.1f} 条/秒, 最终失败 {failed} 条{cache_note}, 服务端 {counts}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
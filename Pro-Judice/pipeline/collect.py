@@ -0,0 +1,224 @@
+import os
+
+import pandas as pd
+
+import async_engine as ae
+import journal as jn
+import key_pool as kp
+import logprob_scoring as ls
+import storage
+import streaming
+import telemetry as tm
+
+
+def result_columns(prompt_columns, extract_value, score=None, samples=1):
+    """结果表沿用输入表的列顺序，answerValue / answerProb / answers / answerValues 紧跟在 answer 之后。"""
+    columns = list(prompt_columns)
+    if 'answer' not in columns:
+        columns.append('answer')
+    if samples > 1:
+        columns[columns.index('answer') + 1:columns.index('answer') + 1] = (
+            ['answers', 'answerValues'] if extract_value is not None else ['answers'])
+    if score is not None:
+        columns.insert(columns.index('answer') + 1, 'answerProb')
+    if extract_value is not None:
+        columns.insert(columns.index('answer') + 1, 'answerValue')
+    return columns
+
+
+def build_messages(prompt, system_prompt=None, suffix=""):
+    messages = [{"role": "user", "content": str(prompt) + suffix}]
+    if system_prompt is not None:
+        messages.insert(0, {"role": "system", "content": system_prompt})
+    return messages
+
+
+class PromptTable:
+    """
+    一个 prompt 表(或其中连续的一块)及其结果日志。行号从 1 开始，与日志中的 row 对应；
+    pending_rows 为日志中尚未完成的行。
+
+    参数:
+    prompts -- prompt 表路径，或 prompt_gen 生成的 DataFrame
+    result_file -- 结果文件路径(xlsx)，结果写入同名 .parquet，断点日志为同名 .jsonl
+    extract_value -- 可选函数 回复 -> answerValue
+    row_offset -- 本块第一行之前的行数，分块处理时使用
+    journal -- 可选，分块处理时各块共用同一个日志
+    meta -- 可选，{"model", "dataset", "experiment"}，补齐 parquet 结果中输入表没有的列
+    score -- 可选函数 首个 token 的候选 -> answerProb(logprob 打分模式，见 logprob_scoring.py)
+    parse_answer -- 可选函数 原回复 -> 写入 answer 的回答(结构化输出模式取 JSON 字段，见 structured_output.py)
+    reasoning -- 可选的 journal.Journal，流式请求中推理模型的思考过程按行号写入其中(见 streaming.py)
+    samples -- 每行的回答数，大于 1 时(自洽采样模式，见 sampling.py)回复为回答列表，
+               第一个回答写入 answer，全部回答写入 answers(E3 另有 answerValues)
+    """
+
+    def __init__(self, prompts, result_file, extract_value=None, row_offset=0, journal=None, meta=None, score=None,
+                 parse_answer=None, reasoning=None, samples=1):
+        self.result_file = result_file
+        self.reasoning = reasoning
+        self.extract_value = extract_value
+        self.score = score
+        self.parse_answer = parse_answer
+        self.row_offset = row_offset
+        self.meta = meta or {}
+        if journal is None:
+            journal = jn.Journal(jn.journal_path_for(result_file))
+            journal.import_xlsx(result_file)
+        self.journal = journal
+        done_rows = journal.done_rows()
+
+        df = storage.read_table(prompts) if isinstance(prompts, str) else prompts
+        self.columns = result_columns(df.columns, extract_value, score, samples)
+        self.records = df.drop(columns=['answer'], errors='ignore').to_dict('records')
+        self.pending_rows = [k for k in range(row_offset + 1, row_offset + len(self.records) + 1)
+                             if k not in done_rows]
+
+    def prompt(self, row):
+        return self.records[row - 1 - self.row_offset]['prompt']
+
+    def case_id(self, row):
+        """该行的 CaseId，输入表没有 CaseId 列时为 None。"""
+        return self.records[row - 1 - self.row_offset].get('CaseId')
+
+    def record_answer(self, row, res, error=None, info=None):
+        answers = None
+        if isinstance(res, list):
+            answers = [answer if isinstance(answer, str) else "" for answer in res]
+            res = answers[0] if answers else ""
+        if self.parse_answer is not None and res:
+            res = self.parse_answer(res)
+        record = dict(self.records[row - 1 - self.row_offset], answer=res)
+        if answers is not None:
+            record['answers'] = answers
+            if self.extract_value is not None:
+                record['answerValues'] = [self.extract_value(answer) for answer in answers]
+        if self.extract_value is not None:
+            record['answerValue'] = self.extract_value(res)
+        if self.score is not None:
+            record['answerProb'] = self.score(info.get('top_logprobs')) if info is not None else None
+        if info is not None and info.get('status') == 'ok':
+            # 遥测中的耗时与 token 数同时写入结果表的 latency/tokens 列
+            record['latency'] = info['latency']
+            record['tokens'] = info['prompt_tokens'] + info['completion_tokens']
+        if error is not None:
+            # 重试后仍失败的行带 error 标记写入日志，下次运行会重新请求
+            record['error'] = error
+        if self.reasoning is not None and info is not None and info.get('reasoning'):
+            source = self.records[row - 1 - self.row_offset]
+            self.reasoning.append(row, dict(CaseId=source.get('CaseId'), Principle=source.get('Principle'),
+                                            reasoning=info['reasoning']))
+        self.journal.append(row, record)
+
+    def export(self, xlsx=False):
+        """结果总是写成同名 .parquet(storage.RESULT_SCHEMA)；xlsx 为 True 时另导出 Excel。"""
+        self.journal.close()
+        directory = os.path.dirname(self.result_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        parquet_file = storage.parquet_path_for(self.result_file)
+        storage.write_results(self.journal.to_frame(), parquet_file, **self.meta)
+        print("结果已保存至 ", parquet_file)
+        if xlsx:
+            self.journal.export_xlsx(self.result_file, self.columns)
+            print("结果已保存至 ", self.result_file)
+
+
+async def collect_answers(llm_name, model, api_key, base_url, prompts, result_file,
+                          system_prompt=None, suffix="", extract_value=None,
+                          pool=None, api="chat", cache=None, meta=None, xlsx=False, prefix_cache=False, score=None,
+                          parse_answer=None, stream=False, stop_when=None, keep_reasoning=False, samples=1,
+                          n_param=False, **params):
+    """
+    对一个 prompt 表的全部行向某个模型提问，结果写入 result_file。
+
+    参数:
+    llm_name -- 用于打印进度的模型简称
+    model, api_key, base_url -- 调用参数；api_key 可以是多个 key 的列表或逗号分隔的字符串，
+                                请求分散到各个 key 上(见 key_pool.py)
+    prompts -- 输入表路径(需有 prompt 列，即各 generate_question 脚本的输出)、DataFrame，
+               或 prompt_gen.iter_prompt_chunks 产生的 DataFrame 迭代器(逐块处理，内存只取决于块大小)
+    result_file -- 结果文件路径，结果写入同名 .parquet，断点日志为同名 .jsonl，遥测为同名 .telemetry.jsonl
+    system_prompt -- 系统提示，None 表示不发送
+    suffix -- 追加在每条 prompt 之后的格式要求
+    extract_value -- 可选函数 回复 -> answerValue
+    pool -- 共享的 ProviderPool(并发上限、限速与对冲)，None 时新建
+    api -- "chat" 或 "responses"
+    cache -- 可选的 ResponseCache
+    meta -- 可选，写入 parquet 的 model/dataset/experiment
+    xlsx -- 为 True 时另导出 Excel 到 result_file
+    prefix_cache -- 为 True 时按 CaseId 分组调度(见 async_engine.run_prompts 的 groups)，
+                    同一案件的 prompt 共用 系统提示 + 案件事实 的前缀，尽量命中服务商的前缀缓存
+    score -- 可选函数 首个 token 的候选 -> answerProb。给定时为 logprob 打分模式：只请求一个 token 并取
+             top_logprobs(logprob_scoring.SCORE_PARAMS)，不读写回复缓存(缓存中没有概率)
+    parse_answer -- 可选函数 原回复 -> 写入 answer 的回答
+    stream, stop_when -- 流式请求与提前结束的判定(见 async_engine.run_prompts 与 streaming.py)
+    keep_reasoning -- 为 True 时把流式请求中的思考过程写入 <结果>.reasoning.jsonl
+    samples, n_param -- 每条 prompt 取的回答数，及服务商是否支持 n 参数(见 async_engine.run_prompts 与 sampling.py)
+    params -- 其余请求参数(如结构化输出模式的 response_format、max_tokens)
+    """
+    if score is not None:
+        params = dict(ls.SCORE_PARAMS, **params)
+        cache = None
+    chunks = [prompts] if isinstance(prompts, (str, pd.DataFrame)) else prompts
+    journal = jn.Journal(jn.journal_path_for(result_file))
+    journal.import_xlsx(result_file)
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ae.ProviderPool()
+    api_keys = kp.split_keys(api_key)
+    keys = pool.keys(base_url, api_keys) if len(api_keys) > 1 else None
+    # 多个 key 时客户端由 ProviderPool 的 KeyPool 持有，随 pool.close() 关闭
+    client = ae.make_client(api_keys[0] if api_keys else api_key, base_url) if keys is None else None
+    telemetry = tm.Telemetry(tm.telemetry_path_for(result_file), llm_name, model, meta)
+    reasoning = jn.Journal(streaming.reasoning_path_for(result_file)) if keep_reasoning else None
+    table = None
+    row_offset = 0
+    try:
+        for chunk in chunks:
+            table = PromptTable(chunk, result_file, extract_value, row_offset=row_offset, journal=journal,
+                                meta=meta, score=score, parse_answer=parse_answer, reasoning=reasoning,
+                                samples=samples)
+            rows = table.pending_rows
+            messages_list = [build_messages(table.prompt(k), system_prompt, suffix) for k in rows]
+            groups = [table.case_id(k) for k in rows] if prefix_cache else None
+            if groups is not None and None in groups:
+                groups = None
+            await ae.run_prompts(llm_name, model, client, pool.semaphore(base_url), messages_list,
+                                 on_result=table.record_answer, indices=rows, api=api, cache=cache,
+                                 limiter=pool.limiter(base_url), telemetry=telemetry, groups=groups,
+                                 group_window=ae.provider_setting(base_url, "concurrency", pool.overrides),
+                                 stream=stream, stop_when=stop_when, samples=samples, n_param=n_param,
+                                 hedge=pool.hedger(base_url, model), keys=keys, **params)
+            row_offset += len(table.records)
+    finally:
+        journal.close()
+        telemetry.close()
+        if reasoning is not None:
+            reasoning.close()
+        if client is not None:
+            await client.close()
+        if own_pool:
+            await pool.close()
+    if table is not None:
+        table.export(xlsx)
+    print_telemetry_summary(llm_name, telemetry.path)
+    if keys is not None:
+        print(f"{llm_name} 结束时各 key 的累计请求数(同一服务商的任务共用):", ", ".join(
+            f"{label} {s['requests']}" + ("(已隔离)" if s['quarantined'] else "") for label, s in keys.stats().items()))
+
+
+def print_telemetry_summary(llm_name, path):
+    """打印一个任务的遥测汇总(含以往各次运行)。"""
+    if not os.path.exists(path):
+        return
+    s = tm.summarize(tm.load([path])).iloc[0]
+    cost = "" if pd.isna(s['cost']) else f", 估算费用 ${s['cost']:.2f}"
+    hit_rate = "" if pd.isna(s['cache_hit_rate']) else f", 前缀缓存命中 {s['cache_hit_rate']:.1%}"
+    streamed = "" if pd.isna(s['tta_p50']) else (f", 首 token p50 {s['ttft_p50']:.2f}s, 回答 p50/p95 "
+                                                 f"{s['tta_p50']:.2f}/{s['tta_p95']:.2f}s, 提前结束 {int(s['stopped'])}")
+    hedged = "" if not s['hedges'] else (f", 对冲 {int(s['hedges'])} 次(副本胜出 {int(s['hedge_wins'])}, "
+                                          f"估算节省 {s['hedge_saved']:.1f}s)")
+    print(f"{llm_name} 遥测: {int(s['requests'])} 次请求 (缓存 {int(s['cached'])}, 失败 {int(s['errors'])}, "
+          f"重试 {int(s['retries'])}), 延迟 p50/p95/p99 {s['latency_p50']:.2f}/{s['latency_p95']:.2f}/"
+          f"{s['latency_p99']:.2f}s{streamed}{hedged}, token {int(s['prompt_tokens'])}+{int(s['completion_tokens'])}{hit_rate}{cost}")
@@ -0,0 +1,121 @@
+"""
+对冲请求：一次请求的耗时超过该服务商近期耗时的 p95 仍未返回时，再发一份相同的请求，先成功返回者为准，另一份取消。
+并发运行整个矩阵时，最后几条长尾请求决定了整体的结束时间，对 OpenRouter、DashScope 这类延迟长尾明显的服务商效果最好。
+
+- 阈值：同一服务商同一模型最近 WINDOW 次成功请求耗时的 QUANTILE 分位数，样本不足 MIN_SAMPLES 时不对冲；
+  E1/E2 与 E3 的回复长度不同，按 (base_url, 模型) 分别统计，避免推理模型的耗时拉高同一服务商其他模型的阈值
+- 额外花费上限：对冲次数不超过已发请求数的 budget(如 0.05 即至多多发 5% 的请求)，超出后不再对冲
+- 副本经过限速器，但不排队等待并发名额：并发跑满时排队的副本要等到原请求之后才能发出，对冲就失去了意义；
+  额外的在途请求数由 budget 约束。两份都失败时按原请求的错误重试
+- 被取消的请求服务商通常仍会计费，遥测中 hedge_cost 按与胜出请求相同的 token 数估算副本的费用
+- 遥测记录 hedged(是否发出副本)、hedge_won(副本先返回)与 hedge_saved(估算节省的秒数)：
+  副本胜出时原请求的耗时未知，按近期耗时中超过其已等待时间的那部分的均值估算它本来还要等多久
+
+用法(experiments.toml 中 [run] 的 hedge_budget，或 [providers] 中按服务商设置 hedge_budget，0 为不对冲):
+python run_experiments.py --hedge                  # 全部服务商对冲，额外请求不超过 DEFAULT_BUDGET
+python run_experiments.py --hedge 0.1 --models llama-3.3 qwen-2.5
+python telemetry.py ../E3/cn/*.telemetry.jsonl --by model      # hedges / hedge_wins / hedge_saved / hedge_cost
+"""
+import asyncio
+import collections
+import time
+
+import numpy as np
+
+# 计算阈值的滑动窗口大小与分位数
+WINDOW = 200
+QUANTILE = 0.95
+# 窗口中的样本少于此数时不对冲
+MIN_SAMPLES = 20
+# --hedge 不给值时的额外请求比例上限
+DEFAULT_BUDGET = 0.05
+
+
+class HedgePolicy:
+    """
+    一个服务商(按模型区分)的对冲阈值与额外请求预算。
+
+    参数:
+    budget -- 对冲次数占已发请求数的比例上限
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, window=WINDOW, quantile=QUANTILE, min_samples=MIN_SAMPLES):
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.latencies = collections.deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+
+    def delay(self):
+        """当前的对冲阈值(秒)，样本不足时返回 None。"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return float(np.quantile(self.latencies, self.quantile))
+
+    def observe(self, latency):
+        """记录一次成功请求的耗时。"""
+        self.latencies.append(latency)
+
+    def allow(self):
+        """预算内时占用一次对冲名额并返回 True。"""
+        if self.hedges + 1 > self.budget * self.requests:
+            return False
+        self.hedges += 1
+        return True
+
+    def expected_remaining(self, elapsed):
+        """已等待 elapsed 秒的请求预计还要等多久：近期耗时中超过 elapsed 的部分的均值减去 elapsed，没有时为 0。"""
+        tail = [latency for latency in self.latencies if latency > elapsed]
+        return float(np.mean(tail)) - elapsed if tail else 0.0
+
+
+async def race(send, policy, limiter=None):
+    """
+    发送 send() 并在超过阈值时对冲。调用方已为原请求占用并发名额与限速令牌，副本另取一个限速令牌。
+
+    参数:
+    send -- 无参数的协程函数，每次调用发送一份请求
+    policy -- HedgePolicy
+    limiter -- 该服务商的限速器(见 async_engine.ProviderPool)
+
+    返回:
+    (send() 的结果, 对冲信息 {"hedged", "hedge_won", "hedge_saved"})；两份都失败时抛出原请求的异常。
+    """
+    policy.requests += 1
+    outcome = {"hedged": False, "hedge_won": False, "hedge_saved": None}
+    start = time.perf_counter()
+    primary = asyncio.ensure_future(send())
+    delay = policy.delay()
+    if delay is not None:
+        await asyncio.wait({primary}, timeout=delay)
+    if delay is None or primary.done() or not policy.allow():
+        result = await primary
+        policy.observe(time.perf_counter() - start)
+        return result, outcome
+
+    async def duplicate():
+        if limiter is not None:
+            await limiter.acquire()
+        return await send()
+
+    outcome["hedged"] = True
+    backup = asyncio.ensure_future(duplicate())
+    pending = {primary, backup}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    continue
+                elapsed = time.perf_counter() - start
+                outcome["hedge_won"] = task is backup
+                # 原请求胜出时耗时已知；副本胜出时原请求被取消，它本来还要等多久只能估算
+                outcome["hedge_saved"] = policy.expected_remaining(elapsed) if task is backup else 0.0
+                policy.observe(elapsed)
+                return task.result(), outcome
+        return primary.result(), outcome
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,115 @@
+"""
+追加写入的 JSONL 结果日志，代替每条结果都重写整个 Excel 的断点保存方式。
+
+每条回答写成一行 JSON 并立即 fsync，崩溃后最多丢失正在写入的那一条。
+续跑时读取日志中已完成的行号，Excel 只在结束时(或手动执行 export)导出一次。
+
+用法:
+python journal.py export results/results_llama-3.3.jsonl results/results_llama-3.3.xlsx
+"""
+import json
+import os
+import sys
+
+import pandas as pd
+
+RESULT_COLUMNS = ['CaseId', 'Principle', 'Experiment', 'answer', 'answerValue', 'prompt']
+
+
+def journal_path_for(result_file):
+    """结果文件对应的日志路径，如 results_gpt-4o.xlsx -> results_gpt-4o.jsonl"""
+    return os.path.splitext(result_file)[0] + '.jsonl'
+
+
+class Journal:
+    """
+    以行号(prompt 在输入表中的序号，从 1 开始)为键的追加日志。
+    同一行号出现多次时以最后一条为准，便于补跑失败的行。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def records(self):
+        """按写入顺序返回日志中的全部记录，忽略崩溃时写了一半的末行。"""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def latest(self):
+        """{行号: 最后一条记录}"""
+        return {record['row']: record for record in self.records()}
+
+    def done_rows(self):
+        """已完成的行号；最后一条记录带 error(重试后仍失败)的行不算完成。"""
+        return {row for row, record in self.latest().items() if not record.get('error')}
+
+    def append(self, row, record):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            # 上次崩溃可能留下没有换行的半行，先补换行，避免与新记录粘连
+            if self._file.tell() > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        self._file.write('\n')
+        self._file.write(json.dumps(dict(record, row=row), ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def import_xlsx(self, result_file):
+        """
+        把旧版逐行保存的 Excel 结果导入日志(仅在日志为空时使用)，
+        旧文件第 k 行对应输入表第 k 条 prompt。
+
+        返回:
+        导入的行数。
+        """
+        if self.records() or not os.path.exists(result_file):
+            return 0
+        df = pd.read_excel(result_file).fillna('')
+        for k, record in enumerate(df.to_dict('records'), start=1):
+            self.append(k, record)
+        return len(df)
+
+    def to_frame(self, columns=None):
+        """按行号排序的结果表，columns 为空时保留记录中除 row 外的全部列。"""
+        latest = self.latest()
+        rows = [latest[row] for row in sorted(latest)]
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return pd.DataFrame(columns=columns or RESULT_COLUMNS)
+        if columns is None:
+            columns = [c for c in df.columns if c != 'row']
+        return df[[c for c in columns if c in df.columns]]
+
+    def export_xlsx(self, result_file, columns=None):
+        """按行号排序后一次性导出 Excel。"""
+        self.to_frame(columns).to_excel(result_file, index=False)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != 'export':
+        print("用法: python journal.py export <日志.jsonl> <结果.xlsx>")
+        sys.exit(1)
+    Journal(sys.argv[2]).export_xlsx(sys.argv[3])
+    print("结果已导出至 ", sys.argv[3])
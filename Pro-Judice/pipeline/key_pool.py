@@ -0,0 +1,151 @@
+"""
+API key 池：同一服务商配置多个 key 时，在途请求分散到各个 key 上，吞吐量不再受单个账号的 RPM/TPM 限制。
+
+- experiments.toml 中 api_key 可以是 key 的列表，api_key_env 可以是环境变量名的列表，
+  或一个以逗号分隔多个 key 的环境变量；只有一个 key 时照旧按服务商共享并发上限与限速
+- 每个 key 有自己的客户端、并发信号量与限速器(AdaptiveRateLimiter)，上限与单个 key 时相同([providers] 的
+  concurrency / rpm 视为每个账号的额度)，因此在各账号额度允许的范围内吞吐量随 key 的数量近似线性增长
+- 每次发送挑选 已分配请求数 / 当前速率 最小的 key：429 后速率减半的 key 会少分到请求，直到速率恢复；
+  排队期间所选的 key 被隔离时，取到名额后重新挑选，不把请求发给已隔离的 key
+- key 出现鉴权错误(401/403)时本次运行内不再使用；额度耗尽(402，或 429 且错误码为 insufficient_quota 等)时
+  隔离 QUARANTINE_SECONDS 秒后再试。出错的请求立即换一个 key 重发，不计退避；全部 key 都被隔离时请求失败
+- 遥测的 key 列记录每次请求所用 key 的末 4 位，可用 telemetry.py --by key 查看各 key 的请求数与延迟
+
+用法:
+export DEEPSEEK_API_KEYS=sk-aaa,sk-bbb,sk-ccc      # [models.deepseek-v3] 中 api_key_env = "DEEPSEEK_API_KEYS"
+python run_experiments.py --models deepseek-v3 deepseek-r1
+python telemetry.py ../E3/cn/results_deepseek-v3.telemetry.jsonl --by key
+"""
+import contextlib
+import time
+
+import openai
+
+# 额度耗尽的 key 的隔离时间(秒)，之后重新参与分配；鉴权失败的 key 不再使用
+QUARANTINE_SECONDS = 600
+# 表示额度耗尽的错误码(OpenAI、DashScope)
+QUOTA_CODES = ("insufficient_quota", "billing_hard_limit_reached", "Arrearage")
+
+AUTH = "auth"
+QUOTA = "quota"
+
+
+class NoActiveKey(Exception):
+    """池中的 key 全部被隔离。"""
+
+
+def split_keys(value):
+    """api_key 的配置值(字符串、逗号分隔的字符串或列表) -> key 列表，去掉空白与重复项。"""
+    if not value:
+        return []
+    items = value if isinstance(value, (list, tuple)) else str(value).split(',')
+    keys = []
+    for item in items:
+        item = str(item).strip()
+        if item and item not in keys:
+            keys.append(item)
+    return keys
+
+
+def mask(api_key):
+    """遥测与打印中使用的 key 标识：只保留末 4 位。"""
+    return "…" + api_key[-4:]
+
+
+def key_error(e):
+    """
+    判断一次失败是否是 key 本身的问题。
+
+    返回:
+    AUTH(鉴权失败)、QUOTA(额度耗尽)或 None(与 key 无关，照常按 rate_limit.classify_error 处理)。
+    """
+    if not isinstance(e, openai.APIStatusError):
+        return None
+    if e.status_code in (401, 403):
+        return AUTH
+    if e.status_code == 402 or getattr(e, "code", None) in QUOTA_CODES:
+        return QUOTA
+    return None
+
+
+class Credential:
+    """一个 key 及其客户端、并发信号量、限速器与隔离状态。"""
+
+    def __init__(self, api_key, client, semaphore, limiter):
+        self.label = mask(api_key)
+        self.client = client
+        self.semaphore = semaphore
+        self.limiter = limiter
+        self.assigned = 0
+        self.requests = 0
+        self.quarantined_until = 0.0
+
+    def active(self, now=None):
+        return (now or time.monotonic()) >= self.quarantined_until
+
+    def load(self):
+        return self.assigned / self.limiter.rate
+
+
+class KeyPool:
+    """
+    一个服务商的多个 key。slot 挑一个 key 并占用它的限速令牌与并发名额，用于一次发送。
+
+    参数:
+    credentials -- Credential 列表(由 async_engine.ProviderPool.keys 创建)
+    """
+
+    def __init__(self, credentials):
+        self.credentials = list(credentials)
+
+    def pick(self):
+        """负载最轻的可用 key，全部被隔离时返回 None。"""
+        now = time.monotonic()
+        active = [c for c in self.credentials if c.active(now)]
+        if not active:
+            return None
+        credential = min(active, key=Credential.load)
+        credential.assigned += 1
+        return credential
+
+    def release(self, credential):
+        credential.assigned -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """
+        一次发送的名额：挑一个 key，取它的限速令牌并占用它的并发信号量，期间 key 被隔离时重新挑选。
+
+        返回:
+        Credential；全部 key 都被隔离时抛出 NoActiveKey。
+        """
+        while True:
+            credential = self.pick()
+            if credential is None:
+                raise NoActiveKey(f"全部 {len(self.credentials)} 个 key 已隔离")
+            try:
+                await credential.limiter.acquire()
+                async with credential.semaphore:
+                    if credential.active():
+                        credential.requests += 1
+                        yield credential
+                        return
+            finally:
+                self.release(credential)
+
+    def quarantine(self, credential, kind, error=None):
+        """隔离出错的 key：AUTH 在本次运行内不再使用，QUOTA 隔离 QUARANTINE_SECONDS 秒。"""
+        until = float("inf") if kind == AUTH else time.monotonic() + QUARANTINE_SECONDS
+        if until > credential.quarantined_until:
+            credential.quarantined_until = until
+            left = sum(c.active() for c in self.credentials)
+            print(f"key {credential.label} 已隔离({kind}), 剩余可用 {left}/{len(self.credentials)}:", error)
+
+    def stats(self):
+        """各 key 的请求数与当前速率(每分钟)，用于运行结束时的汇总。"""
+        return {c.label: {"requests": c.requests, "rpm": round(c.limiter.rate * 60),
+                          "quarantined": not c.active()} for c in self.credentials}
+
+    async def close(self):
+        for credential in self.credentials:
+            await credential.client.close()
@@ -0,0 +1,73 @@
+"""
+E1(是/否)与 E2(A/B)的 logprob 打分模式：只请求一个 token(max_tokens=1)并取首个 token 的 top_logprobs，
+把两个选项的概率归一化后记为连续分数 answerProb，回答文本(即该 token)照常由 answer_classifier 分类。
+
+answerProb = P(程序性选项) / (P(是/Yes) + P(否/No))，E1 的程序性选项为 否/No，E2 为 B，
+与 choice_metrics.py 中 M_PA / M_PV 统计的选项一致；top_logprobs 中两个选项都没有出现时为空。
+同一选项的不同写法(Yes、yes、" Yes"、"**是")概率相加。
+
+只有支持 logprobs 的服务商可用(experiments.toml 中 logprobs = true 的模型)，推理模型(deepseek-reasoner)不支持。
+打分模式的结果写入 <结果>_scored.parquet，不读写回复缓存(缓存只保存文本，没有概率)。
+
+用法:
+python run_experiments.py --score --experiments E1 E2 --models deepseek-v3 gpt-4o
+"""
+import math
+import os
+import re
+
+import answer_classifier as ac
+
+# OpenAI 与 DeepSeek 的 top_logprobs 上限均为 20
+TOP_LOGPROBS = 20
+SCORE_PARAMS = {"max_tokens": 1, "logprobs": True, "top_logprobs": TOP_LOGPROBS}
+
+# 实验 -> (程序性选项, 另一个选项)
+OPTIONS = {
+    "E1": ("No", "Yes"),
+    "E2": ("B", "A"),
+}
+TOKEN_LABELS = {
+    "E1": ac.YES_NO_LABELS,
+    "E2": ac.CHOICE_LABELS,
+}
+# token 两侧的空白、标点与 markdown 标记
+TOKEN_STRIP = re.compile(r'^[\s*_`#"\'“”:：(（【\[]+|[\s*_`#"\'“”.,;:!?。，；：！？)）】\]]+$')
+
+
+def scored_path_for(result_file):
+    """打分模式的结果文件，如 E1_cn_results_gpt-4o.xlsx -> E1_cn_results_gpt-4o_scored.xlsx"""
+    stem, ext = os.path.splitext(result_file)
+    return stem + '_scored' + ext
+
+
+def token_label(token, experiment):
+    """单个 token 对应的选项(Yes/No/A/B)，不是选项时返回 None。"""
+    text = TOKEN_STRIP.sub('', str(token).translate(ac.FULL_WIDTH)).lower()
+    return TOKEN_LABELS[experiment].get(text)
+
+
+def option_probability(top_logprobs, experiment):
+    """
+    首个 token 的候选中程序性选项的归一化概率。
+
+    参数:
+    top_logprobs -- [{"token": ..., "logprob": ...}, ...]
+    experiment -- "E1" 或 "E2"
+
+    返回:
+    P(程序性选项) / (P(程序性选项) + P(另一个选项))；两个选项都不在候选中时返回 None。
+    """
+    pos, neg = OPTIONS[experiment]
+    mass = {pos: 0.0, neg: 0.0}
+    for candidate in top_logprobs or []:
+        label = token_label(candidate["token"], experiment)
+        if label in mass:
+            mass[label] += math.exp(candidate["logprob"])
+    total = mass[pos] + mass[neg]
+    return mass[pos] / total if total > 0 else None
+
+
+def scorer(experiment):
+    """PromptTable 的 score 参数：top_logprobs -> answerProb。"""
+    return lambda top_logprobs: option_probability(top_logprobs, experiment)
@@ -0,0 +1,511 @@
+"""
+本地 OpenAI 兼容 mock 服务，用于离线测试并发引擎的吞吐量与容错(重试、限速、补跑)，不需要 API key 和网络。
+
+支持 /v1/chat/completions 与 /v1/responses 两个接口(llm_qa_process 与 gpt4o_qa_process 的调用方式)：
+- 延迟分布：constant / uniform / normal / lognormal / exponential，由 --latency(均值)与 --jitter 决定
+- 长尾：--stall-rate 比例的请求延迟放大 STALL_FACTOR 倍，模拟服务商偶发的慢请求(用于测试对冲)
+- 限速：--rpm 为服务端每分钟请求上限，超出时返回 429 与 Retry-After；--per-key-rpm 时为每个 API key 各自的上限
+- key：--bad-keys 中的 key 返回 401，--quota-keys 中的 key 返回 429 insufficient_quota(测试 key 池的隔离)
+- 故障注入：按比例随机返回 429、5xx、400，或返回空回复、无法解析的回复
+- 回复：默认按 prompt 中的格式要求给出 是/否、Yes/No、A/B、"x个月"/"x months" 或打包模式的 JSON 数组，
+  --answer 指定固定回复
+- usage 中按字符数估算 prompt/completion token 数
+- n：chat 请求带 n 时返回 n 个 choice，各自随机给出回答(自洽采样模式)
+- logprobs：请求带 logprobs 时返回首个 token 的 top_logprobs，回答的选项概率在 0.5-0.99 之间
+- 结构化输出：请求带 response_format 时按 json_schema 中的字段与枚举值，或按格式要求中的 JSON 样例回复 JSON；
+  带 max_tokens 时按字符数估算截断回复
+- 前缀缓存：--prefix-cache 时模拟服务商的前缀缓存，请求全文(系统提示 + 用户输入)与以往请求相同的前缀
+  按 64 字符为单位命中，命中的 token 数写入 usage 的 cached_tokens
+- 流式：请求带 stream 时以 SSE 逐块(每块 4 个字符)返回，--chunk-delay 为每块的生成时间；
+  --verbose 时模拟回复冗长的模型：回答之后附上一段解释，模型名含 reasoner 时先返回一段思考过程(reasoning_content)
+
+用法:
+python mock_server.py --port 8000 --latency 0.5
+python mock_server.py --port 8000 --latency 0.3 --jitter 0.2 --distribution lognormal --rpm 600 \
+    --error-rate 0.02 --rate-limit-rate 0.01 --empty-rate 0.005
+python mock_server.py --port 8000 --prefix-cache
+python mock_server.py --port 8000 --verbose --chunk-delay 0.02
+python mock_server.py --port 8000 --latency 0.5 --stall-rate 0.03
+python mock_server.py --port 8000 --rpm 600 --per-key-rpm --bad-keys k3 --quota-keys k4
+
+之后把 base_url 设为 http://127.0.0.1:8000/v1 即可。
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai_bodies import chat_completion_body, response_body
+from telemetry import CJK, estimate_tokens
+
+DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal", "exponential")
+MONTHS = [6, 8, 10, 12, 18, 24, 36, 48, 60, 84, 120]
+GARBAGE = "I need more information about the case before I can give an answer."
+# --verbose 时附在回答之后的解释与推理模型的思考过程
+EXPLANATIONS = {
+    "cn": "。理由如下：本案中法院在审理过程中遵循了法定程序，所依据的法律原则与案件事实之间的联系清楚，"
+          "被告人的权利得到了保障，量刑也与同类案件大体相当，因此作出上述判断。",
+    "en": ". The reason is that the court followed the required procedure, the principle at stake was applied "
+          "consistently with the facts of the case, the rights of the defendant were protected, and the outcome "
+          "is in line with comparable cases.",
+}
+REASONING = ("Okay, let me look at the facts of the case and the principle in question. "
+             "The court has to weigh the procedure against the outcome, so I should check each step. ") * 3
+CHUNK_CHARS = 4
+# --stall-rate 的慢请求的延迟倍数
+STALL_FACTOR = 10
+
+CN_YES_NO = re.compile(r'是\s*或\s*否')
+EN_YES_NO = re.compile(r'(?i)yes\s+or\s+no')
+CHOICE = re.compile(r'(?i)A\s*(?:或|or)\s*B')
+CN_MONTHS = re.compile(r'个月')
+EN_MONTHS = re.compile(r'(?i)months')
+# 结构化输出(structured_output.py)的格式要求：{"answer": "是"} 或 {"answer": "否"} / {"months": x}
+JSON_CHOICE = re.compile(r'\{"answer": "(\S+?)"\} (?:或|or) \{"answer": "(\S+?)"\}')
+# 打包模式(packing.py)：要求按场景顺序返回含 n 个 "选项" 的 JSON 数组
+PACKED = re.compile(r'(?:给出\s*(\d+)\s*个回答|Give (\d+) answers)[^"]*"(\S+?)" (?:或|or) "(\S+?)"')
+
+
+def stream_pieces(text, size=CHUNK_CHARS):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def chat_stream_events(body):
+    """chat.completions 的流式事件：先逐块发送思考过程，再逐块发送回复，最后是 finish_reason 与 usage。"""
+    base = {"id": body["id"], "object": "chat.completion.chunk", "created": body["created"], "model": body["model"]}
+    message = body["choices"][0]["message"]
+    events = []
+    for key in ("reasoning_content", "content"):
+        for piece in stream_pieces(message.get(key) or ""):
+            events.append(dict(base, choices=[{"index": 0, "delta": {key: piece}, "finish_reason": None}]))
+    events.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+    events.append(dict(base, choices=[], usage=body["usage"]))
+    return events
+
+
+def response_stream_events(body):
+    """responses 接口的流式事件：逐块发送 output_text，最后是 response.completed。"""
+    text = body["output"][0]["content"][0]["text"] or ""
+    events = [{"type": "response.output_text.delta", "item_id": body["output"][0]["id"], "output_index": 0,
+               "content_index": 0, "delta": piece} for piece in stream_pieces(text)]
+    events.append({"type": "response.completed", "response": body})
+    return [dict(event, sequence_number=k) for k, event in enumerate(events)]
+
+
+def logprobs_body(rng, content, options, top_logprobs):
+    """
+    首个 token 的 logprobs：二选一的 prompt 中所选选项的概率在 0.5-0.99 之间，
+    另一个选项与一个无关 token 分掉其余概率；其余回复的首个字符概率为 0.9。
+    """
+    if not content:
+        return {"content": []}
+    if options and content in options:
+        p = rng.uniform(0.5, 0.99)
+        other = options[1] if content == options[0] else options[0]
+        candidates = [(content, p), (other, (1 - p) * 0.9), ("The", (1 - p) * 0.1)]
+    else:
+        candidates = [(content[0], 0.9), ("The", 0.1)]
+    top = [{"token": token, "logprob": math.log(prob), "bytes": None}
+           for token, prob in candidates[:max(1, top_logprobs)]]
+    return {"content": [dict(top[0], top_logprobs=top)]}
+
+
+def error_body(message, error_type, code=None):
+    return {"error": {"message": message, "type": error_type, "param": None, "code": code}}
+
+
+def sample_latency(rng, distribution, latency, jitter):
+    """按分布抽取一次延迟(秒)，latency 为均值，jitter 为离散程度(uniform 为半宽，其余为标准差)。"""
+    if latency <= 0 or distribution == "constant":
+        return max(0.0, latency)
+    if distribution == "uniform":
+        return max(0.0, rng.uniform(latency - jitter, latency + jitter))
+    if distribution == "normal":
+        return max(0.0, rng.gauss(latency, jitter))
+    if distribution == "lognormal":
+        # 取对数正态分布的参数，使均值为 latency、标准差为 jitter(长尾)
+        sigma2 = math.log(1 + (jitter / latency) ** 2)
+        return rng.lognormvariate(math.log(latency) - sigma2 / 2, math.sqrt(sigma2))
+    if distribution == "exponential":
+        return rng.expovariate(1 / latency)
+    raise ValueError(f"未知的延迟分布 {distribution}")
+
+
+def prompt_text(path, payload):
+    """请求中的用户输入：chat 接口取最后一条消息，responses 接口取 input。"""
+    if path.endswith("/responses"):
+        text = payload.get("input", "")
+        if isinstance(text, list):
+            text = " ".join(str(item.get("content", "")) if isinstance(item, dict) else str(item) for item in text)
+        return str(text)
+    messages = payload.get("messages") or [{}]
+    return str(messages[-1].get("content", ""))
+
+
+def request_text(path, payload):
+    """请求全文(chat 接口为全部消息依次拼接)，用于前缀缓存。"""
+    if path.endswith("/responses"):
+        return prompt_text(path, payload)
+    return "\n".join(str(message.get("content", "")) for message in payload.get("messages") or [])
+
+
+def answer_options(text):
+    """prompt 要求的两个选项，如 ("是", "否")；不是二选一的问题时返回 None。"""
+    if CN_YES_NO.search(text):
+        return ("是", "否")
+    if EN_YES_NO.search(text):
+        return ("Yes", "No")
+    if CHOICE.search(text):
+        return ("A", "B")
+    return None
+
+
+def canned_answer(rng, text):
+    """按 prompt 末尾的格式要求给出一个合法回答。"""
+    packed = PACKED.search(text)
+    if packed:
+        n, first, second = int(packed.group(1) or packed.group(2)), packed.group(3), packed.group(4)
+        return json.dumps([rng.choice([first, second]) for _ in range(n)], ensure_ascii=False)
+    options = answer_options(text)
+    if options:
+        return rng.choice(options)
+    if CN_MONTHS.search(text):
+        return f"{rng.choice(MONTHS)}个月"
+    if EN_MONTHS.search(text):
+        return f"{rng.choice(MONTHS)} months"
+    return "36 months"
+
+
+def structured_answer(rng, text, response_format):
+    """按 response_format 回复 JSON：json_schema 取 schema 中的字段与枚举值，json_object 取格式要求中的样例。"""
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        field, spec = next(iter(schema["properties"].items()))
+        value = rng.choice(spec["enum"]) if "enum" in spec else rng.choice(MONTHS)
+        return json.dumps({field: value}, ensure_ascii=False)
+    choice = JSON_CHOICE.search(text)
+    if choice:
+        return json.dumps({"answer": rng.choice(choice.groups())}, ensure_ascii=False)
+    if '"months"' in text:
+        return json.dumps({"months": rng.choice(MONTHS)})
+    return json.dumps({"answer": canned_answer(rng, text)}, ensure_ascii=False)
+
+
+def truncate(content, max_tokens):
+    """按 estimate_tokens 的估算把回复截断到 max_tokens 个 token 以内。"""
+    while content and estimate_tokens(content) > max_tokens:
+        content = content[:-1]
+    return content
+
+
+class RequestLimit:
+    """服务端每分钟请求上限(令牌桶)，超出时返回需要等待的秒数。"""
+
+    def __init__(self, rpm):
+        self.rate = rpm / 60.0
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def check(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate
+
+
+class PrefixCache:
+    """
+    服务商前缀缓存的替身：以 block 个字符为单位记录请求全文的前缀，返回与以往请求相同的最长前缀长度。
+    与真实服务商一样，请求完成后才写入缓存，同时在途的相同前缀不会命中。
+    """
+
+    def __init__(self, block=64):
+        self.block = block
+        self.prefixes = set()
+        self.lock = threading.Lock()
+
+    def lookup(self, text):
+        with self.lock:
+            matched = 0
+            for end in range(self.block, len(text) + 1, self.block):
+                if hash(text[:end]) not in self.prefixes:
+                    break
+                matched = end
+            return matched
+
+    def store(self, text):
+        with self.lock:
+            self.prefixes.update(hash(text[:end]) for end in range(self.block, len(text) + 1, self.block))
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认 backlog 只有 5，高并发基准下会出现连接排队
+    request_queue_size = 1024
+
+    def __init__(self, address, handler, rpm=None, prefix_cache=False, per_key_rpm=False, bad_keys=(),
+                 quota_keys=()):
+        super().__init__(address, handler)
+        self.rpm = rpm
+        self.per_key_rpm = per_key_rpm
+        self.request_limits = {}
+        self.bad_keys = set(bad_keys)
+        self.quota_keys = set(quota_keys)
+        self.prefix_cache = PrefixCache() if prefix_cache else None
+        self.counts = {}
+        self.counts_lock = threading.Lock()
+
+    def request_limit(self, api_key):
+        """服务端限速器，per_key_rpm 时每个 key 各一个；没有设置 rpm 时返回 None。"""
+        if not self.rpm:
+            return None
+        key = api_key if self.per_key_rpm else None
+        with self.counts_lock:
+            if key not in self.request_limits:
+                self.request_limits[key] = RequestLimit(self.rpm)
+            return self.request_limits[key]
+
+    def count(self, key):
+        with self.counts_lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stats(self):
+        """
+        各类回复的计数：ok、empty、garbage、rate_limited、server_error、bad_request、unauthorized、quota_exceeded，
+        另有慢请求数 stalled 与按 key 的请求数 key:<key>。
+        """
+        with self.counts_lock:
+            return dict(self.counts)
+
+
+def make_handler(latency, jitter, answer=None, distribution="uniform", error_rate=0.0, rate_limit_rate=0.0,
+                 bad_request_rate=0.0, empty_rate=0.0, garbage_rate=0.0, seed=None, verbose=False, chunk_delay=0.0,
+                 stall_rate=0.0):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_stream(self, events, chunk_delay):
+            """以 SSE 逐个发送事件，每个事件前等待 chunk_delay 秒；客户端提前断开时记为 cancelled。"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for event in events:
+                    if chunk_delay and event.get("choices", event.get("delta")):
+                        time.sleep(chunk_delay)
+                    name = f"event: {event['type']}\n" if "type" in event else ""
+                    self.wfile.write(f"{name}data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                self.server.count("cancelled")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            model = payload.get("model", "mock")
+            if not (self.path.endswith("/chat/completions") or self.path.endswith("/responses")):
+                self.send_json(404, error_body(f"Unknown path {self.path}", "invalid_request_error"))
+                return
+
+            server = self.server
+            api_key = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            server.count(f"key:{api_key}")
+            if api_key in server.bad_keys:
+                server.count("unauthorized")
+                self.send_json(401, error_body("Incorrect API key provided", "invalid_request_error",
+                                               "invalid_api_key"))
+                return
+            if api_key in server.quota_keys:
+                server.count("quota_exceeded")
+                self.send_json(429, error_body("You exceeded your current quota", "insufficient_quota",
+                                               "insufficient_quota"))
+                return
+            request_limit = server.request_limit(api_key)
+            if request_limit is not None:
+                wait = request_limit.check()
+                if wait is not None:
+                    server.count("rate_limited")
+                    self.send_json(429, error_body("Rate limit reached", "requests", "rate_limit_exceeded"),
+                                   {"retry-after-ms": str(int(wait * 1000) + 1)})
+                    return
+
+            # 前缀缓存在收到请求时查询(prefill)，完成后写入
+            full_text = request_text(self.path, payload)
+            cached_chars = server.prefix_cache.lookup(full_text) if server.prefix_cache is not None else 0
+            with rng_lock:
+                delay = sample_latency(rng, distribution, latency, jitter)
+                stalled = rng.random() < stall_rate
+                fault = rng.random()
+                text = prompt_text(self.path, payload)
+                if answer is not None:
+                    content = answer
+                elif payload.get("response_format", {}).get("type") in ("json_schema", "json_object"):
+                    content = structured_answer(rng, text, payload["response_format"])
+                else:
+                    content = canned_answer(rng, text)
+                others = [canned_answer(rng, text) if answer is None else answer
+                          for _ in range(int(payload.get("n") or 1) - 1)]
+            if stalled:
+                server.count("stalled")
+                delay *= STALL_FACTOR
+            time.sleep(delay)
+
+            # 故障按顺序占用 [0, 1) 上互不重叠的区间
+            for rate, key in ((rate_limit_rate, "rate_limited"), (error_rate, "server_error"),
+                              (bad_request_rate, "bad_request"), (empty_rate, "empty"), (garbage_rate, "garbage")):
+                if fault < rate:
+                    break
+                fault -= rate
+            else:
+                key = "ok"
+            server.count(key)
+            if key == "rate_limited":
+                self.send_json(429, error_body("Rate limit reached", "requests", "rate_limit_exceeded"),
+                               {"retry-after": "1"})
+                return
+            if key == "server_error":
+                self.send_json(503, error_body("The server is overloaded", "server_error"))
+                return
+            if key == "bad_request":
+                self.send_json(400, error_body("Invalid request", "invalid_request_error"))
+                return
+            if key == "empty":
+                content = ""
+            elif key == "garbage":
+                content = GARBAGE
+            reasoning = None
+            if verbose and key == "ok" and answer is None and "response_format" not in payload:
+                content += EXPLANATIONS["cn" if CJK.search(content) else "en"]
+                reasoning = REASONING if "reasoner" in model else None
+            max_tokens = payload.get("max_tokens") or payload.get("max_output_tokens")
+            if max_tokens:
+                content = truncate(content, max_tokens)
+            stream = bool(payload.get("stream"))
+            if not stream and chunk_delay:
+                # 非流式请求同样要等整段回复生成完
+                time.sleep(chunk_delay * len(stream_pieces(content + (reasoning or ""))))
+
+            prompt_tokens = estimate_tokens(full_text)
+            cached_tokens = estimate_tokens(full_text[:cached_chars])
+            if server.prefix_cache is not None:
+                server.prefix_cache.store(full_text)
+            if self.path.endswith("/chat/completions"):
+                logprobs = None
+                if payload.get("logprobs"):
+                    with rng_lock:
+                        logprobs = logprobs_body(rng, content, answer_options(text), payload.get("top_logprobs") or 0)
+                body = chat_completion_body(model, content, prompt_tokens, cached_tokens, logprobs, reasoning)
+                for k, other in enumerate(others, start=1):
+                    body["choices"].append({"index": k, "message": {"role": "assistant", "content": other},
+                                            "finish_reason": "stop"})
+                    body["usage"]["completion_tokens"] += estimate_tokens(other)
+                    body["usage"]["total_tokens"] += estimate_tokens(other)
+                if stream:
+                    self.send_stream(chat_stream_events(body), chunk_delay)
+                else:
+                    self.send_json(200, body)
+            else:
+                body = response_body(model, content, prompt_tokens, cached_tokens)
+                if stream:
+                    self.send_stream(response_stream_events(body), chunk_delay)
+                else:
+                    self.send_json(200, body)
+
+    return MockHandler
+
+
+def start_server(port=0, latency=0.5, jitter=0.1, answer=None, distribution="uniform", rpm=None,
+                 error_rate=0.0, rate_limit_rate=0.0, bad_request_rate=0.0, empty_rate=0.0, garbage_rate=0.0,
+                 seed=None, prefix_cache=False, verbose=False, chunk_delay=0.0, stall_rate=0.0, per_key_rpm=False,
+                 bad_keys=(), quota_keys=()):
+    """
+    在后台线程中启动 mock 服务。
+
+    参数:
+    latency, jitter, distribution -- 延迟分布，见 sample_latency
+    answer -- 固定回复；None 时按 prompt 的格式要求随机给出合法回答
+    rpm -- 服务端每分钟请求上限，None 表示不限；per_key_rpm 为 True 时为每个 API key 各自的上限
+    error_rate, rate_limit_rate, bad_request_rate -- 随机返回 503、429、400 的比例
+    empty_rate, garbage_rate -- 随机返回空回复、无法解析的回复的比例
+    seed -- 随机数种子
+    prefix_cache -- 为 True 时模拟服务商的前缀缓存，见 PrefixCache
+    verbose -- 为 True 时回答之后附上解释，推理模型另有思考过程
+    chunk_delay -- 每 4 个字符的生成时间(秒)，流式请求逐块等待，非流式请求一次等待整段
+    stall_rate -- 延迟放大 STALL_FACTOR 倍的请求比例
+    bad_keys, quota_keys -- 返回 401、返回 429 insufficient_quota 的 API key
+
+    返回:
+    (server, base_url)，用完后调用 server.shutdown()；server.stats() 为各类回复的计数。
+    """
+    handler = make_handler(latency, jitter, answer, distribution, error_rate, rate_limit_rate,
+                           bad_request_rate, empty_rate, garbage_rate, seed, verbose, chunk_delay, stall_rate)
+    server = MockServer(("127.0.0.1", port), handler, rpm, prefix_cache, per_key_rpm, bad_keys, quota_keys)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="平均延迟(秒)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--answer", help="固定回复，默认按 prompt 的格式要求生成")
+    parser.add_argument("--rpm", type=float, help="服务端每分钟请求上限")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="随机返回 429 的比例")
+    parser.add_argument("--bad-request-rate", type=float, default=0.0, help="返回 400 的比例")
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="返回空回复的比例")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="返回无法解析的回复的比例")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--prefix-cache", action="store_true", help="模拟服务商的前缀缓存")
+    parser.add_argument("--verbose", action="store_true", help="回答之后附上解释，推理模型另有思考过程")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="每 4 个字符的生成时间(秒)")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help=f"延迟放大 {STALL_FACTOR} 倍的请求比例")
+    parser.add_argument("--per-key-rpm", action="store_true", help="--rpm 为每个 API key 各自的上限")
+    parser.add_argument("--bad-keys", nargs="+", default=[], help="返回 401 的 API key")
+    parser.add_argument("--quota-keys", nargs="+", default=[], help="返回 429 insufficient_quota 的 API key")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.latency, args.jitter, args.answer, args.distribution, args.rpm,
+                                    args.error_rate, args.rate_limit_rate, args.bad_request_rate,
+                                    args.empty_rate, args.garbage_rate, args.seed, args.prefix_cache,
+                                    args.verbose, args.chunk_delay, args.stall_rate, args.per_key_rpm,
+                                    args.bad_keys, args.quota_keys)
+    print("mock 服务已启动:", base_url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("回复计数:", server.stats())
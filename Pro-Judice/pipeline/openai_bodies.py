@@ -0,0 +1,56 @@
+"""
+OpenAI 兼容接口的回复体：chat.completions 与 responses 接口返回的 JSON。
+
+mock_server.py 用它们回复请求，batch_mode.LocalBatchBackend 用 chat_completion_body 生成 Batch 输出文件的每一行；
+usage 中的 token 数按 telemetry.estimate_tokens 估算。
+"""
+import time
+import uuid
+
+from telemetry import estimate_tokens
+
+
+def chat_completion_body(model, content, prompt_tokens=0, cached_tokens=0, logprobs=None, reasoning=None):
+    reasoning_tokens = estimate_tokens(reasoning or "")
+    completion_tokens = estimate_tokens(content or "") + reasoning_tokens
+    body = {
+        "id": "chatcmpl-" + uuid.uuid4().hex,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens,
+                  "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                  "completion_tokens_details": {"reasoning_tokens": reasoning_tokens}},
+    }
+    if logprobs is not None:
+        body["choices"][0]["logprobs"] = logprobs
+    if reasoning:
+        body["choices"][0]["message"]["reasoning_content"] = reasoning
+    return body
+
+
+def response_body(model, content, prompt_tokens=0, cached_tokens=0):
+    completion_tokens = estimate_tokens(content or "")
+    return {
+        "id": "resp_" + uuid.uuid4().hex,
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": "msg_" + uuid.uuid4().hex,
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": content, "annotations": []}],
+        }],
+        "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens,
+                  "input_tokens_details": {"cached_tokens": cached_tokens}},
+    }
@@ -0,0 +1,217 @@
+"""
+多原则打包：E1/E2 中同一案件的 9 条 prompt 只有场景段落不同，打包模式把案件事实只发送一次，
+附上编号的 9 个场景，要求模型按场景顺序返回 JSON 数组。请求数减为 1/9，输入 token 也相应减少，
+对 DeepSeek-R1 等推理模型尤其明显。
+
+- 打包的请求按案件记录在 <结果>_packed_cases.jsonl 日志中，断点、遥测与回复缓存与逐条模式相同
+- 校验：回复中须有一个长度为 9 的 JSON 数组，且每个元素都能被 answer_classifier 识别为选项；
+  不合格的案件在日志中标记为未完成并重新请求(不读回复缓存)，最多 --rounds 轮
+- 回复拆回逐条模式的行(每个案件 × 原则一行)，写入 <结果>_packed.parquet，列与逐条模式的结果表相同
+  (storage.RESULT_SCHEMA)；仍不合格的案件各行 answer 为空
+- --sample N 时只打包随机 N 个案件(固定种子，N 增大时前面的案件不变，可续跑)，结果写入 <结果>_packed_sample.*，
+  并与逐条模式已有的结果逐行比较，报告一致率与各选项的比例
+
+用法:
+python packing.py --experiments E1 --models deepseek-r1 --sample 50
+python packing.py --experiments E1 E2 --languages cn
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+
+import pandas as pd
+
+import answer_classifier as ac
+import journal as jn
+import prompt_gen
+import repair
+import run_experiments as rx
+import storage
+import telemetry as tm
+
+JSON_ARRAY = re.compile(r'\[[^\[\]]*\]')
+# 中文引号与全角标点会让 json.loads 失败
+QUOTES = str.maketrans({'“': '"', '”': '"', '「': '"', '」': '"', '，': ',', '［': '[', '］': ']'})
+SAMPLE_SEED = 0
+
+
+def packed_paths(result_file, sample=False):
+    """(打包请求的结果文件, 拆回逐条后的结果文件)，如 results_gpt-4o.xlsx ->
+    results_gpt-4o_packed_cases.xlsx, results_gpt-4o_packed.xlsx"""
+    stem = os.path.splitext(result_file)[0] + ('_packed_sample' if sample else '_packed')
+    return stem + '_cases.xlsx', stem + '.xlsx'
+
+
+def parse_packed(answer, n, experiment):
+    """
+    从回复中取最后一个能解析的 JSON 数组。
+
+    返回:
+    长度为 n 的回答列表；数组长度不对或有元素识别不出选项时返回 None。
+    """
+    text = ac.THINK_CLOSED.sub(' ', str(answer or '')).translate(QUOTES)
+    for candidate in reversed(JSON_ARRAY.findall(text)):
+        try:
+            items = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(items, list) or len(items) != n:
+            continue
+        items = [str(item) for item in items]
+        labels = ac.classify(pd.Series(items), experiment)['label']
+        if labels.isna().any() or (labels == ac.EMPTY).any():
+            return None
+        return items
+    return None
+
+
+def sample_cases(cases, n=None):
+    """随机抽取 n 个案件；n 为 None 时返回全部案件(原顺序)。"""
+    if n is None:
+        return cases
+    return cases.sample(frac=1, random_state=SAMPLE_SEED).head(n).reset_index(drop=True)
+
+
+def packed_job(job, sample=None):
+    """
+    逐条模式的任务 -> 打包模式的任务与拆回逐条用的行表。
+
+    返回:
+    (打包任务, 逐条的行表)，行表即 prompt_gen.build_prompts 的输出，与打包 prompt 的案件顺序相同。
+    """
+    source = job["prompts"]
+    cases = sample_cases(prompt_gen.load_cases(source.case_file, source.family), sample)
+    principles = prompt_gen.load_principles(source.principle_file, source.family)
+    cases_file, _ = packed_paths(job["result_file"], sample is not None)
+    job = dict(job, name=job["name"] + "-packed", prompts=prompt_gen.build_packed_prompts(cases, principles, source.family),
+               result_file=cases_file, suffix="", extract_value=None, prefix_cache=False, xlsx=False, stream=False,
+               n_principles=len(principles))
+    return job, prompt_gen.build_prompts(cases, principles, source.family)
+
+
+def validate(job):
+    """
+    校验打包任务日志中各案件的回复。
+
+    返回:
+    ({行号: 回答列表}, 不合格案件的 gaps 表(列 row, gap，可交给 repair.mark_pending))。
+    """
+    latest = jn.Journal(jn.journal_path_for(job["result_file"])).latest()
+    parsed = {}
+    invalid = []
+    for row in range(1, len(job["prompts"]) + 1):
+        record = latest.get(row)
+        items = None
+        if record is not None and not record.get('error'):
+            items = parse_packed(record.get('answer'), job["n_principles"], job["meta"]["experiment"])
+        if items is None:
+            invalid.append(row)
+        else:
+            parsed[row] = items
+    return parsed, pd.DataFrame({'row': invalid, 'gap': 'unparsed'})
+
+
+def unpack(job, rows, parsed):
+    """把各案件的回答拆回逐条的行(行表中每个案件连续 n_principles 行)，不合格的案件 answer 为空。"""
+    answers = []
+    for k in range(1, len(job["prompts"]) + 1):
+        answers.extend(parsed.get(k, [''] * job["n_principles"]))
+    return rows.assign(answer=answers)
+
+
+def compare(packed, unpacked, experiment):
+    """
+    与逐条模式的结果逐行比较(按 CaseId 与 Principle 对齐)。
+
+    返回:
+    字典：对齐行数、两边都识别出选项的行数、一致率，以及两种模式下各选项的比例。
+    """
+    keys = ['CaseId', 'Principle']
+    merged = packed[keys + ['answer']].merge(unpacked[keys + ['answer']], on=keys, suffixes=('_packed', '_single'))
+    packed_label = ac.classify(merged['answer_packed'], experiment)['label']
+    single_label = ac.classify(merged['answer_single'], experiment)['label']
+    both = packed_label.notna() & single_label.notna() & (packed_label != ac.EMPTY) & (single_label != ac.EMPTY)
+    return {
+        "rows": len(merged),
+        "compared": int(both.sum()),
+        "agreement": (packed_label[both] == single_label[both]).mean() if both.any() else float('nan'),
+        "packed": packed_label[both].value_counts(normalize=True).sort_index().round(3).to_dict(),
+        "single": single_label[both].value_counts(normalize=True).sort_index().round(3).to_dict(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "experiments.toml"))
+    parser.add_argument("--experiments", nargs="+", help="默认取 [run] 中的 E1/E2")
+    parser.add_argument("--languages", nargs="+")
+    parser.add_argument("--models", nargs="+")
+    parser.add_argument("--sample", type=int, help="只打包随机 N 个案件，并与逐条模式的结果比较")
+    parser.add_argument("--rounds", type=int, default=3, help="不合格案件最多请求的轮数(含第一轮)")
+    parser.add_argument("--no-cache", action="store_true", help="不读写回复缓存")
+    parser.add_argument("--xlsx", action="store_true", help="除 parquet 外另导出 Excel 结果")
+    args = parser.parse_args()
+
+    config = rx.load_config(args.config)
+    config_dir = os.path.dirname(os.path.abspath(args.config))
+    experiments = args.experiments or [experiment for experiment in
+                                       config.get("run", {}).get("experiments", list(config["experiments"]))
+                                       if experiment in ac.KINDS]
+    jobs = []
+    for job in rx.build_jobs(config, config_dir, experiments, args.languages, args.models):
+        source = job["prompts"]
+        if not isinstance(source, rx.PromptSource) or source.family not in prompt_gen.PACKED_TEXT:
+            print(f"  - {job['name']}: 打包模式只支持由 family 生成 prompt 的 E1/E2，跳过")
+            continue
+        jobs.append((job,) + packed_job(job, args.sample))
+    if not jobs:
+        return
+
+    for job, packed, rows in jobs:
+        single_tokens = tm.estimate_tokens(rows['prompt'] + job["suffix"]).sum()
+        print(f"  - {packed['name']}: {len(packed['prompts'])} 次请求(逐条 {len(rows)} 次)，"
+              f"估算输入 {int(tm.estimate_tokens(packed['prompts']['prompt']).sum())} token"
+              f"(逐条 {int(single_tokens)} token)")
+
+    cache = None if args.no_cache else rx.open_cache(config, config_dir)
+    pending = [packed for _, packed, _ in jobs]
+    for round_no in range(1, args.rounds + 1):
+        # 第一轮之后只补跑不合格的案件，不读缓存，否则会拿回同一条坏回复
+        results = asyncio.run(rx.run_jobs(pending, config.get("providers"), cache if round_no == 1 else None))
+        retry = []
+        for packed, result in zip(pending, results):
+            if isinstance(result, Exception):
+                print(f"!!!!任务失败: {packed['name']} - {result}")
+                continue
+            _, invalid = validate(packed)
+            if not invalid.empty and round_no < args.rounds:
+                print(f"{packed['name']}: {len(invalid)} 个案件的回复不合格，第 {round_no + 1} 轮重新请求")
+                repair.mark_pending(packed["result_file"], invalid)
+                retry.append(packed)
+        if not retry:
+            break
+        pending = retry
+    if cache is not None:
+        cache.close()
+
+    print("\n拆回逐条:")
+    for job, packed, rows in jobs:
+        parsed, _ = validate(packed)
+        df = unpack(packed, rows, parsed)
+        _, result_file = packed_paths(job["result_file"], args.sample is not None)
+        storage.write_results(df, storage.parquet_path_for(result_file), **job["meta"])
+        if args.xlsx or job["xlsx"]:
+            df.to_excel(result_file, index=False)
+        print(f"  - {job['name']}: {len(parsed)}/{len(packed['prompts'])} 个案件合格 -> "
+              f"{storage.parquet_path_for(result_file)}")
+        if not (os.path.exists(job["result_file"]) or os.path.exists(storage.parquet_path_for(job["result_file"]))):
+            continue
+        s = compare(df, storage.read_table(job["result_file"]), job["meta"]["experiment"])
+        print(f"    与逐条模式比较: {s['rows']} 行对齐，{s['compared']} 行两边都有回答，一致率 {s['agreement']:.1%}，"
+              f"选项比例 打包 {s['packed']} / 逐条 {s['single']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+运行前的费用与耗时估算：按 experiments.toml 的矩阵读取 prompt(与 generate_question / generate_prompts_en
+生成的内容相同)，估算每个任务尚未完成的行的 token 数、费用与按当前并发/限速所需的时间，超出预算时给出警告。
+
+- 输入 token：安装了 tiktoken 时 OpenAI 模型用 tiktoken 计数，其余用 telemetry.estimate_tokens 的启发式估算，
+  并用遥测中实际的 prompt_tokens 校准(同一任务已跑过的行，实际值 / 估算值)
+- 输出 token 与延迟：取该任务遥测中的平均值；没有遥测时用 DEFAULT_OUTPUT_TOKENS / DEFAULT_LATENCY，
+  推理模型另加 REASONING_TOKENS / REASONING_LATENCY
+- 费用：telemetry.PRICES 中的单价；遥测中有前缀缓存命中(cached_tokens)时，按同样的命中率计入缓存单价
+- 耗时：同一服务商的任务共享并发上限与限速，所需时间取 并发受限(总延迟 / 并发数) 与 限速受限(请求数 / rpm) 中较大者；
+  各服务商同时运行，整体耗时取最慢的服务商
+
+用法:
+python planner.py
+python planner.py --experiments E3 --budget 50 --max-hours 4
+python planner.py --all          # 忽略断点日志，按全部行估算
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import async_engine as ae
+import journal as jn
+import run_experiments as rx
+import storage
+import telemetry as tm
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 没有遥测时每条回答的输出 token 数(回答只有 是/否、A/B 或 "x个月")
+DEFAULT_OUTPUT_TOKENS = {"E1": 4, "E2": 4, "E3": 8}
+# 推理模型的思考过程另计的 token 数
+REASONING_TOKENS = {"deepseek-reasoner": 700}
+# 没有遥测时每次请求的平均延迟(秒)
+DEFAULT_LATENCY = 2.0
+REASONING_LATENCY = {"deepseek-reasoner": 30.0}
+# 每条消息的格式开销(token)
+MESSAGE_OVERHEAD = 4
+
+
+def prompt_frame(job):
+    """任务的全部 prompt 文本(含系统提示与格式要求)，索引为行号(从 1 开始)。"""
+    chunks = [job["prompts"]] if isinstance(job["prompts"], (str, pd.DataFrame)) else job["prompts"]
+    texts = []
+    for chunk in chunks:
+        df = storage.read_table(chunk) if isinstance(chunk, str) else chunk
+        texts.append(df['prompt'].astype(str))
+    texts = pd.concat(texts, ignore_index=True)
+    texts.index = texts.index + 1
+    n_messages = 1 if job["system_prompt"] is None else 2
+    return pd.DataFrame({"text": (job["system_prompt"] or "") + texts + job["suffix"], "messages": n_messages})
+
+
+def count_tokens(texts, model):
+    """输入 token 数，OpenAI 模型在装有 tiktoken 时精确计数，其余为启发式估算。返回 (Series, 方法)。"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = None
+        if encoding is not None:
+            counts = [len(tokens) for tokens in encoding.encode_ordinary_batch(texts.tolist())]
+            return pd.Series(counts, index=texts.index), "tiktoken"
+    return tm.estimate_tokens(texts), "heuristic"
+
+
+def load_history(job):
+    """该任务遥测中成功发送的请求，没有时返回 None。"""
+    path = tm.telemetry_path_for(job["result_file"])
+    if not os.path.exists(path):
+        return None
+    df = tm.load([path])
+    df = df[df["status"] == "ok"] if not df.empty else df
+    return df if not df.empty else None
+
+
+def plan_job(job, pending_only=True, prices=None):
+    """
+    估算一个任务。
+
+    返回:
+    字典：待请求行数、输入/输出 token、前缀缓存命中率、费用、平均延迟，以及各估算值的来源。
+    """
+    prompts = prompt_frame(job)
+    tokens, method = count_tokens(prompts["text"], job["model"])
+    tokens = tokens + MESSAGE_OVERHEAD * prompts["messages"]
+
+    history = load_history(job)
+    calibration = 1.0
+    if history is not None and method == "heuristic":
+        measured = history[history["prompt_tokens"] > 0].drop_duplicates("row", keep="last").set_index("row")
+        rows = measured.index.intersection(tokens.index)
+        if len(rows):
+            calibration = measured.loc[rows, "prompt_tokens"].sum() / tokens.loc[rows].sum()
+            method = f"heuristic x{calibration:.2f}"
+    tokens = tokens * calibration
+
+    if pending_only:
+        done = jn.Journal(jn.journal_path_for(job["result_file"])).done_rows()
+        tokens = tokens[~tokens.index.isin(list(done))]
+
+    experiment = job["meta"]["experiment"]
+    if history is not None:
+        output_tokens = history["completion_tokens"].mean()
+        latency = history["latency"].mean()
+        prompt_total = history["prompt_tokens"].sum()
+        hit_rate = history["cached_tokens"].sum() / prompt_total if prompt_total else 0.0
+        source = "telemetry"
+    else:
+        output_tokens = DEFAULT_OUTPUT_TOKENS.get(experiment, 8) + REASONING_TOKENS.get(job["model"], 0)
+        latency = REASONING_LATENCY.get(job["model"], DEFAULT_LATENCY)
+        hit_rate = 0.0
+        source = "default"
+
+    n = len(tokens)
+    usage = {"prompt_tokens": tokens.sum(), "cached_tokens": tokens.sum() * hit_rate,
+             "completion_tokens": n * output_tokens}
+    prices = tm.PRICES if prices is None else prices
+    return {
+        "job": job["name"],
+        "base_url": job["base_url"],
+        "pending": n,
+        "prompt_tokens": int(round(usage["prompt_tokens"])),
+        "completion_tokens": int(round(usage["completion_tokens"])),
+        "cache_hit": hit_rate,
+        "cost": tm.estimate_cost(job["model"], usage, prices),
+        "latency": latency,
+        "tokens_from": method,
+        "output_from": source,
+    }
+
+
+def provider_hours(plan, overrides=None):
+    """各服务商所需小时数：max(总延迟 / 并发数, 请求数 / 每分钟限速 * 60)。"""
+    rows = []
+    for base_url, group in plan.groupby("base_url"):
+        concurrency = ae.provider_setting(base_url, "concurrency", overrides)
+        rpm = ae.provider_setting(base_url, "rpm", overrides)
+        busy = (group["pending"] * group["latency"]).sum() / concurrency
+        limited = group["pending"].sum() / rpm * 60
+        rows.append({"base_url": base_url, "requests": int(group["pending"].sum()), "concurrency": concurrency,
+                     "rpm": rpm, "hours": max(busy, limited) / 3600,
+                     "bound": "rpm" if limited > busy else "concurrency"})
+    return pd.DataFrame(rows).set_index("base_url")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "experiments.toml"))
+    parser.add_argument("--experiments", nargs="+")
+    parser.add_argument("--languages", nargs="+")
+    parser.add_argument("--models", nargs="+")
+    parser.add_argument("--all", action="store_true", help="忽略断点日志，按全部行估算")
+    parser.add_argument("--budget", type=float, help="费用上限(美元)，默认取 [run] budget")
+    parser.add_argument("--max-hours", type=float, help="耗时上限(小时)，默认取 [run] max_hours")
+    args = parser.parse_args()
+
+    config = rx.load_config(args.config)
+    config_dir = os.path.dirname(os.path.abspath(args.config))
+    jobs = rx.build_jobs(config, config_dir, args.experiments, args.languages, args.models)
+    run_cfg = config.get("run", {})
+    budget = args.budget if args.budget is not None else run_cfg.get("budget")
+    max_hours = args.max_hours if args.max_hours is not None else run_cfg.get("max_hours")
+
+    # 同一实验与语言的各模型共用一个 prompt 表，生成一次
+    frames = {}
+    plans = []
+    for job in jobs:
+        source = str(job["prompts"])
+        if source not in frames:
+            frames[source] = pd.concat(list(job["prompts"]), ignore_index=True) \
+                if isinstance(job["prompts"], rx.PromptSource) else job["prompts"]
+        plans.append(plan_job(dict(job, prompts=frames[source]), pending_only=not args.all))
+    plan = pd.DataFrame(plans)
+    providers = provider_hours(plan, config.get("providers"))
+    # 单独运行该任务(不与同一服务商的其他任务共享上限)所需小时数
+    concurrency = plan["base_url"].map(providers["concurrency"])
+    rpm = plan["base_url"].map(providers["rpm"])
+    plan["hours_alone"] = np.maximum(plan["pending"] * plan["latency"] / concurrency, plan["pending"] / rpm * 60) / 3600
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(plan.drop(columns=["base_url"]).set_index("job").round({"cache_hit": 2, "cost": 2, "latency": 2, "hours_alone": 2})
+              .to_string())
+        print()
+        print(providers.round({"hours": 2}).to_string())
+
+    total_cost = plan["cost"].sum(min_count=1)
+    hours = providers["hours"].max() if len(providers) else 0.0
+    unpriced = plan.loc[plan["cost"].isna() & (plan["pending"] > 0), "job"].tolist()
+    print(f"\n共 {int(plan['pending'].sum())} 次请求，输入 {int(plan['prompt_tokens'].sum())} token，"
+          f"输出 {int(plan['completion_tokens'].sum())} token，估算费用 ${0 if pd.isna(total_cost) else total_cost:.2f}，"
+          f"预计耗时 {hours:.2f} 小时")
+    if unpriced:
+        print("!!!!以下任务的模型没有单价，未计入费用:", ", ".join(unpriced))
+    if budget is not None and not pd.isna(total_cost) and total_cost > budget:
+        print(f"!!!!估算费用 ${total_cost:.2f} 超出预算 ${budget:.2f}")
+    if max_hours is not None and hours > max_hours:
+        print(f"!!!!预计耗时 {hours:.2f} 小时超出上限 {max_hours:.2f} 小时")
+
+
+if __name__ == "__main__":
+    main()
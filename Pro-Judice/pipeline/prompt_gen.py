@@ -0,0 +1,160 @@
+"""
+E1/E2/E3 prompt 生成：案件 × 原则(× 实验)的笛卡尔积按案件分块、整列拼接生成，
+代替各 generate_question 脚本中逐条 append 的嵌套循环。
+
+iter_prompt_chunks 每次只生成 chunk_cases 个案件的 prompt，可直接交给 run_experiments
+使用而不必先写出 xlsx；案件数从 500 增长到 50,000 时耗时线性增长，内存只取决于块大小。
+
+各 prompt 的文字与原 generate_question 脚本逐字一致。
+build_packed_prompts 为 packing.py 的打包模式生成每个案件一条、含全部原则场景的 prompt。
+"""
+import json
+
+import pandas as pd
+
+CN_E1_TAIL = '\n' + '\n该判决是否公正，请回答是或否。\n' + '\n回答：\n' + '选项：是/否'
+EN_E1_TAIL = '\n' + '\nIs the judgment fair? Please answer yes or no.\n' + '\nAnswer:\n' + 'Option: Yes or No'
+CN_E3_TAIL = '\n' + '\n请回答刑期，精确到几个月，如36个月。\n' + '\n回答：\n' + '【】个月。'
+EN_E3_TAIL = ('\n' + '\nPlease estimate a likely the term of imprisonment，estimate a likely prison sentence and give only one final number in months.\n'
+              + '\nAnswer:\n' + '【】months.')
+
+# family -> (案件字段, 原则表中 [原则, 场景...] 所在列)
+# 案件字段为 None 表示案件文件本身就是字符串列表(E3/en/data/en_question_list.json)
+FAMILIES = {
+    "E1_cn": ("fact", [0, 1]),
+    "E1_en": ("question", [0, 1]),
+    "E2_cn": ("fact", [0, 1]),
+    "E2_en": ("question", [0, 1]),
+    "E3_cn": ("fact", [0, 1, 2]),
+    "E3_en": (None, [1, 3, 5]),
+}
+
+
+# 打包模式(packing.py)：family -> (案件事实前缀, 场景前的说明, 结尾的格式要求)，{n} 为场景数
+PACKED_TEXT = {
+    "E1_cn": ("案件事实：\n", "以下是该案件的 {n} 个审判场景，请分别判断每个场景中的判决是否公正。",
+              '\n回答：\n请按场景顺序给出 {n} 个回答，只输出一个 JSON 数组，每个元素为 "是" 或 "否"，如 ["是", "否", ...]'),
+    "E1_en": ("fact:\n", "Below are {n} trial scenarios of this case. For each scenario, is the judgment fair?",
+              '\nAnswer:\nGive {n} answers in scenario order. Output only a JSON array whose elements are "Yes" or "No", '
+              'e.g. ["Yes", "No", ...]'),
+    "E2_cn": ("案件事实：\n", "以下是该案件的 {n} 个审判场景，请分别为每个场景选择选项。",
+              '\n回答：\n请按场景顺序给出 {n} 个回答，只输出一个 JSON 数组，每个元素为 "A" 或 "B"，如 ["A", "B", ...]'),
+    "E2_en": ("fact：\n", "Below are {n} trial scenarios of this case. Please choose an option for each scenario.",
+              '\nAnswer:\nGive {n} answers in scenario order. Output only a JSON array whose elements are "A" or "B", '
+              'e.g. ["A", "B", ...]'),
+}
+
+
+def load_cases(case_file, family):
+    """读取案件文件，返回含 fact 列(E2_cn 另含 accusations 列)的 DataFrame，CaseId 从 1 开始。"""
+    field = FAMILIES[family][0]
+    with open(case_file, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    cases = pd.DataFrame({'CaseId': range(1, len(items) + 1)})
+    cases['fact'] = items if field is None else [item.get(field) for item in items]
+    if family == "E2_cn":
+        cases['accusations'] = ['罪，'.join(item.get("meta").get("accusation")) + '罪' for item in items]
+    return cases
+
+
+def load_principles(principle_file, family):
+    """读取原则表前 9 行，返回列为 p, Principle, scenario(, scenario_2) 的 DataFrame。"""
+    columns = FAMILIES[family][1]
+    df = pd.read_excel(principle_file, header=None, skiprows=1, nrows=9)
+    principles = pd.DataFrame({'p': range(len(df)), 'Principle': df[columns[0]].tolist(), 'scenario': df[columns[1]].tolist()})
+    if len(columns) > 2:
+        principles['scenario_2'] = df[columns[2]].tolist()
+    return principles
+
+
+def build_prompts(cases, principles, family):
+    """
+    生成一块案件的全部 prompt。
+
+    参数:
+    cases -- load_cases 的结果(或其中若干行)
+    principles -- load_principles 的结果
+    family -- FAMILIES 中的名称
+
+    返回:
+    与对应 generate_question 脚本输出列相同的 DataFrame。
+    """
+    grid = cases.merge(principles, how='cross')
+    fact = grid['fact']
+    if family in ("E1_cn", "E1_en"):
+        head, tail = ("案件事实：\n", CN_E1_TAIL) if family == "E1_cn" else ("fact:\n", EN_E1_TAIL)
+        grid['prompt'] = head + fact + '\n' + grid['scenario'] + tail
+    elif family == "E2_cn":
+        grid['prompt'] = ("案件事实：\n" + fact + '\n' + grid['scenario'] + '\n'
+                          + '\n请选择选项：A、根据刑法条文，应当被判' + grid['accusations']
+                          + '；B、根据刑事诉讼法' + grid['Principle'] + '的原则，不接受判决。\n'
+                          + '\n回答：\n' + 'A 或 B')
+    elif family == "E2_en":
+        grid['prompt'] = ("fact：\n" + fact + '\n' + grid['scenario'] + '\n'
+                          + '\nPlease choose Option A: Pursuant to the Criminal Law, the corresponding offense shall be determined; '
+                          + 'Option B: Pursuant to the Criminal Procedure Law of ' + grid['Principle']
+                          + ', the judgment shall not be accepted.\n' + '\nAnswer: \n' + 'A or B')
+    if family.startswith("E1") or family.startswith("E2"):
+        grid['answer'] = ''
+        return grid.rename(columns={'scenario': 'Senario'})[['CaseId', 'Principle', 'Senario', 'prompt', 'answer']]
+
+    head, tail = ("案件事实：\n", CN_E3_TAIL) if family == "E3_cn" else ("Case facts:\n", EN_E3_TAIL)
+    e31 = grid[['CaseId', 'p', 'Principle']].assign(Experiment='E_3_1', answer='', order=0,
+                                                    prompt=head + fact + '\n' + grid['scenario'] + tail)
+    # 原脚本中 E_3_2 的场景前多一个空行，保持一致
+    e32 = grid[['CaseId', 'p', 'Principle']].assign(Experiment='E_3_2', answer='', order=1,
+                                                    prompt=head + fact + '\n' + '\n' + grid['scenario_2'] + tail)
+    both = pd.concat([e31, e32]).sort_values(['CaseId', 'p', 'order'], kind='stable')
+    return both[['CaseId', 'Principle', 'Experiment', 'answer', 'prompt']].reset_index(drop=True)
+
+
+def build_packed_prompts(cases, principles, family):
+    """
+    打包模式：每个案件一条 prompt，案件事实只出现一次，其后是编号的各原则场景(E2 每个场景附各自的选项)，
+    最后要求按场景顺序返回 JSON 数组。只支持 E1/E2(PACKED_TEXT 中的 family)。
+
+    返回:
+    列为 CaseId, prompt, answer 的 DataFrame，每个案件一行，顺序与 cases 相同。
+    """
+    grid = cases.merge(principles, how='cross')
+    number = (grid['p'] + 1).astype(str)
+    if family == "E1_cn":
+        items = '\n场景' + number + '：' + grid['scenario']
+    elif family == "E1_en":
+        items = '\nScenario ' + number + ': ' + grid['scenario']
+    elif family == "E2_cn":
+        items = ('\n场景' + number + '：' + grid['scenario'] + '\n选项：A、根据刑法条文，应当被判' + grid['accusations']
+                 + '；B、根据刑事诉讼法' + grid['Principle'] + '的原则，不接受判决。')
+    elif family == "E2_en":
+        items = ('\nScenario ' + number + ': ' + grid['scenario']
+                 + '\nOption A: Pursuant to the Criminal Law, the corresponding offense shall be determined; '
+                 + 'Option B: Pursuant to the Criminal Procedure Law of ' + grid['Principle']
+                 + ', the judgment shall not be accepted.')
+    else:
+        raise ValueError(f"{family} 不支持打包模式")
+    items = items.groupby(grid['CaseId'], sort=False).agg(''.join)
+    head, question, tail = PACKED_TEXT[family]
+    n = len(principles)
+    packed = cases[['CaseId']].reset_index(drop=True)
+    packed['prompt'] = (head + cases['fact'].astype(str).to_numpy() + '\n' + question.format(n=n)
+                        + items.loc[packed['CaseId']].to_numpy() + '\n' + tail.format(n=n))
+    packed['answer'] = ''
+    return packed
+
+
+def iter_prompt_chunks(family, case_file, principle_file, chunk_cases=1000):
+    """按 chunk_cases 个案件一块依次生成 prompt，CaseId 在各块之间连续。"""
+    cases = load_cases(case_file, family)
+    principles = load_principles(principle_file, family)
+    for start in range(0, len(cases), chunk_cases):
+        yield build_prompts(cases.iloc[start:start + chunk_cases], principles, family)
+
+
+def generate(family, case_file, principle_file, output_file=None):
+    """生成全部 prompt；给定 output_file 时另存，扩展名为 .parquet 时写 parquet，否则写 xlsx。"""
+    df = pd.concat(iter_prompt_chunks(family, case_file, principle_file), ignore_index=True)
+    if output_file is not None and output_file.endswith('.parquet'):
+        df.to_parquet(output_file, index=False)
+    elif output_file is not None:
+        df.to_excel(output_file, index=False)
+    return df
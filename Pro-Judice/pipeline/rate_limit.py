@@ -0,0 +1,113 @@
+import asyncio
+import email.utils
+import random
+import time
+
+import openai
+
+# 各服务商每分钟请求数上限的初始值，遇到 429 会自动下调，之后逐步恢复
+PROVIDER_RPM = {
+    "https://api.deepseek.com": 600,
+    "https://dashscope.aliyuncs.com/compatible-mode/v1": 300,
+    "https://openrouter.ai/api/v1": 200,
+    "https://api.openai.com/v1": 500,
+}
+DEFAULT_RPM = 60
+
+RETRYABLE = "retryable"
+PERMANENT = "permanent"
+
+
+class AdaptiveRateLimiter:
+    """
+    令牌桶限速器：按 rpm 匀速发放令牌，最多积攒 1 秒的突发量。
+    收到 429 时速率减半并按 Retry-After 暂停发放，之后每次成功按上限的 5% 线性恢复(AIMD)。
+    """
+
+    def __init__(self, rpm):
+        self.max_rate = rpm / 60.0
+        self.min_rate = self.max_rate / 20
+        self.rate = self.max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_rate_limited(self, retry_after=None):
+        self.rate_limited += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+
+def classify_error(e):
+    """
+    判断一次失败是否值得重试。
+
+    返回:
+    RETRYABLE(429、超时、连接错误、5xx 等)或 PERMANENT(鉴权失败、请求非法、内容审核拒绝等)。
+    """
+    if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return RETRYABLE
+    if isinstance(e, openai.APIStatusError):
+        if e.status_code in (408, 409, 429) or e.status_code >= 500:
+            return RETRYABLE
+        return PERMANENT
+    return PERMANENT
+
+
+def is_rate_limited(e):
+    return isinstance(e, openai.APIStatusError) and e.status_code == 429
+
+
+def retry_after_seconds(e):
+    """从响应头读取服务商要求的等待秒数(retry-after-ms / retry-after)，没有时返回 None。"""
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """带完全随机抖动的指数退避：在 [0, min(cap, base * 2^attempt)] 内均匀取值。"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,176 @@
+"""
+结果缺口扫描与补跑：只重新请求缺失、失败、空白或无法解析的行，代替手动改 skiprows/nrows 重跑一段。
+
+对 experiments.toml 中每个任务的结果(断点日志 .jsonl，没有日志时导入已有的 xlsx/parquet)按行号建立索引，
+与 prompt 表逐行对照，找出以下缺口：
+  missing   prompt 表中有、结果中没有的行(中途停止或只跑了一段)
+  error     重试后仍失败、带 error 标记的行
+  empty     回答为空(旧脚本 except 后写入的空行与拒答无法区分)
+  unparsed  有回答但无法解析：E1/E2 用 answer_classifier 识别不出选项，E3 用 sentence_extractor 找不到刑期
+补跑时先在日志中把缺口行标记为未完成，再交给 collect.collect_answers，它只请求这些行，
+新回答以同一行号追加到日志，导出时覆盖原来的行，其余行保持不变。补跑不读回复缓存，否则会拿回同一条坏回答。
+
+用法:
+python repair.py --dry-run                          # 只扫描，列出各结果的缺口
+python repair.py --experiments E3 --models gpt-4o   # 补跑
+python repair.py --kinds missing error empty        # 只补这几类缺口
+"""
+import argparse
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+
+import answer_classifier as ac
+import journal as jn
+import run_experiments as rx
+import sentence_extractor as se
+import storage
+
+GAP_KINDS = ["missing", "error", "empty", "unparsed"]
+
+
+def result_exists(result_file):
+    return any(os.path.exists(path) for path in
+               (jn.journal_path_for(result_file), result_file, storage.parquet_path_for(result_file)))
+
+
+def latest_records(result_file):
+    """{行号: 记录}：优先读断点日志，没有日志时读已有的结果表(不写任何文件)。"""
+    latest = jn.Journal(jn.journal_path_for(result_file)).latest()
+    if latest or not (os.path.exists(result_file) or os.path.exists(storage.parquet_path_for(result_file))):
+        return latest
+    df = storage.read_table(result_file)
+    df = df.astype(object).where(df.notna(), '')
+    return {k: record for k, record in enumerate(df.to_dict('records'), start=1)}
+
+
+def open_journal(result_file):
+    """结果的日志；日志为空时导入已有的结果表(与 latest_records 读到的内容相同)。"""
+    journal = jn.Journal(jn.journal_path_for(result_file))
+    if not journal.records():
+        for k, record in latest_records(result_file).items():
+            journal.append(k, record)
+        journal.close()
+    return journal
+
+
+def count_prompts(prompts):
+    """prompt 表(路径、DataFrame 或分块来源)的总行数。"""
+    chunks = [prompts] if isinstance(prompts, (str, pd.DataFrame)) else prompts
+    return sum(len(storage.read_table(chunk) if isinstance(chunk, str) else chunk) for chunk in chunks)
+
+
+def parse_status(answers, experiment, extract_value=None):
+    """每条回答是否可用："ok"、"empty" 或 "unparsed"。"""
+    if extract_value is not None:
+        status = se.extract(answers)['status']
+        return status.where(status.isin([se.EMPTY, se.UNPARSED]), 'ok').to_numpy()
+    empty = (answers.fillna('').astype(str).str.strip() == '').to_numpy()
+    if experiment in ac.KINDS:
+        label = ac.classify(answers, experiment)['label']
+        unparsed = label.isna().to_numpy()
+    else:
+        unparsed = np.zeros(len(answers), dtype=bool)
+    return np.where(empty, 'empty', np.where(unparsed, 'unparsed', 'ok'))
+
+
+def scan(job, n_prompts=None):
+    """
+    扫描一个任务的结果。
+
+    返回:
+    DataFrame，列 row(行号，从 1 开始)与 gap(缺口类型)，按行号排序。
+    """
+    latest = latest_records(job["result_file"])
+    n_prompts = count_prompts(job["prompts"]) if n_prompts is None else n_prompts
+    rows = pd.RangeIndex(1, max(n_prompts, max(latest, default=0)) + 1)
+    table = pd.DataFrame.from_dict(latest, orient='index').reindex(rows)
+    if 'answer' not in table:
+        table['answer'] = np.nan
+    if 'error' not in table:
+        table['error'] = np.nan
+
+    present = rows.isin(list(latest))
+    failed = present & table['error'].fillna('').astype(str).ne('').to_numpy()
+    gap = np.full(len(rows), '', dtype=object)
+    answered = present & ~failed
+    if answered.any():
+        status = parse_status(table['answer'][answered], job["meta"]["experiment"], job["extract_value"])
+        gap[answered] = np.where(status == 'ok', '', status)
+    gap[failed] = 'error'
+    gap[~present] = 'missing'
+    gaps = pd.DataFrame({'row': rows, 'gap': gap})
+    return gaps[gaps['gap'] != ''].reset_index(drop=True)
+
+
+def mark_pending(result_file, gaps):
+    """在日志中给缺口行追加带 error 标记的记录(保留原回答)，collect 会把这些行当作未完成重新请求。"""
+    journal = open_journal(result_file)
+    latest = journal.latest()
+    marked = 0
+    for row, kind in zip(gaps['row'], gaps['gap']):
+        if row in latest and not latest[row].get('error'):
+            record = {k: v for k, v in latest[row].items() if k != 'row'}
+            journal.append(row, dict(record, error=f"repair: {kind}"))
+            marked += 1
+    journal.close()
+    return marked
+
+
+def summarize(name, gaps, n_rows):
+    counts = gaps['gap'].value_counts()
+    parts = ", ".join(f"{kind} {counts.get(kind, 0)}" for kind in GAP_KINDS)
+    print(f"  - {name}: {n_rows} 行，缺口 {len(gaps)} ({parts})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "experiments.toml"))
+    parser.add_argument("--experiments", nargs="+")
+    parser.add_argument("--languages", nargs="+")
+    parser.add_argument("--models", nargs="+")
+    parser.add_argument("--kinds", nargs="+", choices=GAP_KINDS, default=GAP_KINDS, help="要补跑的缺口类型")
+    parser.add_argument("--dry-run", action="store_true", help="只扫描，不发送请求")
+    parser.add_argument("--xlsx", action="store_true", help="除 parquet 外另导出 Excel 结果")
+    args = parser.parse_args()
+
+    config = rx.load_config(args.config)
+    config_dir = os.path.dirname(os.path.abspath(args.config))
+    jobs = rx.build_jobs(config, config_dir, args.experiments, args.languages, args.models)
+
+    print("扫描结果:")
+    repair_jobs = []
+    sizes = {}
+    for job in jobs:
+        if not result_exists(job["result_file"]):
+            print(f"  - {job['name']}: 没有结果，跳过")
+            continue
+        # 同一实验与语言的各模型共用一个 prompt 表，只数一次
+        source = str(job["prompts"])
+        if source not in sizes:
+            sizes[source] = count_prompts(job["prompts"])
+        gaps = scan(job, sizes[source])
+        summarize(job["name"], gaps, sizes[source])
+        gaps = gaps[gaps['gap'].isin(args.kinds)]
+        if args.dry_run or gaps.empty:
+            continue
+        mark_pending(job["result_file"], gaps)
+        job["xlsx"] = job["xlsx"] or args.xlsx
+        repair_jobs.append(job)
+    if args.dry_run or not repair_jobs:
+        return
+
+    print(f"\n补跑 {len(repair_jobs)} 个任务")
+    results = asyncio.run(rx.run_jobs(repair_jobs, config.get("providers")))
+    print("\n补跑后:")
+    for job, result in zip(repair_jobs, results):
+        if isinstance(result, Exception):
+            print(f"!!!!任务失败: {job['name']} - {result}")
+        source = str(job["prompts"])
+        summarize(job["name"], scan(job, sizes[source]), sizes[source])
+
+
+if __name__ == "__main__":
+    main()
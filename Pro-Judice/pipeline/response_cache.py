@@ -0,0 +1,124 @@
+"""
+持久化的模型回复缓存(SQLite)，键为 (模型, 接口, 消息, 采样参数) 的哈希。
+
+重跑相同的 prompt(崩溃后续跑、修正输出路径后重跑等)直接命中缓存，不再重复付费。
+缓存总大小超过上限时按最近访问时间淘汰最旧的条目。
+
+用法:
+python response_cache.py stats [缓存路径]
+python response_cache.py clear [缓存路径]
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'responses.sqlite')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_key(model, messages, api="chat", **params):
+    """对请求内容做稳定序列化后取 sha256，参数顺序不影响结果。"""
+    payload = json.dumps({"model": model, "api": api, "messages": messages, "params": params},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                size INTEGER,
+                created REAL,
+                accessed REAL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return row[0]
+
+    def put(self, key, model, response):
+        size = len(response.encode('utf-8'))
+        now = time.time()
+        old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                           (key, model, response, size, now, now))
+        self._conn.commit()
+        self._total_bytes += size - (old[0] if old else 0)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_bytes=None):
+        """按最近访问时间从旧到新删除，直到总大小不超过 target_bytes(默认上限的 90%)。"""
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * 0.9)
+        removed = 0
+        cursor = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed")
+        victims = []
+        for key, size in cursor:
+            if self._total_bytes <= target_bytes:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+            removed += 1
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._conn.commit()
+        return removed
+
+    def stats(self):
+        entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._conn.execute("DELETE FROM responses")
+        self._conn.commit()
+        self._total_bytes = 0
+
+    def close(self):
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("stats", "clear"):
+        print("用法: python response_cache.py stats|clear [缓存路径]")
+        sys.exit(1)
+    cache = ResponseCache(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CACHE_PATH)
+    if sys.argv[1] == "clear":
+        cache.clear()
+        print("缓存已清空:", cache.path)
+    else:
+        s = cache.stats()
+        print(f"{cache.path}: {s['entries']} 条, {s['bytes'] / 1024 / 1024:.1f} MB / "
+              f"{s['max_bytes'] / 1024 / 1024:.0f} MB")
+    cache.close()
@@ -0,0 +1,330 @@
+"""
+统一的实验运行入口，代替 E1/E2/E3 下逐个模型复制的 get_answers_by_*.py 脚本。
+
+experiments.toml 描述 实验 × 语言 × 模型 的矩阵，每个组合是一个任务；
+所有任务在同一个事件循环中并发执行，同一服务商(base_url)的任务共享并发上限，
+因此一次运行即可同时用满五个服务商。每个任务的断点保存在结果文件旁的 .jsonl 日志中。
+结果写入同名 .parquet(列见 storage.RESULT_SCHEMA)，需要 Excel 时加 --xlsx。
+
+用法:
+python run_experiments.py
+python run_experiments.py --experiments E3 --languages cn --models deepseek-r1 deepseek-v3
+python run_experiments.py --config experiments.toml --dry-run
+python run_experiments.py --batch                    # batch = true 的模型走 Batch API，其余照常实时请求
+python run_experiments.py --batch --batch-local batch_local   # 用本地目录替身测试 Batch 流程
+python run_experiments.py --score --experiments E1 E2          # logprob 打分模式，结果写入 *_scored.parquet
+python run_experiments.py --structured                         # 结构化输出模式，结果写入 *_structured.parquet
+python run_experiments.py --stream --keep-reasoning             # 流式请求，回答可判定时提前结束(见 streaming.py)
+python run_experiments.py --samples 5 --experiments E3          # 自洽采样模式，结果写入 *_sampled.parquet
+python run_experiments.py --hedge                               # 超过近期 p95 耗时的请求另发副本(见 hedging.py)
+"""
+import argparse
+import asyncio
+import os
+import tomllib
+
+import async_engine as ae
+import batch_mode as bm
+import collect
+import hedging
+import key_pool as kp
+import logprob_scoring as ls
+import prompt_gen
+import sampling
+import sentence_extractor
+import storage
+import streaming
+import structured_output as so
+from response_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ResponseCache
+
+VALUE_EXTRACTORS = {
+    "months": sentence_extractor.months_of,
+}
+
+
+def load_config(path):
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def resolve_api_keys(model_cfg):
+    """
+    模型的 key 列表：api_key_env 指定的环境变量(可以是变量名的列表，变量值可以用逗号分隔多个 key)优先，
+    其次为 api_key(字符串或列表)。多个 key 时请求分散到各个 key 上(见 key_pool.py)。
+    """
+    env_names = model_cfg.get("api_key_env") or []
+    env_names = [env_names] if isinstance(env_names, str) else env_names
+    keys = [key for name in env_names for key in kp.split_keys(os.environ.get(name))]
+    return keys or kp.split_keys(model_cfg.get("api_key"))
+
+
+def build_jobs(config, config_dir, experiments=None, languages=None, models=None):
+    """
+    把配置展开为任务列表。
+
+    参数:
+    config -- load_config 的结果
+    config_dir -- 配置文件所在目录，用于解析相对路径
+    experiments, languages, models -- 可选的筛选列表，默认取 [run] 中的设置
+
+    返回:
+    任务字典列表，每个字典对应矩阵中的一个组合。
+
+    system_prompt 与 suffix 依次取 [experiments.<实验>.<语言>.models.<模型>]、[experiments.<实验>.<语言>]、
+    [models.<模型>] 中的设置，以便逐一还原原脚本中各实验、各模型的提示词；system_prompt 为空字符串时不发送系统提示。
+    api 同样可以按实验、按模型覆盖(原 E3 脚本中 gpt-4o 走 responses 接口)；Batch API 只实现了 chat 接口，
+    走 responses 接口的任务不参与 --batch。
+    """
+    run_cfg = config.get("run", {})
+    experiments = experiments or run_cfg.get("experiments", list(config["experiments"]))
+    languages = languages or run_cfg.get("languages", ["cn", "en"])
+    models = models or run_cfg.get("models", list(config["models"]))
+
+    jobs = []
+    for experiment in experiments:
+        for language in languages:
+            exp_cfg = config["experiments"].get(experiment, {}).get(language)
+            if exp_cfg is None:
+                raise KeyError(f"配置中没有实验 {experiment}.{language}")
+            for llm_name in models:
+                model_cfg = config["models"][llm_name]
+                override = exp_cfg.get("models", {}).get(llm_name, {})
+                system_prompt = override.get("system_prompt", exp_cfg.get("system_prompt", model_cfg.get("system_prompt")))
+                api = override.get("api", exp_cfg.get("api", model_cfg.get("api", "chat")))
+                value = exp_cfg.get("value")
+                jobs.append({
+                    "name": f"{experiment}-{language}-{llm_name}",
+                    "llm_name": llm_name,
+                    "model": model_cfg["model"],
+                    "api_keys": resolve_api_keys(model_cfg),
+                    "base_url": model_cfg["base_url"],
+                    "api": api,
+                    "batch": model_cfg.get("batch", False) and api == "chat",
+                    "logprobs": model_cfg.get("logprobs", False),
+                    "structured": model_cfg.get("structured", "max_tokens"),
+                    "stream": model_cfg.get("stream", False),
+                    "n": model_cfg.get("n", False),
+                    "samples": 1,
+                    "keep_reasoning": run_cfg.get("keep_reasoning", False),
+                    "system_prompt": system_prompt or None,
+                    "prompts": prompt_source(exp_cfg, config_dir),
+                    "result_file": os.path.normpath(os.path.join(config_dir, exp_cfg["output"].format(model=llm_name))),
+                    "suffix": override.get("suffix", exp_cfg.get("suffix", "")),
+                    "extract_value": VALUE_EXTRACTORS[value] if value else None,
+                    # E1/E2 的输入表没有 Experiment 列，用实验名补齐
+                    "meta": {"model": llm_name, "dataset": language.upper(), "experiment": experiment},
+                    "xlsx": run_cfg.get("xlsx", False),
+                    "prefix_cache": run_cfg.get("prefix_cache", False),
+                    "score": None,
+                    "parse_answer": None,
+                    # 其余请求参数，如结构化输出模式的 response_format 与 max_tokens
+                    "params": {},
+                })
+    return jobs
+
+
+def scoring_jobs(jobs):
+    """
+    logprob 打分模式的任务：只保留 E1/E2 中支持 logprobs 的模型，结果写入 *_scored 文件，
+    走实时 chat 接口(Batch 与 responses 接口不返回首个 token 的候选)。
+    """
+    scored = []
+    for job in jobs:
+        experiment = job["meta"]["experiment"]
+        if experiment not in ls.OPTIONS or not job["logprobs"]:
+            print(f"  - {job['name']}: 只有 E1/E2 且 logprobs = true 的模型支持打分模式，跳过")
+            continue
+        scored.append(dict(job, name=job["name"] + "-scored", result_file=ls.scored_path_for(job["result_file"]),
+                           api="chat", batch=False, stream=False, extract_value=None, score=ls.scorer(experiment)))
+    return scored
+
+
+def sampling_jobs(jobs, samples, temperature=None):
+    """
+    自洽采样模式的任务：每条 prompt 取 samples 个回答，结果写入 *_sampled 文件，走实时接口且不流式请求。
+    n = true 且走 chat 接口的模型用 n 参数一次取得，其余并发请求 samples 次。
+    """
+    params = {} if temperature is None else {"temperature": temperature}
+    return [dict(job, name=job["name"] + "-sampled", result_file=sampling.sampled_path_for(job["result_file"]),
+                 batch=False, stream=False, samples=samples, n=job["n"] and job["api"] == "chat",
+                 params=dict(job["params"], **params))
+            for job in jobs]
+
+
+def structured_jobs(jobs):
+    """
+    结构化输出模式的任务：按模型的 structured 设置加上 response_format / max_tokens，
+    JSON 方式下把格式要求换成给出 JSON 样例的版本，结果写入 *_structured 文件；
+    response_format 是 chat 接口的参数，因此一律走 chat 接口。
+    """
+    structured = []
+    for job in jobs:
+        experiment, language, mode = job["meta"]["experiment"], job["meta"]["dataset"].lower(), job["structured"]
+        if mode not in so.MODES:
+            raise ValueError(f"{job['llm_name']} 的 structured 应为 {' / '.join(so.MODES)}")
+        job = dict(job, name=job["name"] + "-structured", result_file=so.structured_path_for(job["result_file"]),
+                   api="chat",
+                   params=dict(job["params"], **so.request_params(experiment, language, mode, job["model"])))
+        if mode != "max_tokens":
+            job.update(suffix=so.FORMAT_PROMPTS[(experiment, language)], parse_answer=so.parser(experiment, language))
+        structured.append(job)
+    return structured
+
+
+def prompt_source(exp_cfg, config_dir):
+    """
+    实验配置中的 prompt 来源：prompts 指向已生成的 xlsx；
+    或由 family/cases/principles 交给 prompt_gen 直接分块生成，不经过 xlsx。
+    """
+    if "family" in exp_cfg:
+        return PromptSource(exp_cfg["family"],
+                            os.path.normpath(os.path.join(config_dir, exp_cfg["cases"])),
+                            os.path.normpath(os.path.join(config_dir, exp_cfg["principles"])),
+                            exp_cfg.get("chunk_cases", 1000))
+    return os.path.normpath(os.path.join(config_dir, exp_cfg["prompts"]))
+
+
+class PromptSource:
+    """可重复迭代的 prompt 分块来源，每次迭代重新调用 prompt_gen.iter_prompt_chunks。"""
+
+    def __init__(self, family, case_file, principle_file, chunk_cases=1000):
+        self.family = family
+        self.case_file = case_file
+        self.principle_file = principle_file
+        self.chunk_cases = chunk_cases
+
+    def __iter__(self):
+        return prompt_gen.iter_prompt_chunks(self.family, self.case_file, self.principle_file, self.chunk_cases)
+
+    def __str__(self):
+        return f"{self.family}({self.case_file} × {self.principle_file})"
+
+
+async def run_job(job, pool, cache=None):
+    if not job["api_keys"]:
+        raise ValueError(f"{job['llm_name']} 未配置 api_key")
+    stop_when = streaming.stopper(job["meta"]["experiment"], job["parse_answer"]) if job["stream"] else None
+    await collect.collect_answers(job["name"], job["model"], job["api_keys"], job["base_url"],
+                                  job["prompts"], job["result_file"],
+                                  system_prompt=job["system_prompt"], suffix=job["suffix"],
+                                  extract_value=job["extract_value"], pool=pool, api=job["api"],
+                                  cache=cache, meta=job["meta"], xlsx=job["xlsx"],
+                                  prefix_cache=job["prefix_cache"], score=job["score"],
+                                  parse_answer=job["parse_answer"], stream=job["stream"], stop_when=stop_when,
+                                  keep_reasoning=job["keep_reasoning"], samples=job["samples"], n_param=job["n"],
+                                  **job["params"])
+
+
+async def run_batch_job(job, batch_local=None, poll_interval=60):
+    client = None
+    if batch_local is not None:
+        backend = bm.LocalBatchBackend(batch_local)
+    else:
+        if not job["api_keys"]:
+            raise ValueError(f"{job['llm_name']} 未配置 api_key")
+        # Batch 任务按文件提交，只用第一个 key
+        client = ae.make_client(job["api_keys"][0], job["base_url"])
+        backend = bm.OpenAIBatchBackend(client)
+    try:
+        await bm.run_batch_job(job["name"], job["model"], backend, job["prompts"], job["result_file"],
+                               system_prompt=job["system_prompt"], suffix=job["suffix"],
+                               extract_value=job["extract_value"], poll_interval=poll_interval,
+                               meta=job["meta"], xlsx=job["xlsx"], parse_answer=job["parse_answer"], **job["params"])
+    finally:
+        if client is not None:
+            await client.close()
+
+
+async def run_jobs(jobs, provider_overrides=None, cache=None, batch=False, batch_local=None, poll_interval=60,
+                   hedge_budget=0):
+    """
+    batch 为 True 时，配置了 batch = true 的模型走 Batch API，其余任务照常实时请求。
+    hedge_budget 为对冲请求的比例上限，0 为不对冲(见 hedging.py)。
+    """
+    pool = ae.ProviderPool(provider_overrides, hedge_budget)
+    coroutines = []
+    for job in jobs:
+        if batch and job["batch"]:
+            coroutines.append(run_batch_job(job, batch_local, poll_interval))
+        else:
+            coroutines.append(run_job(job, pool, cache))
+    try:
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+    finally:
+        await pool.close()
+
+
+def open_cache(config, config_dir):
+    cache_cfg = config.get("cache", {})
+    path = cache_cfg.get("path")
+    path = os.path.join(config_dir, path) if path else DEFAULT_CACHE_PATH
+    max_bytes = int(cache_cfg["max_mb"] * 1024 * 1024) if "max_mb" in cache_cfg else DEFAULT_MAX_BYTES
+    return ResponseCache(path, max_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "experiments.toml"))
+    parser.add_argument("--experiments", nargs="+")
+    parser.add_argument("--languages", nargs="+")
+    parser.add_argument("--models", nargs="+")
+    parser.add_argument("--dry-run", action="store_true", help="只列出任务，不发送请求")
+    parser.add_argument("--no-cache", action="store_true", help="不读写回复缓存")
+    parser.add_argument("--batch", action="store_true", help="支持 Batch API 的模型以批处理方式提交")
+    parser.add_argument("--batch-local", help="用该目录下的本地替身代替真实 Batch 接口")
+    parser.add_argument("--poll-interval", type=float, default=60, help="批次轮询间隔(秒)")
+    parser.add_argument("--xlsx", action="store_true", help="除 parquet 外另导出 Excel 结果")
+    parser.add_argument("--stream", action="store_true", help="全部实时任务以流式方式请求，回答可判定时提前结束")
+    parser.add_argument("--keep-reasoning", action="store_true", help="流式请求时保存推理模型的思考过程")
+    parser.add_argument("--hedge", type=float, nargs="?", const=hedging.DEFAULT_BUDGET,
+                        help=f"对冲请求，额外请求不超过已发请求的此比例(默认 {hedging.DEFAULT_BUDGET}，见 hedging.py)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--score", action="store_true", help="E1/E2 的 logprob 打分模式(见 logprob_scoring.py)")
+    mode.add_argument("--structured", action="store_true", help="结构化输出模式(见 structured_output.py)")
+    mode.add_argument("--samples", type=int, nargs="?", const=sampling.DEFAULT_SAMPLES,
+                      help=f"自洽采样模式，每条 prompt 取 k 个回答(默认 {sampling.DEFAULT_SAMPLES}，见 sampling.py)")
+    parser.add_argument("--temperature", type=float, help="采样模式的温度，默认使用服务商的默认温度")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    config_dir = os.path.dirname(os.path.abspath(args.config))
+    jobs = build_jobs(config, config_dir,
+                      args.experiments, args.languages, args.models)
+    if args.score:
+        jobs = scoring_jobs(jobs)
+    if args.structured:
+        jobs = structured_jobs(jobs)
+    if args.samples:
+        jobs = sampling_jobs(jobs, args.samples, args.temperature)
+    for job in jobs:
+        if args.xlsx:
+            job["xlsx"] = True
+        if args.keep_reasoning:
+            job["keep_reasoning"] = True
+        # 打分模式只请求一个 token，不需要流式；采样模式取完整的回答
+        if args.stream and job["score"] is None and job["samples"] == 1:
+            job["stream"] = True
+    print(f"共 {len(jobs)} 个任务")
+    for job in jobs:
+        print(f"  - {job['name']}: {job['prompts']} -> {storage.parquet_path_for(job['result_file'])}")
+    if args.dry_run:
+        return
+
+    cache = None if args.no_cache else open_cache(config, config_dir)
+    hedge_budget = args.hedge if args.hedge is not None else config.get("run", {}).get("hedge_budget", 0)
+    results = asyncio.run(run_jobs(jobs, config.get("providers"), cache,
+                                   batch=args.batch, batch_local=args.batch_local, poll_interval=args.poll_interval,
+                                   hedge_budget=hedge_budget))
+    if cache is not None:
+        s = cache.stats()
+        print(f"缓存命中 {s['hits']} 次, 未命中 {s['misses']} 次 (命中率 {s['hit_rate']:.1%}), "
+              f"共 {s['entries']} 条 {s['bytes'] / 1024 / 1024:.1f} MB")
+        cache.close()
+    failed_jobs = [(job, result) for job, result in zip(jobs, results) if isinstance(result, Exception)]
+    for job, result in failed_jobs:
+        print(f"!!!!任务失败: {job['name']} - {result}")
+    print(f"\n处理完成! 成功: {len(jobs) - len(failed_jobs)}, 失败: {len(failed_jobs)}")
+
+
+if __name__ == "__main__":
+    main()
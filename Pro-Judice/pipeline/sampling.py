@@ -0,0 +1,24 @@
+"""
+自洽采样模式：每条 prompt 在默认温度下取 k 个回答，用来区分模型自身的随机性与程序性因素的真实效应
+(如 E3 中 |E_3_2 − E_3_1| 有多少来自同一 prompt 重复提问时的波动)。
+
+- experiments.toml 中 n = true 的模型(服务商支持 n 参数，如 OpenAI)一次请求取 k 个回答；
+  其余模型并发发送 k 次请求，同一服务商的并发上限与限速照常生效
+- 每行仍是一条 prompt：answer / answerValue 取第一个回答(与逐条模式的单次提问相当)，
+  全部回答写入数组列 answers，E3 另有刑期月数的数组 answerValues(storage.SAMPLED_SCHEMA)
+- 任一次请求失败时整行记为失败，下次运行重新采样；不读写回复缓存(缓存会让 k 个回答完全相同)
+- 结果写入 <结果>_sampled.parquet；E3/Metrics/sampled_mpe.py 据此计算每个案件的回答方差与去噪后的 MPE
+
+用法:
+python run_experiments.py --samples 5 --experiments E3
+python run_experiments.py --samples 10 --temperature 1.0 --experiments E3 --models gpt-4o deepseek-v3
+"""
+import os
+
+DEFAULT_SAMPLES = 5
+
+
+def sampled_path_for(result_file):
+    """采样模式的结果文件，如 results_gpt-4o.xlsx -> results_gpt-4o_sampled.xlsx"""
+    stem, ext = os.path.splitext(result_file)
+    return stem + '_sampled' + ext
@@ -0,0 +1,221 @@
+"""
+E3 刑期提取：把回答换算成月数，并给出状态码，代替只取最后一段数字的 extract_all_numbers。
+
+处理顺序(全部是对整列回答的 Series.str 操作)：
+1. 统一格式：去掉 <think> 推理段、全角转半角、去掉 markdown(answer_classifier.normalize)；
+   中文数字与英文数字词转为阿拉伯数字("二十四个月" -> "24个月"，"一年半" -> "1.5年"，"six years" -> "6 years")。
+2. 取回答中最后一个刑期表达(模型通常先分析、最后给出答案)：
+   "3年6个月" -> 42，"2-3年" -> 30(取中点)，"【36】" -> 36，"5 years" -> 60；
+   法条中的上下限与缓刑考验期不算("有期徒刑二年，缓刑三年" -> 24)。
+3. 没有刑期表达时取最后一个单独的数字(题目要求只回答月数)。
+4. 提到死刑/无期徒刑且没有给出正的月数时，记为 death/life，月数为空。
+
+状态码:
+  ok        给出了明确的刑期
+  range     给出的是区间，月数取中点
+  bare      只有不带单位的数字，按月计
+  life      无期徒刑 / 终身监禁
+  death     死刑(含死缓)
+  refused   拒绝回答或表示无法判断
+  unparsed  有内容但没有找到刑期
+  empty     空回答
+
+用法(不重新调用模型，批量重新提取结果文件中的 answerValue，并写入 answerStatus 列):
+python sentence_extractor.py ../E3/cn/results_*.parquet ../E3/en/results/results_en/results_*.parquet
+python sentence_extractor.py --dry-run ../E3/Metrics/result_CN/*.xlsx
+"""
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+import answer_classifier as ac
+import storage
+
+OK, RANGE, BARE, LIFE, DEATH, REFUSED, UNPARSED, EMPTY = (
+    "ok", "range", "bare", "life", "death", "refused", "unparsed", "empty")
+
+CN_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+CN_UNITS = {'十': 10, '百': 100, '千': 1000}
+CN_NUMBER = re.compile(r'[零〇一二两三四五六七八九十百千]+(?=\s*(?:个\s*)?(?:年|月|半)|\s*(?:至|到|-|~)\s*[零〇一二两三四五六七八九十百千\d])')
+HALF_YEAR = re.compile(r'(\d+)\s*年半')
+BARE_HALF_YEAR = re.compile(r'(?<![\d.])半年')
+
+EN_NUMBERS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9,
+    'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+    'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+}
+EN_NUMBER = re.compile(r'(?i)\b(twenty|thirty|forty|fifty|sixty|seventy|eighty|ninety)(?:[\s-](one|two|three|four|five|six|seven|eight|nine))?\b'
+                       r'|\b(one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen|sixteen|seventeen|eighteen|nineteen)\b'
+                       r'(?=\s*(?:-\s*)?(?:years?|months?|yrs?|mos?)\b|\s*(?:to|-)\s*\w+\s*(?:years?|months?))')
+
+NUM = r'(\d+(?:\.\d+)?)'
+YEAR = r'(?:年|years?|yrs?\.?)'
+MONTH = r'(?:个\s*月|月|months?|mos?\.?)'
+UNIT = r'(年|years?|yrs?\.?|个\s*月|月|months?|mos?\.?)'
+TO = r'\s*(?:-|–|—|~|至|到|to)\s*'
+# 每个刑期表达是下面一种: 年+月 / 区间 / 数字+单位 / 【数字】；数字与单位之间可以有连字符("an 8-year sentence")
+TERM = re.compile(
+    rf'(?i){NUM}[\s-]*{YEAR}\s*(?:零|and|,)?\s*{NUM}[\s-]*{MONTH}'
+    rf'|{NUM}[\s-]*{UNIT}?{TO}{NUM}[\s-]*{UNIT}'
+    rf'|{NUM}[\s-]*{UNIT}'
+    r'|【\s*(\d+(?:\.\d+)?)\s*】'
+)
+# 法条中的刑期上下限("三年以下有期徒刑"、"三年以上十年以下"、"up to 5 years")不是回答给出的刑期，匹配前去掉
+BOUND = re.compile(
+    rf'(?i){NUM}\s*{UNIT}\s*以上\s*{NUM}\s*{UNIT}\s*以下'
+    rf'|{NUM}\s*{UNIT}\s*(?:以下|以内|以上|or\s+(?:less|fewer|more))'
+    rf'|(?:up\s+to|not\s+more\s+than|no\s+more\s+than|not\s+exceeding|maximum\s+of|minimum\s+of|at\s+least|more\s+than|less\s+than)\s+{NUM}\s*{UNIT}'
+)
+# 缓刑考验期与死缓的缓期("有期徒刑二年，缓刑三年"、"死刑，缓期二年执行"、"suspended for 3 years")不是刑期，
+# 和法条的上下限一样在匹配前去掉
+TERM_SPAN = rf'(?:{NUM}\s*{UNIT}?{TO})?{NUM}\s*{UNIT}'
+PROBATION = re.compile(
+    rf'(?i)(?:缓刑|缓期)(?:考验期)?(?:限)?(?:为|是)?\s*{TERM_SPAN}'
+    rf'|(?:probation(?:ary)?(?:\s+period)?|suspended|suspension)\s+(?:of|for)\s+{TERM_SPAN}'
+    rf"|{NUM}[\s-]*{UNIT}(?:'s?|s')?\s+(?:of\s+)?(?:probation|suspension)"
+)
+# 没有单位的数字，不含法条编号("第227条"、"Article 227")和金额、百分比
+BARE_NUMBER = re.compile(r'(?i)(?<![\d.第])(?<!article )(?<!section )(\d+(?:\.\d+)?)(?![\d.]|\s*(?:条|款|项|%|万|元|yuan|percent))')
+
+DEATH_WORDS = re.compile(r'(?i)死刑|死缓|death\s+(?:penalty|sentence|row)|sentenced\s+to\s+death|capital\s+punishment')
+LIFE_WORDS = re.compile(r'(?i)无期徒刑|无期|终身监禁|life\s+(?:imprisonment|sentence|in\s+prison|term)|imprisonment\s+for\s+life')
+REFUSAL_WORDS = re.compile(r"(?i)【\s*】|无法|不能|难以|不便|sorry|cannot|can't|can not|unable|not\s+possible|insufficient|not\s+enough")
+
+
+def cn_to_number(text):
+    """中文数字转整数，如 "二十四" -> 24，"十" -> 10，"一百二十" -> 120。"""
+    total, digit = 0, 0
+    for ch in text:
+        if ch in CN_DIGITS:
+            digit = CN_DIGITS[ch]
+        else:
+            total += (digit or 1) * CN_UNITS[ch]
+            digit = 0
+    return total + digit
+
+
+def _en_number(match):
+    if match.group(3):
+        return str(EN_NUMBERS[match.group(3).lower()])
+    return str(EN_NUMBERS[match.group(1).lower()] + (EN_NUMBERS[match.group(2).lower()] if match.group(2) else 0))
+
+
+def normalize(answers):
+    s = ac.normalize(answers)
+    s = s.str.replace(CN_NUMBER, lambda m: str(cn_to_number(m.group(0))), regex=True)
+    s = s.str.replace(HALF_YEAR, lambda m: f"{m.group(1)}.5年", regex=True)
+    s = s.str.replace(BARE_HALF_YEAR, '6个月', regex=True)
+    return s.str.replace(EN_NUMBER, _en_number, regex=True)
+
+
+def _to_months(value, unit):
+    years = unit.str.contains(r'年|[Yy]', regex=True, na=False)
+    return np.where(years, value * 12, value)
+
+
+def extract(answers):
+    """
+    对一列回答提取刑期。
+
+    参数:
+    answers -- 回答文本的 Series
+
+    返回:
+    与 answers 同索引的 DataFrame，列 months(float，无法换算时为 NaN)与 status(见模块说明)。
+    """
+    text = normalize(answers).str.replace(BOUND, ' ', regex=True).str.replace(PROBATION, ' ', regex=True)
+    months = pd.Series(np.nan, index=answers.index)
+    status = pd.Series(UNPARSED, index=answers.index, dtype=object)
+
+    terms = text.str.extractall(TERM)
+    if len(terms):
+        # 每行最后一个匹配(整行取，不能用 groupby.last，它会按列跳过空值把不同匹配拼在一起)
+        last = terms[~terms.index.get_level_values(0).duplicated(keep='last')].droplevel(1)
+        value = pd.Series(np.nan, index=last.index)
+        kind = pd.Series(OK, index=last.index, dtype=object)
+        f = last.apply(pd.to_numeric, errors='coerce')
+        # 年 + 月
+        both = f[0].notna()
+        value[both] = f[0][both] * 12 + f[1][both]
+        # 区间：前一端没有单位时沿用后一端的单位("2-3年")，各有单位时分别换算("18个月至2年" -> 21)
+        ranged = f[2].notna()
+        first_unit = last[3].fillna(last[5]).where(ranged)
+        value[ranged] = (_to_months(f[2], first_unit) + _to_months(f[4], last[5]))[ranged.to_numpy()] / 2
+        kind[ranged] = RANGE
+        # 数字 + 单位
+        single = f[6].notna()
+        value[single] = _to_months(f[6], last[7])[single.to_numpy()]
+        # 【数字】，题目要求的格式是【】个月
+        bracket = f[8].notna()
+        value[bracket] = f[8][bracket]
+        months[value.index] = value
+        status[value.index] = kind
+
+    no_term = months.isna()
+    bare = text[no_term].str.findall(BARE_NUMBER).str[-1].dropna()
+    months[bare.index] = pd.to_numeric(bare, errors='coerce')
+    status[bare.index] = BARE
+
+    # 死刑 / 无期：只在没有给出正的月数时采用
+    no_positive = ~(months > 0)
+    death = no_positive & text.str.contains(DEATH_WORDS)
+    life = no_positive & ~death & text.str.contains(LIFE_WORDS)
+    months[death | life] = np.nan
+    status[death] = DEATH
+    status[life] = LIFE
+
+    missing = months.isna() & (status == UNPARSED)
+    status[missing & text.str.contains(REFUSAL_WORDS)] = REFUSED
+    status[answers.fillna('').astype(str).str.strip() == ''] = EMPTY
+    return pd.DataFrame({'months': months, 'status': status}, index=answers.index)
+
+
+def months_of(res):
+    """单条回答的月数，供 collect 的 extract_value 使用；没有月数时返回空字符串。"""
+    months = extract(pd.Series([res]))['months'].iloc[0]
+    return "" if pd.isna(months) else months
+
+
+def reextract(path, dry_run=False):
+    """重新提取一个结果文件(.parquet 或 .xlsx)的 answerValue 并写入 answerStatus，返回 (行数, answerValue 改变的行数)。"""
+    df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_excel(path)
+    result = extract(df['answer'])
+    old = pd.to_numeric(df.get('answerValue'), errors='coerce') if 'answerValue' in df else pd.Series(np.nan, index=df.index)
+    changed = int((~((old == result['months']) | (old.isna() & result['months'].isna()))).sum())
+    if not dry_run:
+        df['answerValue'] = result['months']
+        position = df.columns.get_loc('answerValue') + 1
+        df = df.drop(columns=['answerStatus'], errors='ignore')
+        df.insert(position, 'answerStatus', result['status'])
+        if 'answers' in df:
+            # 自洽采样模式的结果表同样重新提取每个回答的月数：展开成一列(重新编号，extract 要求索引唯一)，
+            # 再按各行回答数把结果分回原来的行
+            answers = df['answers'].map(lambda v: list(v) if isinstance(v, (list, tuple, np.ndarray)) else [])
+            lengths = answers.map(len).to_numpy()
+            samples = pd.Series([answer for items in answers for answer in items], dtype=object)
+            rows = np.repeat(np.arange(len(df)), lengths)
+            values = extract(samples)['months'].groupby(rows).agg(list).reindex(range(len(df)))
+            df['answerValues'] = values.to_numpy()
+        if path.endswith('.parquet'):
+            storage.write_results(df, path)
+        else:
+            df.to_excel(path, index=False)
+    print(path, result['status'].value_counts().to_dict(), "answerValue 改变", changed, "行")
+    return len(df), changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写回文件")
+    args = parser.parse_args()
+    total = changed = 0
+    for path in args.paths:
+        rows, n = reextract(path, args.dry_run)
+        total += rows
+        changed += n
+    print(f"共 {total} 行，answerValue 改变 {changed} 行")
@@ -0,0 +1,137 @@
+"""
+Parquet 列式存储：prompt 表与结果表的标准格式，xlsx 只作为可选的导出格式。
+
+结果表固定列(RESULT_SCHEMA)：
+CaseId, Principle, Experiment, answer, answerValue, answerStatus, answerProb, model, dataset, latency, tokens
+E1/E2 的 Experiment 为 "E1"/"E2"，E3 为 "E_3_1"/"E_3_2"；dataset 为 "CN"/"EN"；
+answerStatus 是 E3 刑期提取的状态码(见 sentence_extractor.py)，未提取时为空；
+answerProb 是 E1/E2 logprob 打分模式下程序性选项(否/No、B)的概率(见 logprob_scoring.py)，其余为空；
+latency(秒)与 tokens 在没有记录时为空。结果表不含 prompt 原文，需要时按
+CaseId/Principle/Experiment 与 prompt 表关联。
+自洽采样模式(sampling.py)的结果表另有两列(SAMPLED_SCHEMA)：answers 为该行 k 个回答的数组，
+answerValues 为对应的刑期月数数组(E3，提取不到时为空值)；answer / answerValue 取第一个回答。
+
+用法(把已有的 xlsx 结果转换为同名 .parquet):
+python storage.py convert ../E3/Metrics/result_CN/*.xlsx --dataset CN --experiment E3
+"""
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+RESULT_SCHEMA = pa.schema([
+    ("CaseId", pa.int64()),
+    ("Principle", pa.string()),
+    ("Experiment", pa.string()),
+    ("answer", pa.string()),
+    ("answerValue", pa.float64()),
+    ("answerStatus", pa.string()),
+    ("answerProb", pa.float64()),
+    ("model", pa.string()),
+    ("dataset", pa.string()),
+    ("latency", pa.float64()),
+    ("tokens", pa.int64()),
+])
+
+SAMPLED_SCHEMA = pa.schema(list(RESULT_SCHEMA) + [
+    ("answers", pa.list_(pa.string())),
+    ("answerValues", pa.list_(pa.float64())),
+])
+
+PROMPT_SCHEMA = pa.schema([
+    ("CaseId", pa.int64()),
+    ("Principle", pa.string()),
+    ("Experiment", pa.string()),
+    ("Senario", pa.string()),
+    ("prompt", pa.string()),
+])
+
+
+def parquet_path_for(path):
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def _as_list(value, value_type):
+    """数组列的一个单元格：列表(或 numpy 数组)中的空字符串记为空值，数值元素转为 float；不是列表时为 None。"""
+    if not isinstance(value, (list, tuple, np.ndarray)):
+        return None
+    items = [None if item is None or item == '' or (isinstance(item, float) and np.isnan(item)) else item
+             for item in value]
+    if pa.types.is_floating(value_type):
+        return [None if item is None else float(item) for item in items]
+    return [None if item is None else str(item) for item in items]
+
+
+def conform(df, schema, defaults=None):
+    """
+    把 DataFrame 整理为 schema 规定的列与类型，缺少的列用 defaults 或空值补齐。
+
+    返回:
+    pyarrow.Table
+    """
+    defaults = defaults or {}
+    columns = {}
+    for field in schema:
+        if field.name in df.columns:
+            column = df[field.name]
+        else:
+            column = pd.Series([defaults.get(field.name)] * len(df), index=df.index, dtype=object)
+        if pa.types.is_list(field.type):
+            column = column.map(lambda v: _as_list(v, field.type.value_type))
+        elif pa.types.is_floating(field.type) or pa.types.is_integer(field.type):
+            column = pd.to_numeric(column.replace('', None), errors='coerce')
+            if pa.types.is_integer(field.type):
+                column = column.astype('Int64')
+        else:
+            column = column.astype(object).where(column.notna(), None)
+            column = column.map(lambda v: v if v is None else str(v))
+        columns[field.name] = pa.array(column, type=field.type, from_pandas=True)
+    return pa.table(columns, schema=schema)
+
+
+def write_results(df, path, model=None, dataset=None, experiment=None):
+    """按 RESULT_SCHEMA(有 answers 列时为 SAMPLED_SCHEMA)写出结果表；model/dataset/experiment 用于补齐缺少的列。"""
+    defaults = {"model": model, "dataset": dataset, "Experiment": experiment}
+    schema = SAMPLED_SCHEMA if "answers" in df.columns else RESULT_SCHEMA
+    pq.write_table(conform(df, schema, defaults), path)
+
+
+def write_prompts(df, path, experiment=None):
+    pq.write_table(conform(df, PROMPT_SCHEMA, {"Experiment": experiment}), path)
+
+
+def read_table(path):
+    """读取结果或 prompt 表：同名 .parquet 存在时优先读取，否则读取 xlsx。"""
+    parquet_file = parquet_path_for(path)
+    if os.path.exists(parquet_file):
+        return pd.read_parquet(parquet_file)
+    return pd.read_excel(path)
+
+
+def model_from_filename(path):
+    """results_deepseek-r1.xlsx / E1_en_results_gpt-4o.xlsx -> 模型简称"""
+    match = re.search(r'results_(.+)$', os.path.splitext(os.path.basename(path))[0])
+    return match.group(1) if match else None
+
+
+def convert(paths, dataset, experiment=None):
+    for path in paths:
+        df = pd.read_excel(path)
+        out = parquet_path_for(path)
+        write_results(df, out, model=model_from_filename(path), dataset=dataset, experiment=experiment)
+        print(path, "->", out, f"({len(df)} 行)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_convert = sub.add_parser("convert", help="把 xlsx 结果转换为同名 parquet")
+    p_convert.add_argument("paths", nargs="+")
+    p_convert.add_argument("--dataset", required=True, choices=["CN", "EN"])
+    p_convert.add_argument("--experiment", help="结果表没有 Experiment 列时(E1/E2)填入的值")
+    args = parser.parse_args()
+    convert(args.paths, args.dataset, args.experiment)
@@ -0,0 +1,98 @@
+"""
+流式请求的提前结束：逐块解析回复，回答已经可以判定时立即关闭连接，不再等待模型写完解释，
+对 DeepSeek-R1 等回复冗长的模型可明显降低尾延迟与输出 token。
+
+判定规则(stopper)只在回答的开头已经给出答案时提前结束，保证与完整回复的解析结果一致：
+  E1/E2  回复到最后一个分隔符(标点或换行)为止的部分已被 answer_classifier 以 >= 0.9 的可信度识别，
+         即回答以选项开头，如 "否，因为……"、"Answer: B. The reason is……"
+  E3     回复的第一句(到句号、分号或换行为止)不长于 SENTENCE_CHARS 个字符，且 sentence_extractor
+         从中提取到了刑期，如 "36个月。理由如下……"
+  结构化输出模式(structured_output.py)的 JSON 方式下，回复中已有字段合法的完整 JSON 对象
+推理模型的思考过程(reasoning_content)不参与判定；只在 keep_reasoning 时写入结果文件旁的
+<结果>.reasoning.jsonl(按行号，与断点日志相同的格式)，不进入结果表。
+
+提前结束的请求收不到服务商的 usage，token 数按 telemetry.estimate_tokens 估算，遥测中 stopped 为 true；
+截断的回复不写入回复缓存。遥测的 ttft 为首 token 时间，tta 为回答可判定的时间(没有提前结束时为整个回复的耗时)。
+
+用法(experiments.toml 中 stream = true 的模型流式请求，或用 --stream 让全部实时任务流式请求):
+python run_experiments.py --stream --keep-reasoning --experiments E3 --models deepseek-r1
+python telemetry.py ../E3/cn/*.telemetry.jsonl --by model      # 各模型的 ttft / tta
+"""
+import functools
+import os
+import re
+
+import pandas as pd
+
+import answer_classifier as ac
+import sentence_extractor as se
+
+# 回答以选项开头时的可信度(answer_classifier 的 0.9 / 1.0 两级)
+DECIDED_CONFIDENCE = 0.9
+# 只看回复的开头：E1/E2 的选项须出现在这么多个字符之内，E3 的第一句须在这么多个字符之内结束
+HEAD_CHARS = 80
+# 分隔符：英文句点后须跟空白，避免把 "3.5" 中的小数点当作分隔
+BOUNDARY = re.compile(r'[,;:!?，。；：！？、\n]|\.\s')
+SENTENCE_END = re.compile(r'[;!?。；！？\n]|\.\s')
+# E3 第一句的长度上限，"The prison term is 36 months." 约 30 个字符
+SENTENCE_CHARS = 40
+E3_DECIDED = (se.OK, se.RANGE, se.BARE)
+
+
+def reasoning_path_for(result_file):
+    """结果文件对应的推理过程日志，如 results_deepseek-r1.xlsx -> results_deepseek-r1.reasoning.jsonl"""
+    return os.path.splitext(result_file)[0] + '.reasoning.jsonl'
+
+
+def decided_prefix(text):
+    """回复开头 HEAD_CHARS 个字符中到最后一个分隔符为止的部分，没有分隔符时返回空字符串。"""
+    head = text[:HEAD_CHARS]
+    ends = [m.end() for m in BOUNDARY.finditer(head)]
+    return head[:ends[-1]] if ends else ''
+
+
+def first_sentence(text):
+    """回复开头 HEAD_CHARS 个字符中的第一句(不含句末标点)，第一句尚未结束时返回 None。"""
+    end = SENTENCE_END.search(text[:HEAD_CHARS])
+    return text[:end.start()] if end else None
+
+
+# 判定只取决于回复开头很短的一段，同样的开头在各请求间反复出现，缓存判定结果，避免每个小块都跑一遍分类器
+@functools.lru_cache(maxsize=4096)
+def choice_decided(prefix, experiment):
+    """E1/E2：到最后一个分隔符为止的部分(decided_prefix)是否已以选项开头。"""
+    if not prefix.strip():
+        return False
+    result = ac.classify(pd.Series([prefix]), experiment).iloc[0]
+    return result['label'] not in (None, ac.EMPTY) and result['confidence'] >= DECIDED_CONFIDENCE
+
+
+@functools.lru_cache(maxsize=4096)
+def term_decided(sentence):
+    """E3：第一句(first_sentence)是否很短并给出了刑期。"""
+    sentence = ac.normalize(pd.Series([sentence])).iloc[0]
+    if not sentence or len(sentence) > SENTENCE_CHARS:
+        return False
+    return se.extract(pd.Series([sentence]))['status'].iloc[0] in E3_DECIDED
+
+
+def stopper(experiment, parse_answer=None):
+    """
+    run_prompts 的 stop_when 参数：已收到的回复 -> 是否可以提前结束。
+
+    参数:
+    experiment -- "E1"、"E2" 或 "E3"
+    parse_answer -- 结构化输出模式的 parse_answer，给定时以取到合法 JSON 字段为准
+
+    返回:
+    函数 text -> bool。
+    """
+    def stop_when(text):
+        if parse_answer is not None:
+            return '}' in text and parse_answer(text) != text
+        if experiment in ac.KINDS:
+            return choice_decided(decided_prefix(text), experiment)
+        sentence = first_sentence(text)
+        return sentence is not None and term_decided(sentence)
+
+    return stop_when
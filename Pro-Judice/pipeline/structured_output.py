@@ -0,0 +1,128 @@
+"""
+结构化输出模式：用 JSON schema / response_format 约束回复格式，解析只需取字段，输出 token 降到个位数。
+
+每类 prompt 有自己的 schema(SCHEMAS)：
+  E1  {"answer": "是" | "否"}(英文为 Yes | No)
+  E2  {"answer": "A" | "B"}
+  E3  {"months": 整数}
+各模型按服务商支持的程度选择方式(experiments.toml 中的 structured)：
+  json_schema  response_format 为带 schema 的 json_schema(strict)，如 OpenAI
+  json_object  response_format 为 json_object，schema 只写在格式要求中，如 DeepSeek、DashScope
+  max_tokens   不支持 JSON 输出的服务商：沿用原格式要求，用很小的 max_tokens 截断多余的解释，
+               回复照常由 answer_classifier / sentence_extractor 解析
+JSON 方式下格式要求(suffix)换成 FORMAT_PROMPTS 中给出 JSON 样例的版本(json_object 要求 prompt 中出现 "json")，
+回复中取到字段后写成标准回答(是/否、A/B、"36个月"/"36 months")，取不到时保留原回复交给正则解析。
+结构化模式的结果写入 <结果>_structured.parquet。
+
+用法:
+python run_experiments.py --structured --experiments E1 E3 --models gpt-4o deepseek-v3
+"""
+import json
+import os
+import re
+
+import answer_classifier as ac
+
+MODES = ("json_schema", "json_object", "max_tokens")
+
+# (实验, 语言) -> 字段名与 JSON schema
+SCHEMAS = {
+    ("E1", "cn"): ("answer", {"type": "string", "enum": ["是", "否"]}),
+    ("E1", "en"): ("answer", {"type": "string", "enum": ["Yes", "No"]}),
+    ("E2", "cn"): ("answer", {"type": "string", "enum": ["A", "B"]}),
+    ("E2", "en"): ("answer", {"type": "string", "enum": ["A", "B"]}),
+    ("E3", "cn"): ("months", {"type": "integer", "minimum": 0}),
+    ("E3", "en"): ("months", {"type": "integer", "minimum": 0}),
+}
+
+FORMAT_PROMPTS = {
+    ("E1", "cn"): '\n请只输出 JSON，格式为 {"answer": "是"} 或 {"answer": "否"}',
+    ("E1", "en"): '\nRespond only with JSON in the form {"answer": "Yes"} or {"answer": "No"}',
+    ("E2", "cn"): '\n请只输出 JSON，格式为 {"answer": "A"} 或 {"answer": "B"}',
+    ("E2", "en"): '\nRespond only with JSON in the form {"answer": "A"} or {"answer": "B"}',
+    ("E3", "cn"): '\n请只输出 JSON，格式为 {"months": x}，其中 x 为刑期的月数(整数)，如 {"months": 36}',
+    ("E3", "en"): ('\nRespond only with JSON in the form {"months": x}, where x is the prison term in months '
+                   '(an integer), e.g. {"months": 36}. You must provide the value of x.'),
+}
+
+# max_tokens 方式下各实验的输出上限：选项本身，或 "36个月" / "36 months"
+MAX_TOKENS = {"E1": 4, "E2": 4, "E3": 8}
+# JSON 方式下的输出上限，{"months": 120} 约 6 个 token
+JSON_MAX_TOKENS = 16
+# 推理模型的思考过程也计入 max_tokens，不设上限
+REASONING_MODELS = ("deepseek-reasoner",)
+
+JSON_OBJECT = re.compile(r'\{[^{}]*\}')
+
+
+def structured_path_for(result_file):
+    """结构化模式的结果文件，如 results_gpt-4o.xlsx -> results_gpt-4o_structured.xlsx"""
+    stem, ext = os.path.splitext(result_file)
+    return stem + '_structured' + ext
+
+
+def response_format(experiment, language, mode):
+    """mode 对应的 response_format 参数，max_tokens 方式返回 None。"""
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode != "json_schema":
+        return None
+    field, schema = SCHEMAS[(experiment, language)]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": f"{experiment.lower()}_answer",
+            "strict": True,
+            "schema": {"type": "object", "properties": {field: schema}, "required": [field],
+                       "additionalProperties": False},
+        },
+    }
+
+
+def request_params(experiment, language, mode, model=None):
+    """结构化模式的请求参数(response_format 与 max_tokens)，推理模型不设 max_tokens。"""
+    params = {}
+    if mode != "max_tokens":
+        params["response_format"] = response_format(experiment, language, mode)
+    if model not in REASONING_MODELS:
+        params["max_tokens"] = MAX_TOKENS[experiment] if mode == "max_tokens" else JSON_MAX_TOKENS
+    return params
+
+
+def answer_text(value, experiment, language):
+    """字段值 -> 标准回答文本；值不合法时返回 None。"""
+    if experiment == "E3":
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            return None
+        months = int(value) if float(value).is_integer() else value
+        return f"{months}个月" if language == "cn" else f"{months} months"
+    if not isinstance(value, str):
+        return None
+    return value.strip() if value.strip() in SCHEMAS[(experiment, language)][1]["enum"] else None
+
+
+def parse_answer(text, experiment, language):
+    """
+    从 JSON 回复中取字段。
+
+    返回:
+    标准回答文本(是/否、Yes/No、A/B、"36个月"/"36 months")；回复不是合法 JSON 或字段不合法时返回原回复。
+    """
+    if not isinstance(text, str):
+        return text
+    field = SCHEMAS[(experiment, language)][0]
+    body = ac.THINK_CLOSED.sub(' ', text)
+    for candidate in JSON_OBJECT.findall(body):
+        try:
+            value = json.loads(candidate).get(field)
+        except (json.JSONDecodeError, AttributeError):
+            continue
+        answer = answer_text(value, experiment, language)
+        if answer is not None:
+            return answer
+    return text
+
+
+def parser(experiment, language):
+    """PromptTable 的 parse_answer 参数：原回复 -> 标准回答。"""
+    return lambda text: parse_answer(text, experiment, language)
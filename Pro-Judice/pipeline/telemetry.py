@@ -0,0 +1,245 @@
+"""
+逐请求的遥测记录：延迟、首 token 时间、token 数、缓存命中的 token、重试次数与估算费用。
+
+每个结果文件旁有一个追加写入的 .telemetry.jsonl(如 results_gpt-4o.telemetry.jsonl)，每次请求一行：
+  job, model, dataset, experiment, row    任务与 prompt 行号
+  status          ok / error / cached(命中回复缓存，未发送请求)
+  attempts        发送次数(含重试)
+  calls           该 prompt 发出的请求数，自洽采样模式并发请求 k 次时为 k(见 sampling.py)，其余为 1
+  started         开始时间(unix 秒)
+  latency         最后一次发送的耗时(秒)
+  total           含重试与等待的总耗时(秒)
+  ttft            首 token 时间(秒)，只有流式请求才有
+  tta             回答可判定的时间(秒)，只有流式请求才有(见 streaming.py)；没有提前结束时为整个回复的耗时
+  stopped         流式请求是否在回答可判定后提前结束，提前结束时 token 数为估算值
+  hedged          是否因超过近期 p95 耗时而发出了对冲副本(见 hedging.py)
+  hedge_won       副本是否先于原请求返回
+  hedge_saved     估算对冲节省的秒数，副本胜出时按近期耗时的尾部估算原请求还要等多久
+  key             配置了多个 key 时最后一次发送所用 key 的末 4 位(见 key_pool.py)，单个 key 时为空
+  prompt_tokens, completion_tokens, reasoning_tokens, cached_tokens, cost(美元)
+  hedge_cost      被取消的那份请求的估算费用(按与胜出请求相同的 token 数)，不计入 cost
+费用按 PRICES 中的公开单价估算，以服务商账单为准。
+
+用法(按任务汇总 p50/p95/p99 延迟、吞吐量、token 与费用):
+python telemetry.py ../E3/cn/results_*.telemetry.jsonl
+python telemetry.py ../E3/cn/*.telemetry.jsonl ../E3/en/results/results_en/*.telemetry.jsonl --by model experiment
+"""
+import argparse
+import json
+import os
+import re
+
+import pandas as pd
+
+# 模型名 -> (输入, 命中缓存的输入, 输出)，美元 / 百万 token
+PRICES = {
+    "deepseek-reasoner": (0.55, 0.14, 2.19),
+    "deepseek-chat": (0.27, 0.07, 1.10),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "meta-llama/llama-3.3-70b-instruct": (0.13, 0.13, 0.40),
+    "qwen2.5-72b-instruct": (0.56, 0.56, 1.68),
+}
+
+TOKEN_COLUMNS = ["prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens"]
+
+# 中日韩文字与全角标点
+CJK = re.compile('[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中文每字约 1 个 token，其余按 4 个字符 1 个 token。text 可以是字符串或 Series。"""
+    if isinstance(text, pd.Series):
+        text = text.fillna('').astype(str)
+        cjk = text.str.count(CJK)
+        return cjk + (text.str.len() - cjk + 3) // 4
+    cjk = len(CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def telemetry_path_for(result_file):
+    """结果文件对应的遥测路径，如 results_gpt-4o.xlsx -> results_gpt-4o.telemetry.jsonl"""
+    return os.path.splitext(result_file)[0] + '.telemetry.jsonl'
+
+
+def _as_dict(value):
+    if value is None:
+        return {}
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return dict(value)
+
+
+def usage_of(response):
+    """
+    从 chat.completions 或 responses 的返回中取 token 数(缺少的项记为 0)。
+    DeepSeek 的缓存命中写在 prompt_cache_hit_tokens 中，其余服务商写在 prompt_tokens_details.cached_tokens。
+    """
+    usage = _as_dict(getattr(response, "usage", None) if not isinstance(response, dict) else response.get("usage"))
+    if not usage:
+        return {}
+    input_details = _as_dict(usage.get("prompt_tokens_details") or usage.get("input_tokens_details"))
+    output_details = _as_dict(usage.get("completion_tokens_details") or usage.get("output_tokens_details"))
+    return {
+        "prompt_tokens": usage.get("prompt_tokens", usage.get("input_tokens")) or 0,
+        "completion_tokens": usage.get("completion_tokens", usage.get("output_tokens")) or 0,
+        "reasoning_tokens": output_details.get("reasoning_tokens") or 0,
+        "cached_tokens": usage.get("prompt_cache_hit_tokens") or input_details.get("cached_tokens") or 0,
+    }
+
+
+def estimate_cost(model, usage, prices=PRICES):
+    """按单价估算一次请求的费用(美元)，未登记价格的模型返回 None。推理 token 已计入 completion_tokens。"""
+    if model not in prices or not usage:
+        return None
+    input_price, cached_price, output_price = prices[model]
+    cached = usage.get("cached_tokens", 0)
+    return ((usage.get("prompt_tokens", 0) - cached) * input_price + cached * cached_price
+            + usage.get("completion_tokens", 0) * output_price) / 1e6
+
+
+def request_record(row, status, attempts=0, started=None, latency=None, total=None, ttft=None, usage=None,
+                   tta=None, stopped=False, calls=1, hedged=False, hedge_won=False, hedge_saved=None, key=None):
+    """一条 prompt 的遥测记录(不含任务信息与费用)。"""
+    usage = usage or {}
+    return dict(row=row, status=status, attempts=attempts, calls=calls, started=started, latency=latency, total=total,
+                ttft=ttft, tta=tta, stopped=stopped, hedged=hedged, hedge_won=hedge_won, hedge_saved=hedge_saved,
+                key=key, **{column: usage.get(column, 0) for column in TOKEN_COLUMNS})
+
+
+class Telemetry:
+    """
+    一个任务的遥测记录，追加写入 path。只 flush 不 fsync：遥测丢失末尾几行不影响结果。
+
+    参数:
+    path -- 遥测文件路径
+    job -- 任务名
+    model -- 请求的模型名(用于查价格)
+    meta -- 可选，{"model", "dataset", "experiment"}；其中 model 为模型简称，写入记录的 model 列
+    prices -- 单价表，默认 PRICES
+    """
+
+    def __init__(self, path, job, model, meta=None, prices=None):
+        self.path = path
+        self.model = model
+        self.prices = PRICES if prices is None else prices
+        meta = meta or {}
+        self.fields = {"job": job, "model": meta.get("model", model),
+                       "dataset": meta.get("dataset"), "experiment": meta.get("experiment")}
+        self._file = None
+
+    def record(self, record):
+        """写入一条 request_record 的记录，补上任务信息与费用，返回完整记录。"""
+        record = dict(self.fields, **record)
+        record["cost"] = estimate_cost(self.model, record, self.prices)
+        record["hedge_cost"] = record["cost"] if record.get("hedged") else None
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        return record
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load(paths):
+    """读入若干遥测文件，忽略写了一半的末行。"""
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return pd.DataFrame(records)
+
+
+def summarize(df, by=("job",)):
+    """
+    按 by 分组汇总。
+
+    返回:
+    DataFrame，每组一行：请求数、缓存命中、失败、重试次数、发送请求的延迟 p50/p95/p99、首 token 时间 p50、
+    回答可判定的时间(tta) p50/p95 与提前结束的请求数(流式请求)、
+    对冲次数、副本胜出次数、估算节省的秒数合计(hedging.py)、
+    吞吐量(条/秒，按组内第一次开始到最后一次结束的时间)、各类 token 合计、前缀缓存命中率
+    (cached_tokens / prompt_tokens)、费用与其中对冲副本的费用(cost 含 hedge_cost)。
+    """
+    by = list(by)
+    df = df.copy()
+    df["finished"] = df["started"] + df["total"].fillna(0)
+    # 旧的遥测文件没有 calls 列，每个 prompt 只发一次请求
+    calls = df["calls"].fillna(1) if "calls" in df else 1
+    df["retries"] = (df["attempts"] - calls).clip(lower=0)
+    groups = df.groupby(by)
+    summary = pd.DataFrame({
+        "requests": groups.size(),
+        "cached": groups["status"].apply(lambda s: int((s == "cached").sum())),
+        "errors": groups["status"].apply(lambda s: int((s == "error").sum())),
+        "retries": groups["retries"].sum().astype(int),
+    })
+    sent = df[df["status"] != "cached"]
+    latency = sent.groupby(by)["latency"].quantile([0.5, 0.95, 0.99]).unstack()
+    latency.columns = ["latency_p50", "latency_p95", "latency_p99"]
+    summary = summary.join(latency)
+    summary["ttft_p50"] = sent.groupby(by)["ttft"].median()
+    # 旧的遥测文件没有 tta / stopped 列
+    sent = sent.assign(tta=pd.to_numeric(sent["tta"], errors="coerce") if "tta" in sent else float("nan"),
+                       stopped=sent["stopped"].fillna(False).astype(bool) if "stopped" in sent else False)
+    tta = sent.groupby(by)["tta"].quantile([0.5, 0.95]).unstack().reindex(columns=[0.5, 0.95])
+    tta.columns = ["tta_p50", "tta_p95"]
+    summary = summary.join(tta)
+    summary["stopped"] = sent.groupby(by)["stopped"].sum().reindex(summary.index, fill_value=0).astype(int)
+    # 旧的遥测文件没有对冲的各列
+    sent = sent.assign(**{column: sent[column].fillna(False).astype(bool) if column in sent else False
+                          for column in ("hedged", "hedge_won")},
+                       hedge_saved=pd.to_numeric(sent["hedge_saved"], errors="coerce") if "hedge_saved" in sent
+                       else float("nan"))
+    hedges = sent.groupby(by)[["hedged", "hedge_won", "hedge_saved"]].sum().reindex(summary.index, fill_value=0)
+    summary["hedges"] = hedges["hedged"].astype(int)
+    summary["hedge_wins"] = hedges["hedge_won"].astype(int)
+    summary["hedge_saved"] = hedges["hedge_saved"]
+    span = groups["finished"].max() - groups["started"].min()
+    summary["throughput"] = summary["requests"] / span.where(span > 0)
+    summary = summary.join(groups[TOKEN_COLUMNS].sum())
+    summary["cache_hit_rate"] = summary["cached_tokens"] / summary["prompt_tokens"].where(summary["prompt_tokens"] > 0)
+    hedge_cost = groups["hedge_cost"].sum(min_count=1) if "hedge_cost" in df else float("nan")
+    summary["cost"] = groups["cost"].sum(min_count=1).add(hedge_cost, fill_value=0)
+    summary["hedge_cost"] = hedge_cost
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--by", nargs="+", default=["job"], help="分组列，如 model experiment dataset")
+    parser.add_argument("--output", help="另存为 csv")
+    args = parser.parse_args()
+
+    df = load(args.paths)
+    if df.empty:
+        print("没有遥测记录")
+        return
+    summary = summarize(df, args.by)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(summary.round(3).to_string())
+    total_cost = summary["cost"].sum()
+    prompt_tokens = summary['prompt_tokens'].sum()
+    hit_rate = summary['cached_tokens'].sum() / prompt_tokens if prompt_tokens else 0.0
+    print(f"\n共 {int(summary['requests'].sum())} 次请求，前缀缓存命中 {hit_rate:.1%}，估算费用 ${total_cost:.2f}")
+    if summary["hedges"].sum():
+        print(f"对冲 {int(summary['hedges'].sum())} 次，副本胜出 {int(summary['hedge_wins'].sum())} 次，"
+              f"估算节省 {summary['hedge_saved'].sum():.1f}s，副本费用 ${summary['hedge_cost'].sum():.2f}")
+    if args.output:
+        summary.to_csv(args.output)
+        print("汇总已保存至 ", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+answer_classifier 的回归用例，重点是否定说法与照抄题干的回答。
+
+用法:
+python -m pytest -q test_answer_classifier.py
+"""
+import pandas as pd
+import pytest
+
+import answer_classifier as ac
+
+
+@pytest.mark.parametrize("answer, label, confidence", [
+    ("是", "Yes", 1.0),
+    ("否。", "No", 1.0),
+    ("不是", "No", 1.0),
+    ("不是。", "No", 1.0),
+    ("回答：不是", "No", 1.0),
+    ("我认为不是公正的", "No", 0.7),
+    ("我认为不是", "No", 0.5),
+    ("是不公正的", "No", 0.7),
+    ("判决不公正", "No", 0.7),
+    ("该判决不太公平", "No", 0.7),
+    ("该判决是公正的", "Yes", 0.7),
+    ("是否公正：否", "No", 1.0),
+    ("No, it is not fair.", "No", 0.9),
+    ("I think the judgment is unfair.", "No", 0.7),
+    ("<think>是否公正？</think>\n**否**", "No", 1.0),
+    ("", "", 0.0),
+])
+def test_yes_no(answer, label, confidence):
+    result = ac.classify(pd.Series([answer]), "E1").iloc[0]
+    assert result["label"] == label
+    assert result["confidence"] == confidence
+
+
+@pytest.mark.parametrize("answer, label", [
+    ("B", "B"),
+    ("答案：A", "A"),
+    ("A 或 B 中我选择B", "B"),
+    ("Strictly A or B? Option A.", "A"),
+])
+def test_choice(answer, label):
+    assert ac.classify(pd.Series([answer]), "E2").iloc[0]["label"] == label
@@ -0,0 +1,64 @@
+"""
+async_engine 对 mock 服务的用例：按 prompt 顺序回写、429/503 重试与 400 永久失败。
+
+用法:
+python -m pytest -q test_async_engine.py
+"""
+import asyncio
+import contextlib
+import io
+
+import async_engine as ae
+import mock_server
+import rate_limit as rl
+from bench_engine import PROMPT_SUFFIXES
+
+N_PROMPTS = 60
+
+
+async def run_against_mock(base_url, n_prompts):
+    client = ae.make_client("mock-key", base_url)
+    pool = ae.ProviderPool({base_url: {"concurrency": 8, "rpm": 10 ** 6}})
+    messages_list = [[{"role": "user", "content": f"prompt {i}" + PROMPT_SUFFIXES[i % len(PROMPT_SUFFIXES)]}]
+                     for i in range(n_prompts)]
+    rows = []
+
+    def on_result(i, res, error, info):
+        rows.append((i, res, error, info))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await ae.run_prompts("mock", "mock-model", client, pool.semaphore(base_url), messages_list,
+                             on_result=on_result, limiter=pool.limiter(base_url))
+    await client.close()
+    await pool.close()
+    return rows
+
+
+def test_order_retries_and_permanent_errors(monkeypatch):
+    # 503 的退避缩短到 10ms；429 仍按 mock 的 Retry-After 等 1 秒
+    monkeypatch.setattr(rl, "backoff_delay", lambda attempt, base=1.0, cap=60.0: 0.01)
+    server, base_url = mock_server.start_server(latency=0.01, jitter=0.0, error_rate=0.1, rate_limit_rate=0.05,
+                                                bad_request_rate=0.1, seed=0)
+    try:
+        rows = asyncio.run(run_against_mock(base_url, N_PROMPTS))
+    finally:
+        server.shutdown()
+    stats = server.stats()
+
+    assert [row[0] for row in rows] == list(range(1, N_PROMPTS + 1))
+    assert stats.get("server_error", 0) > 0 and stats.get("rate_limited", 0) > 0
+
+    succeeded = [row for row in rows if row[2] is None]
+    failed = [row for row in rows if row[2] is not None]
+    # 每次发送都被 mock 计数一次，429/503 之后的重试也不例外
+    assert sum(row[3]["attempts"] for row in rows) == sum(
+        stats.get(key, 0) for key in ("ok", "server_error", "rate_limited", "bad_request"))
+    assert any(row[3]["attempts"] > 1 for row in succeeded)
+    assert all(row[1] for row in succeeded)
+
+    # 400 不重试：每条失败的 prompt 恰好对应一次 400，且以永久错误返回
+    assert len(failed) == stats.get("bad_request", 0) > 0
+    for i, res, error, info in failed:
+        assert res == ""
+        assert error.startswith(f"{rl.PERMANENT}: ") and "400" in error
+        assert info["status"] == "error"
@@ -0,0 +1,57 @@
+"""
+journal 的续跑用例：写了一半的末行、失败的行与旧版 Excel 结果的导入。
+
+用法:
+python -m pytest -q test_journal.py
+"""
+import os
+
+import pandas as pd
+
+from journal import Journal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULT_FILE = os.path.join(HERE, '..', 'E3', 'cn', 'results_gpt-4o.xlsx')
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "results.jsonl"
+    journal = Journal(str(path))
+    journal.append(1, {"answer": "36个月"})
+    journal.append(2, {"answer": "24个月"})
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"answer": "12个')
+
+    journal = Journal(str(path))
+    assert journal.done_rows() == {1, 2}
+    # 续跑时新记录另起一行，不与半行粘连
+    journal.append(3, {"answer": "12个月"})
+    journal.close()
+    assert [record["row"] for record in Journal(str(path)).records()] == [1, 2, 3]
+
+
+def test_done_rows_excludes_errors(tmp_path):
+    journal = Journal(str(tmp_path / "results.jsonl"))
+    journal.append(1, {"answer": "36个月"})
+    journal.append(2, {"answer": "", "error": "RateLimitError"})
+    journal.append(3, {"answer": "", "error": "APIConnectionError"})
+    journal.append(3, {"answer": "12个月"})
+    journal.close()
+    assert journal.done_rows() == {1, 3}
+
+
+def test_import_xlsx_round_trip(tmp_path):
+    result_file = str(tmp_path / "results_gpt-4o.xlsx")
+    original = pd.read_excel(RESULT_FILE).head(50)
+    original.to_excel(result_file, index=False)
+
+    journal = Journal(str(tmp_path / "results_gpt-4o.jsonl"))
+    assert journal.import_xlsx(result_file) == len(original)
+    # 日志不为空时不再重复导入
+    assert journal.import_xlsx(result_file) == 0
+    journal.close()
+
+    assert journal.done_rows() == set(range(1, len(original) + 1))
+    restored = journal.to_frame(list(original.columns))
+    pd.testing.assert_frame_equal(restored, original.fillna(''), check_dtype=False)
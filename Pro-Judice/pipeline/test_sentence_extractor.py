@@ -0,0 +1,72 @@
+"""
+sentence_extractor 的回归用例。
+
+用法:
+python -m pytest -q test_sentence_extractor.py
+"""
+import pandas as pd
+import pytest
+
+import sentence_extractor as se
+import storage
+
+
+@pytest.mark.parametrize("answer, months, status", [
+    ("36个月", 36, se.OK),
+    ("【36】个月", 36, se.OK),
+    ("3年6个月", 42, se.OK),
+    ("5 years", 60, se.OK),
+    ("I would impose an 8-year sentence.", 96, se.OK),
+    ("A 36-month prison term.", 36, se.OK),
+    ("a 2-year 6-month term", 30, se.OK),
+    ("2-year to 3-year range", 30, se.RANGE),
+    ("2-3年", 30, se.RANGE),
+    ("二至三年", 30, se.RANGE),
+    ("12至18个月", 15, se.RANGE),
+    ("18个月至2年", 21, se.RANGE),
+    ("18 months to 2 years", 21, se.RANGE),
+    ("1 year to 18 months", 15, se.RANGE),
+    ("判处有期徒刑二年，缓刑三年", 24, se.OK),
+    ("有期徒刑1年6个月，缓刑2年", 18, se.OK),
+    ("判处有期徒刑三年，缓刑考验期为五年", 36, se.OK),
+    ("有期徒刑6个月，缓刑1至2年", 6, se.OK),
+    ("2 years imprisonment, suspended for 3 years", 24, se.OK),
+    ("18 months in prison followed by probation for 3 years", 18, se.OK),
+    ("24 months, with 3 years' probation", 24, se.OK),
+    ("a 3-year probation and 12 months of imprisonment", 12, se.OK),
+])
+def test_extract(answer, months, status):
+    result = se.extract(pd.Series([answer])).iloc[0]
+    assert result["months"] == months
+    assert result["status"] == status
+
+
+@pytest.mark.parametrize("answer, status", [
+    ("判处死刑，缓期二年执行", se.DEATH),
+    ("无期徒刑", se.LIFE),
+    ("判处缓刑", se.UNPARSED),
+    ("三年以上十年以下", se.UNPARSED),
+    ("根据刑法，应处三年以上十年以下有期徒刑，无法准确计算具体刑期。", se.REFUSED),
+    ("Under the statute, the offence carries 3 years or more; I cannot estimate the term.", se.REFUSED),
+])
+def test_extract_without_term(answer, status):
+    result = se.extract(pd.Series([answer])).iloc[0]
+    assert pd.isna(result["months"])
+    assert result["status"] == status
+
+
+def test_reextract_sampled(tmp_path):
+    path = str(tmp_path / "results_deepseek-v3_sampled.parquet")
+    storage.write_results(pd.DataFrame({
+        "CaseId": [1, 1, 2, 3],
+        "Principle": ["p", "p", "p", "p"],
+        "Experiment": ["E_3_1", "E_3_2", "E_3_1", "E_3_1"],
+        "answer": ["36个月", "2年", "【12】", ""],
+        "answers": [["36个月", "3年"], ["2年", "24个月", "拒绝回答"], ["【12】"], []],
+    }), path)
+    assert se.reextract(path) == (4, 3)
+    df = pd.read_parquet(path)
+    assert df["answerValue"].tolist()[:3] == [36, 24, 12]
+    assert df["answerStatus"].tolist() == [se.OK, se.OK, se.OK, se.EMPTY]
+    values = [None if v is None else [None if pd.isna(x) else x for x in v] for v in df["answerValues"]]
+    assert values == [[36, 36], [24, 24, None], [12], None]
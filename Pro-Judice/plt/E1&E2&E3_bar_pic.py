@@ -32,6 +32,14 @@ chinese_color = '#87CEEB'  # Light blue from image 4
 english_color = '#FFA500'  # Orange from image 4
 
 
+def read_result_file(file_path):
+    """Read a result table, preferring the columnar .parquet twin of the Excel file when it exists"""
+    parquet_file = file_path.with_suffix('.parquet')
+    if parquet_file.exists():
+        return pd.read_parquet(parquet_file)
+    return pd.read_excel(file_path)
+
+
 def get_picture_E1_horizontal():
     """E1 horizontal bar chart"""
     # 读取Excel文件
@@ -194,7 +202,7 @@ class ProceduralJusticeHypothesisAnalyzer:
         self.models = ['deepseek-r1', 'deepseek-v3', 'gpt-4o', 'llama-3.3', 'qwen-2.5']
 
     def load_all_data(self):
-        """Load all Excel files"""
+        """Load all result files (.parquet when available, otherwise Excel)"""
         all_data = []
 
         print("Loading data files...")
@@ -205,9 +213,9 @@ class ProceduralJusticeHypothesisAnalyzer:
             file_pattern = f"results_{model}.xlsx"
             cn_file = self.cn_path / file_pattern
 
-            if cn_file.exists():
+            if cn_file.exists() or cn_file.with_suffix('.parquet').exists():
                 try:
-                    df = pd.read_excel(cn_file)
+                    df = read_result_file(cn_file)
                     df['Language'] = 'Chinese'
                     df['Legal_System'] = 'Chinese_Law'
                     df['Model'] = model
@@ -221,9 +229,9 @@ class ProceduralJusticeHypothesisAnalyzer:
             file_pattern = f"results_{model}.xlsx"
             en_file = self.en_path / file_pattern
 
-            if en_file.exists():
+            if en_file.exists() or en_file.with_suffix('.parquet').exists():
                 try:
-                    df = pd.read_excel(en_file)
+                    df = read_result_file(en_file)
                     df['Language'] = 'English'
                     df['Legal_System'] = 'Common_Law'
                     df['Model'] = model
@@ -479,4 +487,4 @@ if __name__ == "__main__":
     get_picture_E2_horizontal()
 
     print("\nGenerating E3 Horizontal Chart:")
-    get_picture_E3_horizontal()
\ No newline at end of file
+    get_picture_E3_horizontal()
\ No newline at end of file
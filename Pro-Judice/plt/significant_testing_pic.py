@@ -9,10 +9,25 @@ import warnings
 warnings.filterwarnings('ignore')
 
 
+def parquet_twin(file_path):
+    return os.path.splitext(file_path)[0] + '.parquet'
+
+
+def result_file_exists(file_path):
+    return os.path.exists(file_path) or os.path.exists(parquet_twin(file_path))
+
+
+def read_result_file(file_path):
+    """Read a result table, preferring the columnar .parquet twin of the Excel file when it exists"""
+    if os.path.exists(parquet_twin(file_path)):
+        return pd.read_parquet(parquet_twin(file_path))
+    return pd.read_excel(file_path)
+
+
 def load_and_clean_data(file_path):
-    """Load Excel file and extract clean numeric data"""
+    """Load result file and extract clean numeric data"""
     try:
-        df = pd.read_excel(file_path)
+        df = read_result_file(file_path)
         # Clean the data
         df['answerValue'] = pd.to_numeric(df['answerValue'], errors='coerce')
         df = df.dropna(subset=['answerValue'])
@@ -38,7 +53,7 @@ def load_all_data():
     # Load Chinese data
     for model, filename in file_mapping.items():
         cn_file = f'data/result_CN/{filename}'
-        if os.path.exists(cn_file):
+        if result_file_exists(cn_file):
             df = load_and_clean_data(cn_file)
             if not df.empty:
                 df['Legal_System'] = 'CN'
@@ -48,7 +63,7 @@ def load_all_data():
     # Load English data
     for model, filename in file_mapping.items():
         en_file = f'data/result_EN/{filename}'
-        if os.path.exists(en_file):
+        if result_file_exists(en_file):
             df = load_and_clean_data(en_file)
             if not df.empty:
                 df['Legal_System'] = 'EN'